@@ -1,23 +1,55 @@
+import argparse
 import json
+import os
 import pathlib
 import pickle
+import shutil
+from typing import Dict
 from typing import List
 from typing import Tuple
 
+import numpy
 import pandas
+import sklearn
 from sklearn import model_selection
-from sklearn import neighbors
 from sklearn import pipeline
 from sklearn import preprocessing
 
+from services.compiled_predictor import CompiledKNNPredictor
+from services.data_cache import load_demographics, load_training_data
+from services.data_cache import sources_digest
+from services.model_artifacts import ARTIFACT_DIR
+from services.model_artifacts import METADATA_FILE
+from services.model_artifacts import load_knn_artifact
+from services.model_artifacts import replace_atomically
+from services.model_artifacts import save_knn_artifact
+from services.model_delta import DELTA_FILE
+from services.model_delta import base_fingerprint
+from services.model_delta import load_delta
+from services.model_delta import matches_base
+from services.model_delta import remove_delta
+from services.model_delta import save_delta
+from services.model_delta import scaler_drift
+from services.model_delta import unscaled_rows
+from services.model_manifest import write_manifest
+from services.neighbor_index import build_neighbors_regressor
+from services.neighbor_index import describe_neighbor_index
+
 SALES_PATH = "data/kc_house_data.csv"  # path to CSV with home sale data
-DEMOGRAPHICS_PATH = "data/kc_house_data.csv"  # path to CSV with demographics
+DEMOGRAPHICS_PATH = "data/zipcode_demographics.csv"  # path to CSV with demographics
 # List of columns (subset) that will be taken from home sale data
 SALES_COLUMN_SELECTION = [
     'price', 'bedrooms', 'bathrooms', 'sqft_living', 'sqft_lot', 'floors',
     'sqft_above', 'sqft_basement', 'zipcode'
 ]
 OUTPUT_DIR = "model"  # Directory where output artifacts will be saved
+# Neighbor index used by the KNN model: brute, kd_tree, ball_tree or ivf
+NEIGHBOR_INDEX = os.getenv("NEIGHBOR_INDEX", "brute")
+NEIGHBOR_LEAF_SIZE = int(os.getenv("NEIGHBOR_LEAF_SIZE", "30"))  # KD/Ball tree
+IVF_N_PROBE = int(os.getenv("IVF_N_PROBE", "8"))  # cells searched per query
+# Largest scaler change (center shift in IQRs, or relative IQR change) that
+# appended rows may cause before --append falls back to a full refit
+SCALER_DRIFT_THRESHOLD = float(os.getenv("SCALER_DRIFT_THRESHOLD", "0.05"))
 
 
 def load_data(
@@ -25,9 +57,12 @@ def load_data(
 ) -> Tuple[pandas.DataFrame, pandas.Series]:
     """Load the target and feature data by merging sales and demographics.
 
+    The merged table is cached on disk (see services.data_cache) and only
+    rebuilt when one of the CSVs changes.
+
     Args:
         sales_path: path to CSV file with home sale data
-        demographics_path: path to CSV file with home sale data
+        demographics_path: path to CSV file with demographics
         sales_column_selection: list of columns from sales data to be used as
             features
 
@@ -37,39 +72,242 @@ def load_data(
         series contains the target variable (home sale price).
 
     """
-    data = pandas.read_csv(sales_path,
-                           usecols=sales_column_selection,
-                           dtype={'zipcode': str})
-    demographics = pandas.read_csv("data/zipcode_demographics.csv",
-                                   dtype={'zipcode': str})
+    return load_training_data(sales_path, demographics_path,
+                              sales_column_selection)
 
-    merged_data = data.merge(demographics, how="left",
-                             on="zipcode").drop(columns="zipcode")
-    # Remove the target variable from the dataframe, features will remain
-    y = merged_data.pop('price')
-    x = merged_data
 
-    return x, y
+def train_model(x_train: pandas.DataFrame,
+                y_train: pandas.Series) -> pipeline.Pipeline:
+    """Fit the scaler and KNN regressor on the training split.
 
+    Args:
+        x_train: training features
+        y_train: training target (home sale price)
 
-def main():
-    """Load data, train model, and export artifacts."""
-    x, y = load_data(SALES_PATH, DEMOGRAPHICS_PATH, SALES_COLUMN_SELECTION)
-    x_train, _x_test, y_train, _y_test = model_selection.train_test_split(
-        x, y, random_state=42)
+    Returns:
+        Fitted pipeline using the configured neighbor index.
+
+    """
+    if NEIGHBOR_INDEX == "ivf":
+        regressor = build_neighbors_regressor("ivf", n_probe=IVF_N_PROBE)
+    else:
+        regressor = build_neighbors_regressor(NEIGHBOR_INDEX,
+                                              leaf_size=NEIGHBOR_LEAF_SIZE)
+    return pipeline.make_pipeline(preprocessing.RobustScaler(),
+                                  regressor).fit(x_train, y_train)
 
-    model = pipeline.make_pipeline(preprocessing.RobustScaler(),
-                                   neighbors.KNeighborsRegressor()).fit(
-                                       x_train, y_train)
 
-    output_dir = pathlib.Path(OUTPUT_DIR)
+def save_model(model: pipeline.Pipeline, features: List[str],
+               output_dir: pathlib.Path, metadata: Dict = None):
+    """Write the model artifacts served by the API.
+
+    The manifest is written last. It records a content hash of the other
+    files, which the API uses as the model version.
+
+    Args:
+        model: fitted pipeline
+        features: feature column names, in training order
+        output_dir: directory where the artifacts will be written
+        metadata: training details recorded in the manifest
+
+    """
     output_dir.mkdir(exist_ok=True)
+    # Appended rows are folded into this fit, or belonged to an older model
+    remove_delta(output_dir)
+
+    # Pickle-free export (JSON + memory-mappable .npy), written before
+    # model.pkl so a watcher reacting to model.pkl sees a complete artifact
+    try:
+        save_knn_artifact(model, features, output_dir / ARTIFACT_DIR)
+    except ValueError as e:
+        print(f"Skipping memory-mapped artifact: {e}")
+        # An artifact left by an earlier fit would describe another model
+        shutil.rmtree(output_dir / ARTIFACT_DIR, ignore_errors=True)
+
+    # Output model artifacts: JSON list of features and pickled model, each
+    # renamed into place so a watcher never reads a partially written file
+    replace_atomically(output_dir / "model_features.json",
+                       lambda f: f.write(json.dumps(features).encode("utf-8")))
+    replace_atomically(output_dir / "model.pkl",
+                       lambda f: pickle.dump(model, f))
+
+    write_manifest(output_dir, features, metadata={
+        "neighbor_index": describe_neighbor_index(model),
+        "scikit_learn": sklearn.__version__,
+        **(metadata or {}),
+    })
+
+
+def load_served_model(
+        output_dir: pathlib.Path) -> Tuple[CompiledKNNPredictor, List[str]]:
+    """Load the saved model's scaler and scaled training rows.
+
+    Reads the memory-mapped artifact when it exists, so appending doesn't
+    unpickle the full model.
+
+    Args:
+        output_dir: directory holding the model artifacts
+
+    Returns:
+        Tuple of the model's predictor and its feature list.
+
+    """
+    artifact_dir = output_dir / ARTIFACT_DIR
+    if (artifact_dir / METADATA_FILE).exists():
+        predictor, document = load_knn_artifact(artifact_dir)
+        return predictor, document["features"]
+
+    model = pickle.load(open(output_dir / "model.pkl", 'rb'))
+    features = json.load(open(output_dir / "model_features.json", 'r'))
+    return CompiledKNNPredictor.from_pipeline(model, features), features
+
+
+def load_current_delta(output_dir: pathlib.Path,
+                       predictor: CompiledKNNPredictor,
+                       features: List[str]) -> Tuple[numpy.ndarray, numpy.ndarray]:
+    """Load the rows already appended to the saved model.
+
+    Args:
+        output_dir: directory holding the model artifacts
+        predictor: the saved model's predictor
+        features: the saved model's feature list
+
+    Returns:
+        Tuple of the appended raw feature rows and their prices; both empty
+        when there is no delta, or it was written for another model.
+
+    """
+    empty = (numpy.empty((0, len(features))), numpy.empty(0))
+    if not (output_dir / DELTA_FILE).exists():
+        return empty
+    x_delta, y_delta, document = load_delta(output_dir)
+    if document["features"] != features or not matches_base(
+            document, predictor, len(predictor.fit_X)):
+        print("Discarding a delta written for another model")
+        return empty
+    return x_delta, y_delta
 
-    # Output model artifacts: pickled model and JSON list of features
-    pickle.dump(model, open(output_dir / "model.pkl", 'wb'))
-    json.dump(list(x_train.columns),
-              open(output_dir / "model_features.json", 'w'))
+
+def refit(x: pandas.DataFrame, y: pandas.Series, output_dir: pathlib.Path,
+          metadata: Dict = None):
+    """Fit a new model on every row and replace the saved artifacts.
+
+    Args:
+        x: features of every training row
+        y: target (home sale price) of every training row
+        output_dir: directory where the model artifacts will be written
+        metadata: training details recorded in the manifest
+
+    """
+    model = train_model(x, y)
+    print(f"Neighbor index: {describe_neighbor_index(model)}")
+    save_model(model, list(x.columns), output_dir,
+               metadata={"n_train": len(x), **(metadata or {})})
+
+
+def append_sales(sales_path: str, output_dir: str = OUTPUT_DIR,
+                 drift_threshold: float = SCALER_DRIFT_THRESHOLD):
+    """Add new sales to the saved model without refitting it.
+
+    The new rows are enriched like the training data and written as a delta
+    next to the model; the API extends its neighbor search with them without
+    reloading the model. When the new rows would move the scaler by more than
+    ``drift_threshold`` (or the model's index can't take appended rows), the
+    model is refit on everything instead.
+
+    Args:
+        sales_path: path to CSV file with the new home sales
+        output_dir: directory holding the model artifacts
+        drift_threshold: largest tolerated scaler drift
+
+    """
+    output_dir = pathlib.Path(output_dir)
+    predictor, features = load_served_model(output_dir)
+    x_new, y_new = load_data(sales_path, DEMOGRAPHICS_PATH,
+                             SALES_COLUMN_SELECTION)
+    known = x_new[features].notna().all(axis=1)
+    if not known.all():
+        print(f"Skipping {(~known).sum()} sales with unknown ZIP codes")
+    x_new, y_new = x_new.loc[known, features], y_new[known]
+
+    x_delta, y_delta = load_current_delta(output_dir, predictor, features)
+    x_delta = numpy.vstack([x_delta, x_new.to_numpy(dtype=numpy.float64)])
+    y_delta = numpy.concatenate([y_delta, y_new.to_numpy(dtype=numpy.float64)])
+    x_all = numpy.vstack([unscaled_rows(predictor), x_delta])
+    drift = scaler_drift(predictor.center, predictor.scale, x_all)
+    print(f"Appending {len(x_new)} sales ({len(x_delta)} pending), "
+          f"scaler drift {drift:.4f}")
+
+    if drift > drift_threshold or predictor.approximate_index is not None:
+        print("Refitting the full model")
+        y_all = numpy.concatenate([predictor.fit_y, y_delta])
+        refit(pandas.DataFrame(x_all, columns=features),
+              pandas.Series(y_all, name="price"), output_dir,
+              metadata={"mode": "append", "appended_rows": len(x_delta)})
+        return
+
+    save_delta(output_dir, features, base_fingerprint(predictor), x_delta,
+               y_delta, metadata={"scaler_drift": drift})
+
+
+def compact(output_dir: str = OUTPUT_DIR):
+    """Fold the appended rows into a full refit of the model.
+
+    Refits the scaler and rebuilds the neighbor index over the saved model's
+    training rows plus the delta, then removes the delta.
+
+    Args:
+        output_dir: directory holding the model artifacts
+
+    """
+    output_dir = pathlib.Path(output_dir)
+    predictor, features = load_served_model(output_dir)
+    x_delta, y_delta = load_current_delta(output_dir, predictor, features)
+    if not len(x_delta):
+        print("No appended rows to compact")
+        return
+
+    print(f"Compacting {len(x_delta)} appended rows into the model")
+    x_all = numpy.vstack([unscaled_rows(predictor), x_delta])
+    y_all = numpy.concatenate([predictor.fit_y, y_delta])
+    refit(pandas.DataFrame(x_all, columns=features),
+          pandas.Series(y_all, name="price"), output_dir,
+          metadata={"mode": "compact", "appended_rows": len(x_delta)})
+
+
+def main(output_dir: str = OUTPUT_DIR):
+    """Load data, train model, and export artifacts.
+
+    Args:
+        output_dir: directory where the model artifacts will be written
+
+    """
+    x, y = load_data(SALES_PATH, DEMOGRAPHICS_PATH, SALES_COLUMN_SELECTION)
+    x_train, _x_test, y_train, _y_test = model_selection.train_test_split(
+        x, y, random_state=42)
+
+    refit(x_train, y_train, pathlib.Path(output_dir), metadata={
+        "mode": "full",
+        "training_data": sources_digest([pathlib.Path(SALES_PATH),
+                                         pathlib.Path(DEMOGRAPHICS_PATH)]),
+    })
+    # Servers read the demographics cache but never write it
+    load_demographics(DEMOGRAPHICS_PATH)
 
 
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser(description="Train the house price model")
+    parser.add_argument("--append", metavar="SALES_CSV",
+                        help="add new sales to the saved model as a delta")
+    parser.add_argument("--compact", action="store_true",
+                        help="fold appended sales into a full refit")
+    parser.add_argument("--drift-threshold", type=float,
+                        default=SCALER_DRIFT_THRESHOLD)
+    args = parser.parse_args()
+
+    if args.append:
+        append_sales(args.append, drift_threshold=args.drift_threshold)
+    elif args.compact:
+        compact()
+    else:
+        main()
@@ -1,4 +1,5 @@
 from fastapi import Request
+from core.inference_pool import InferencePool
 from services.model_service import ModelService
 
 
@@ -10,3 +11,13 @@ def get_model_service(request: Request) -> ModelService:
     monitored by the watchdog for automatic model reloading.
     """
     return request.app.state.model_service
+
+
+def get_inference_pool(request: Request) -> InferencePool:
+    """
+    Get the inference pool from the FastAPI app state.
+
+    Prediction handlers run feature preparation and model inference on this
+    pool so the event loop stays free for health checks and other requests.
+    """
+    return request.app.state.inference_pool
@@ -0,0 +1,128 @@
+import asyncio
+import functools
+import logging
+import os
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable
+
+logger = logging.getLogger(__name__)
+
+
+class InferencePoolSaturated(Exception):
+    """Raised when the inference pool has no room for another task"""
+
+    def __init__(self, retry_after: int):
+        super().__init__("Inference pool is saturated, retry later")
+        self.retry_after = retry_after
+
+
+class InferencePool:
+    """
+    Bounded thread pool for CPU-bound inference work.
+
+    Feature preparation and model prediction are synchronous, so running them
+    inside an ``async def`` handler blocks the event loop and stalls every
+    other request, including health probes. The pool runs that work on worker
+    threads (NumPy/scikit-learn release the GIL in their numeric kernels) and
+    caps the number of tasks waiting for a worker, so bursts are rejected
+    quickly instead of queueing without bound.
+
+    Configured through environment variables:
+        INFERENCE_POOL_WORKERS: worker threads (default: CPU count, max 4)
+        INFERENCE_MAX_QUEUE: tasks allowed to wait for a worker (default: 64)
+        INFERENCE_RETRY_AFTER: seconds suggested to rejected clients (default: 1)
+    """
+
+    def __init__(self, max_workers: int = None, max_queue: int = None):
+        self.max_workers = max_workers or int(
+            os.getenv("INFERENCE_POOL_WORKERS", str(min(4, os.cpu_count() or 1)))
+        )
+        self.max_queue = (
+            max_queue
+            if max_queue is not None
+            else int(os.getenv("INFERENCE_MAX_QUEUE", "64"))
+        )
+        self.retry_after = int(os.getenv("INFERENCE_RETRY_AFTER", "1"))
+        self.executor = ThreadPoolExecutor(
+            max_workers=self.max_workers, thread_name_prefix="inference"
+        )
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self._active = 0
+        self._submitted = 0
+        self._completed = 0
+        self._failed = 0
+        self._rejected = 0
+        logger.info(
+            f"Inference pool started with {self.max_workers} workers "
+            f"and a queue of {self.max_queue}"
+        )
+
+    def _run_tracked(self, fn: Callable):
+        """Run a task on a worker thread, tracking how many are executing"""
+        with self._lock:
+            self._active += 1
+        try:
+            return fn()
+        finally:
+            with self._lock:
+                self._active -= 1
+
+    def _task_done(self, future: Future):
+        """Account for a finished task once its worker thread is done with it"""
+        with self._lock:
+            self._in_flight -= 1
+            if future.cancelled() or future.exception() is not None:
+                self._failed += 1
+            else:
+                self._completed += 1
+
+    async def run(self, fn: Callable, *args, **kwargs):
+        """
+        Run ``fn(*args, **kwargs)`` on the pool and await its result.
+
+        A task stays in flight until its worker thread finishes it, even if
+        the awaiting request is cancelled first, so backpressure never admits
+        more work than the pool is actually running.
+
+        Raises:
+            InferencePoolSaturated: if every worker is busy and the queue is full
+        """
+        with self._lock:
+            if self._in_flight >= self.max_workers + self.max_queue:
+                self._rejected += 1
+                raise InferencePoolSaturated(self.retry_after)
+            self._in_flight += 1
+            self._submitted += 1
+
+        task = functools.partial(fn, *args, **kwargs)
+        try:
+            future = self.executor.submit(self._run_tracked, task)
+        except RuntimeError:
+            # The executor is shutting down
+            with self._lock:
+                self._in_flight -= 1
+                self._failed += 1
+            raise
+        future.add_done_callback(self._task_done)
+        return await asyncio.wrap_future(future)
+
+    def status(self) -> dict:
+        """Current pool and queue metrics"""
+        with self._lock:
+            return {
+                "max_workers": self.max_workers,
+                "max_queue": self.max_queue,
+                "active_workers": self._active,
+                "queued": max(0, self._in_flight - self._active),
+                "in_flight": self._in_flight,
+                "submitted": self._submitted,
+                "completed": self._completed,
+                "failed": self._failed,
+                "rejected": self._rejected,
+            }
+
+    def shutdown(self):
+        """Stop accepting work and wait for running tasks to finish"""
+        self.executor.shutdown(wait=True)
@@ -0,0 +1,480 @@
+"""
+Lightweight Prometheus-style metrics.
+
+A small in-process registry of counters, gauges and histograms rendered in
+the Prometheus text exposition format, with no client library dependency.
+Recording a value is a dict lookup and an increment under a per-metric
+lock, cheap enough for the prediction hot path.
+
+When several worker processes serve one container (see ``core.prefork``),
+set ``METRICS_DIR`` to a directory private to that container. Each process
+then writes a snapshot of its metrics there within
+``METRICS_FLUSH_INTERVAL`` seconds of serving a request, and on every
+scrape. ``/metrics`` merges the snapshots: counters and histograms are
+summed across processes, and still count processes that have exited.
+Gauges are reported per live process with a ``pid`` label. Every series
+carries a ``container`` label (``HOSTNAME``) so scrapes of different
+replicas stay distinguishable.
+"""
+
+import asyncio
+import json
+import logging
+import os
+import threading
+import time
+from bisect import bisect_left
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Latency buckets in seconds, from sub-millisecond stages to slow batches
+DEFAULT_BUCKETS = (
+    0.0001,
+    0.00025,
+    0.0005,
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+)
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _format_value(value: float) -> str:
+    """Render a sample value the way Prometheus expects"""
+    if value == float("inf"):
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str]) -> str:
+    """Render a label set as {name="value",...}"""
+    if not names:
+        return ""
+    pairs = []
+    for name, value in zip(names, values):
+        escaped = str(value).replace("\\", "\\\\").replace('"', '\\"')
+        escaped = escaped.replace("\n", "\\n")
+        pairs.append(f'{name}="{escaped}"')
+    return "{" + ",".join(pairs) + "}"
+
+
+class Metric:
+    """Base class holding one value per label combination"""
+
+    type = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._values: Dict[Tuple[str, ...], object] = {}
+
+    def _key(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def samples(self) -> List[Tuple[Tuple[str, ...], object]]:
+        """Copy of every (label values, value) pair"""
+        with self._lock:
+            return [(key, self._copy(value)) for key, value in self._values.items()]
+
+    @staticmethod
+    def _copy(value):
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._values.clear()
+
+
+class Counter(Metric):
+    """Monotonically increasing total"""
+
+    type = "counter"
+
+    def inc(self, amount: float = 1.0, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def set_total(self, value: float, **labels):
+        """Mirror a total that is counted elsewhere (e.g. cache statistics)"""
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = float(value)
+
+
+class Gauge(Metric):
+    """Value that can go up and down"""
+
+    type = "gauge"
+
+    def set(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = float(value)
+
+    def replace(self, value: float, **labels):
+        """Set one label combination and drop all others (e.g. model version)"""
+        key = self._key(labels)
+        with self._lock:
+            self._values = {key: float(value)}
+
+
+class Histogram(Metric):
+    """Distribution of observations over fixed buckets"""
+
+    type = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+    ):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                # Per-bucket (non-cumulative) counts, +Inf last, then the sum
+                state = self._values[key] = [0] * (len(self.buckets) + 1) + [0.0]
+            state[index] += 1
+            state[-1] += value
+
+    @staticmethod
+    def _copy(value):
+        return list(value)
+
+
+class MetricsRegistry:
+    """Collection of metrics rendered together on /metrics"""
+
+    def __init__(self):
+        self._metrics: Dict[str, Metric] = {}
+        self._collectors: List[Callable[[], None]] = []
+        self.container = os.getenv("HOSTNAME", "unknown")
+        self.directory = os.getenv("METRICS_DIR") or None
+        self.flush_interval = float(os.getenv("METRICS_FLUSH_INTERVAL", "5"))
+        self._last_flush = 0.0
+        self._flush_pending = False
+        if self.directory:
+            Path(self.directory).mkdir(parents=True, exist_ok=True)
+
+    def _register(self, metric: Metric) -> Metric:
+        if metric.name in self._metrics:
+            raise ValueError(f"Metric {metric.name} is already registered")
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames=()) -> Counter:
+        return self._register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames=()) -> Gauge:
+        return self._register(Gauge(name, documentation, labelnames))
+
+    def histogram(
+        self, name: str, documentation: str, labelnames=(), buckets=DEFAULT_BUCKETS
+    ) -> Histogram:
+        return self._register(Histogram(name, documentation, labelnames, buckets))
+
+    def add_collector(self, collector: Callable[[], None]):
+        """Register a callback that refreshes mirrored values before export"""
+        self._collectors.append(collector)
+
+    def collect(self):
+        """Run the collectors, logging (not raising) their failures"""
+        for collector in self._collectors:
+            try:
+                collector()
+            except Exception as e:
+                logger.warning(f"Metrics collector failed: {e}")
+
+    def snapshot(self) -> Dict:
+        """JSON-serializable copy of every metric in this process"""
+        return {
+            "pid": os.getpid(),
+            "metrics": {
+                name: {
+                    "type": metric.type,
+                    "help": metric.documentation,
+                    "labelnames": list(metric.labelnames),
+                    "buckets": list(getattr(metric, "buckets", ())),
+                    "samples": [[list(key), value] for key, value in metric.samples()],
+                }
+                for name, metric in self._metrics.items()
+            },
+        }
+
+    def reset_directory(self):
+        """Remove this container's snapshots left over from a previous run"""
+        if not self.directory:
+            return
+        for path in Path(self.directory).glob(f"{self.container}-*.json"):
+            path.unlink(missing_ok=True)
+
+    def _snapshot_path(self, pid: int) -> Path:
+        return Path(self.directory) / f"{self.container}-{pid}.json"
+
+    def flush(self):
+        """Write this process's snapshot for other workers to merge"""
+        if not self.directory:
+            return
+        self.collect()
+        path = self._snapshot_path(os.getpid())
+        tmp_path = path.with_name(f".{path.name}.tmp")
+        tmp_path.write_text(json.dumps(self.snapshot()))
+        os.replace(tmp_path, path)
+        self._last_flush = time.monotonic()
+
+    def schedule_flush(self):
+        """Flush within the flush interval; called on the event loop after requests"""
+        if not self.directory or self._flush_pending:
+            return
+        self._flush_pending = True
+        delay = max(0.0, self.flush_interval - (time.monotonic() - self._last_flush))
+        asyncio.get_running_loop().call_later(delay, self._deferred_flush)
+
+    def _deferred_flush(self):
+        self._flush_pending = False
+        try:
+            self.flush()
+        except OSError as e:
+            logger.warning(f"Could not write metrics snapshot: {e}")
+
+    def _snapshots(self) -> List[Dict]:
+        """This process's snapshot plus every readable one in METRICS_DIR"""
+        if not self.directory:
+            self.collect()
+            return [self.snapshot()]
+
+        self.flush()
+        snapshots = []
+        for path in Path(self.directory).glob(f"{self.container}-*.json"):
+            try:
+                snapshots.append(json.loads(path.read_text()))
+            except (OSError, ValueError):
+                # Being replaced right now; the next scrape will read it
+                continue
+        return snapshots
+
+    @staticmethod
+    def _alive(pid: int) -> bool:
+        try:
+            os.kill(pid, 0)
+        except ProcessLookupError:
+            return False
+        except PermissionError:
+            pass
+        return True
+
+    def render(self) -> str:
+        """All metrics, merged across processes, in text exposition format"""
+        snapshots = self._snapshots()
+        multiprocess = self.directory is not None
+        lines = []
+        for name, metric in self._metrics.items():
+            lines.append(f"# HELP {name} {metric.documentation}")
+            lines.append(f"# TYPE {name} {metric.type}")
+            merged: Dict[Tuple[str, ...], object] = {}
+            for snapshot in snapshots:
+                entry = snapshot["metrics"].get(name)
+                if entry is None:
+                    continue
+                if metric.type == "gauge" and multiprocess:
+                    if not self._alive(snapshot["pid"]):
+                        continue
+                    for key, value in entry["samples"]:
+                        merged[tuple(key) + (str(snapshot["pid"]),)] = value
+                    continue
+                for key, value in entry["samples"]:
+                    key = tuple(key)
+                    if metric.type == "histogram":
+                        total = merged.setdefault(key, [0] * len(value))
+                        for i, count in enumerate(value):
+                            total[i] += count
+                    else:
+                        merged[key] = merged.get(key, 0.0) + value
+
+            labelnames = ("container",) + metric.labelnames
+            if metric.type == "gauge" and multiprocess:
+                labelnames += ("pid",)
+            for key in sorted(merged):
+                value = merged[key]
+                labelvalues = (self.container,) + key
+                if metric.type == "histogram":
+                    lines.extend(
+                        self._render_histogram(metric, labelnames, labelvalues, value)
+                    )
+                else:
+                    labels = _format_labels(labelnames, labelvalues)
+                    lines.append(f"{name}{labels} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+    @staticmethod
+    def _render_histogram(metric, labelnames, labelvalues, state) -> List[str]:
+        lines = []
+        cumulative = 0
+        bounds = list(metric.buckets) + [float("inf")]
+        for bound, count in zip(bounds, state[:-1]):
+            cumulative += count
+            labels = _format_labels(
+                labelnames + ("le",), labelvalues + (_format_value(bound),)
+            )
+            lines.append(f"{metric.name}_bucket{labels} {cumulative}")
+        labels = _format_labels(labelnames, labelvalues)
+        lines.append(f"{metric.name}_sum{labels} {_format_value(state[-1])}")
+        lines.append(f"{metric.name}_count{labels} {cumulative}")
+        return lines
+
+    def clear(self):
+        """Reset every metric (used by tests)"""
+        for metric in self._metrics.values():
+            metric.clear()
+
+
+REGISTRY = MetricsRegistry()
+
+# Per-stage latency of a prediction request, for single and batch requests
+STAGE_SECONDS = REGISTRY.histogram(
+    "prediction_stage_seconds",
+    "Time spent in each stage of a prediction request",
+    ["stage", "mode"],
+)
+HTTP_REQUESTS = REGISTRY.counter(
+    "http_requests_total", "HTTP requests by route and status code", ["route", "status"]
+)
+HTTP_SECONDS = REGISTRY.histogram(
+    "http_request_duration_seconds",
+    "Time from receiving a request to sending the response headers",
+    ["route"],
+)
+PREDICTIONS = REGISTRY.counter(
+    "predictions_total", "Records predicted, by endpoint", ["endpoint"]
+)
+PREDICTION_ERRORS = REGISTRY.counter(
+    "prediction_errors_total",
+    "Prediction failures by endpoint and reason (validation, saturated, internal)",
+    ["endpoint", "reason"],
+)
+MODEL_RELOADS = REGISTRY.counter(
+    "model_reloads_total", "Model reload attempts by result", ["result"]
+)
+DEMOGRAPHICS_REFRESHES = REGISTRY.counter(
+    "demographics_refreshes_total",
+    "Demographics reloads re-published under the current model",
+)
+CACHE_LOOKUPS = REGISTRY.counter(
+    "prediction_cache_lookups_total", "Prediction cache lookups by result", ["result"]
+)
+MODEL_INFO = REGISTRY.gauge(
+    "model_info", "Always 1; labelled with the model version being served", ["version"]
+)
+MODEL_LOAD_SECONDS = REGISTRY.gauge(
+    "model_load_seconds", "Time taken to build and warm up the current model"
+)
+MODEL_LOADED_AT = REGISTRY.gauge(
+    "model_loaded_timestamp_seconds", "Unix time the current model was loaded"
+)
+INFERENCE_IN_FLIGHT = REGISTRY.gauge(
+    "inference_pool_in_flight", "Predictions running or queued on the inference pool"
+)
+
+
+def track_services(model_service, inference_pool, registry: MetricsRegistry = REGISTRY):
+    """Mirror model, cache and pool state into metrics at export time"""
+
+    def collect():
+        bundle = model_service.bundle
+        if bundle is not None:
+            MODEL_INFO.replace(1, version=bundle.version)
+            MODEL_LOADED_AT.set(bundle.loaded_at)
+        if model_service.last_load_seconds is not None:
+            MODEL_LOAD_SECONDS.set(model_service.last_load_seconds)
+        MODEL_RELOADS.set_total(model_service.reload_count, result="success")
+        MODEL_RELOADS.set_total(model_service.reload_failures, result="failure")
+        DEMOGRAPHICS_REFRESHES.set_total(model_service.demographics_refresh_count)
+        if model_service.prediction_cache is not None:
+            status = model_service.prediction_cache.status()
+            CACHE_LOOKUPS.set_total(status["hits"], result="hit")
+            CACHE_LOOKUPS.set_total(status["misses"], result="miss")
+        INFERENCE_IN_FLIGHT.set(inference_pool.status()["in_flight"])
+
+    registry.add_collector(collect)
+
+
+class MetricsMiddleware:
+    """
+    ASGI middleware timing requests and the response stage.
+
+    Stamps ``request.state.received_at`` when a request arrives, so handlers
+    can time request parsing and validation. When the response headers go
+    out it records the request duration and status by route, and, if the
+    handler set ``request.state.predicted_at``, the ``response`` stage
+    (building and serializing the response body).
+    """
+
+    def __init__(self, app, registry: MetricsRegistry = REGISTRY):
+        self.app = app
+        self.registry = registry
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        received_at = time.perf_counter()
+        state = scope.setdefault("state", {})
+        state["received_at"] = received_at
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                now = time.perf_counter()
+                route = scope.get("route")
+                # Unmatched paths share one label to keep cardinality bounded
+                route = route.path if route is not None else "unmatched"
+                HTTP_REQUESTS.inc(route=route, status=message["status"])
+                HTTP_SECONDS.observe(now - received_at, route=route)
+                predicted_at = state.get("predicted_at")
+                if predicted_at is not None:
+                    STAGE_SECONDS.observe(
+                        now - predicted_at, stage="response", mode=state["mode"]
+                    )
+            await send(message)
+
+        await self.app(scope, receive, send_wrapper)
+        self.registry.schedule_flush()
+
+
+def mark_handler_start(request, mode: str) -> Optional[float]:
+    """Record the validation stage (arrival to handler entry) for a request"""
+    now = time.perf_counter()
+    received_at = getattr(request.state, "received_at", None)
+    request.state.mode = mode
+    if received_at is not None:
+        STAGE_SECONDS.observe(now - received_at, stage="validation", mode=mode)
+    return now
+
+
+def mark_predicted(request):
+    """Start the response stage; the middleware ends it at response start"""
+    request.state.predicted_at = time.perf_counter()
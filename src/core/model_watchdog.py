@@ -2,13 +2,87 @@ import logging
 import os
 import time
 from pathlib import Path
-from threading import Thread
+from threading import Event, Lock, Thread
 from watchdog.observers import Observer
 from watchdog.events import FileSystemEventHandler
 
+from services.model_delta import DELTA_FILE
+from services.model_manifest import MANIFEST_FILE, read_manifest
+
 # Configure logging
 logger = logging.getLogger(__name__)
 
+# A new full model, or rows appended to the current one (create_model.py --append).
+# Reloads are skipped when the model files' content hash is unchanged
+WATCHED_FILES = ("model.pkl", MANIFEST_FILE, DELTA_FILE)
+# The poller stats these; model.pkl too, since a copied-in pickle may come
+# without a new manifest
+POLLED_FILES = WATCHED_FILES
+
+WATCHER_BACKENDS = ("auto", "inotify", "poll")
+# Mounts where inotify misses writes made by other hosts or the container host
+POLLING_FILESYSTEMS = (
+    "nfs", "nfs4", "cifs", "smb3", "smbfs", "9p", "virtiofs", "overlay", "fuse",
+)
+
+# How the running watcher detects changes, and how quickly it has done so
+_status_lock = Lock()
+_watcher_status = {
+    "backend": None,
+    "filesystem": None,
+    "poll_interval": None,
+    "detections": 0,
+    "last_detection_latency": None,
+    "max_detection_latency": None,
+}
+_active_watcher = None
+
+
+def filesystem_type(path):
+    """Type of the filesystem mounted at path, from /proc/mounts (None if unknown)"""
+    try:
+        with open("/proc/mounts", "r") as f:
+            mounts = [line.split()[1:3] for line in f if len(line.split()) > 2]
+    except OSError:
+        return None
+    resolved = os.path.realpath(path)
+    best, fs_type = "", None
+    for mount_point, mount_type in mounts:
+        mount_point = mount_point.replace("\\040", " ")
+        inside = resolved == mount_point or resolved.startswith(
+            mount_point.rstrip("/") + "/"
+        )
+        if inside and len(mount_point) >= len(best):
+            best, fs_type = mount_point, mount_type
+    return fs_type
+
+
+def choose_backend(model_dir):
+    """The watcher backend to use for model_dir, from MODEL_WATCHER_BACKEND"""
+    backend = os.getenv("MODEL_WATCHER_BACKEND", "auto").lower()
+    if backend not in WATCHER_BACKENDS:
+        raise ValueError(f"MODEL_WATCHER_BACKEND must be one of {WATCHER_BACKENDS}")
+    if backend != "auto":
+        return backend
+    fs_type = filesystem_type(model_dir) or ""
+    return "poll" if fs_type.split(".")[0] in POLLING_FILESYSTEMS else "inotify"
+
+
+def _record_detection(path):
+    """Track how long after its last write a model file change was noticed"""
+    try:
+        latency = max(0.0, time.time() - os.stat(path).st_mtime)
+    except OSError:
+        # Removed (e.g. a compacted delta): its write time is unknown
+        latency = None
+    with _status_lock:
+        _watcher_status["detections"] += 1
+        if latency is not None:
+            _watcher_status["last_detection_latency"] = latency
+            _watcher_status["max_detection_latency"] = max(
+                latency, _watcher_status["max_detection_latency"] or 0.0
+            )
+
 
 class ModelFileChangeHandler(FileSystemEventHandler):
     """
@@ -16,12 +90,16 @@ class ModelFileChangeHandler(FileSystemEventHandler):
 
     This handler automatically reloads the model when the model.pkl file
     is modified, enabling hot-reloading during development and deployment.
+    A new delta.json only extends the loaded model with the appended rows.
 
-    Enhanced for multi-container environments with shared volumes.
+    Enhanced for multi-container environments with shared volumes. In
+    coordinated rollout mode it only wakes the RolloutCoordinator, which
+    decides when this replica loads the new model.
     """
 
-    def __init__(self, model_service):
+    def __init__(self, model_service, rollout=None):
         self.model_service = model_service
+        self.rollout = rollout
         self.last_modified = 0
         self.debounce_time = float(os.getenv('MODEL_RELOAD_DEBOUNCE', '1.0'))
         self.container_id = os.getenv('HOSTNAME', 'unknown')
@@ -34,67 +112,180 @@ class ModelFileChangeHandler(FileSystemEventHandler):
         Args:
             event: FileSystemEvent containing information about the change
         """
-        if not event.is_directory and event.src_path.endswith("model.pkl"):
-            current_time = time.time()
+        # Moves (atomic replaces) are forwarded here; the new name is what counts
+        path = getattr(event, "dest_path", None) or event.src_path
+        if not event.is_directory and path.endswith(WATCHED_FILES):
+            self.handle_change(path)
 
-            # Debounce to prevent multiple rapid reloads
-            if current_time - self.last_modified > self.debounce_time:
-                logger.info(f"Model file changed: {event.src_path}")
-                logger.info(f"Container {self.container_id} reloading model...")
+    def handle_change(self, path):
+        """
+        Reload (or wake the rollout coordinator) for a changed model file.
 
-                try:
-                    # Get current model version before reload
-                    old_version = getattr(self.model_service, 'model_version', 'unknown')
+        Args:
+            path: Path of the changed file, from an event or the poller
+        """
+        _record_detection(path)
+        if self.rollout is not None:
+            logger.info(f"Model file changed: {path}; waking the rollout coordinator")
+            self.rollout.wake()
+            return
 
-                    # Reload the model
-                    self.model_service.reload_model()
+        current_time = time.time()
 
-                    # Get new model version
-                    new_version = getattr(self.model_service, 'model_version', 'unknown')
+        # Debounce to prevent multiple rapid reloads
+        if current_time - self.last_modified > self.debounce_time:
+            logger.info(f"Model file changed: {path}")
+            logger.info(f"Container {self.container_id} reloading model...")
+
+            try:
+                # Get current model version before reload
+                old_version = getattr(self.model_service, 'model_version', 'unknown')
 
-                    logger.info(f"Container {self.container_id} model reloaded successfully")
-                    logger.info(f"Model version: {old_version} → {new_version}")
+                # Reload the model
+                self.model_service.reload_model()
 
-                    # Log model file details
-                    model_path = Path(event.src_path)
-                    if model_path.exists():
-                        stat = model_path.stat()
-                        logger.info(f"Model file size: {stat.st_size} bytes, modified: {stat.st_mtime}")
+                # Get new model version
+                new_version = getattr(self.model_service, 'model_version', 'unknown')
 
-                except Exception as e:
-                    logger.error(f"Container {self.container_id} failed to reload model: {e}")
+                logger.info(f"Container {self.container_id} model reloaded successfully")
+                logger.info(f"Model version: {old_version} → {new_version}")
 
-                self.last_modified = current_time
-            else:
-                logger.debug(f"Container {self.container_id}: Model file change detected but debounced")
+                # Log model file details
+                model_path = Path(path)
+                if model_path.exists():
+                    stat = model_path.stat()
+                    logger.info(f"Model file size: {stat.st_size} bytes, modified: {stat.st_mtime}")
+
+            except Exception as e:
+                logger.error(f"Container {self.container_id} failed to reload model: {e}")
+
+            self.last_modified = current_time
+        else:
+            logger.debug(f"Container {self.container_id}: Model file change detected but debounced")
 
     def on_created(self, event):
         """Handle file creation events (e.g., new model file)"""
-        if not event.is_directory and event.src_path.endswith("model.pkl"):
+        if not event.is_directory and event.src_path.endswith(WATCHED_FILES):
             logger.info(f"Container {self.container_id}: New model file detected: {event.src_path}")
             # Trigger reload for new files
             self.on_modified(event)
 
     def on_moved(self, event):
         """Handle file move events (e.g., model replacement)"""
-        if not event.is_directory and event.dest_path.endswith("model.pkl"):
+        if not event.is_directory and event.dest_path.endswith(WATCHED_FILES):
             logger.info(f"Container {self.container_id}: Model file moved to: {event.dest_path}")
             # Trigger reload for moved files
             self.on_modified(event)
 
 
-def start_file_watcher(model_service, model_dir="model"):
+class ManifestPoller:
+    """
+    Stat-based fallback for filesystems that don't deliver inotify events.
+
+    Each poll stats the model, manifest and delta files (never hashing the
+    pickle) and hands changes to the same handler the event backend uses.
+    The interval starts at min_interval, grows by backoff on every quiet
+    poll up to max_interval, and drops back to min_interval after a change,
+    so an idle model directory costs a couple of stat calls every few seconds.
+    """
+
+    def __init__(self, handler, model_dir, min_interval=0.5, max_interval=5.0,
+                 backoff=1.5):
+        self.handler = handler
+        self.model_dir = Path(model_dir)
+        self.min_interval = min_interval
+        self.max_interval = max(min_interval, max_interval)
+        self.backoff = backoff
+        self.interval = min_interval
+        with _status_lock:
+            _watcher_status["poll_interval"] = self.interval
+        self.signatures = {name: self._signature(name) for name in POLLED_FILES}
+        self._stopped = Event()
+        self._thread = None
+
+    def _signature(self, name):
+        """What identifies a version of a polled file, or None if it's missing"""
+        try:
+            stat = (self.model_dir / name).stat()
+        except FileNotFoundError:
+            return None
+        return stat.st_mtime_ns, stat.st_size, stat.st_ino
+
+    # One poll; also called directly by tests
+    def poll_once(self):
+        """Report changed files to the handler and adapt the interval"""
+        changed = []
+        for name in POLLED_FILES:
+            signature = self._signature(name)
+            if signature != self.signatures[name]:
+                self.signatures[name] = signature
+                changed.append(str(self.model_dir / name))
+        for path in changed:
+            self.handler.handle_change(path)
+        if changed:
+            self.interval = self.min_interval
+        else:
+            self.interval = min(self.interval * self.backoff, self.max_interval)
+        with _status_lock:
+            _watcher_status["poll_interval"] = self.interval
+        return changed
+
+    def start(self):
+        """Poll in a daemon thread"""
+        self._thread = Thread(target=self._run, daemon=True, name="ModelPoller")
+        self._thread.start()
+
+    def stop(self):
+        """Stop polling"""
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+
+    def _run(self):
+        while not self._stopped.wait(self.interval):
+            try:
+                self.poll_once()
+            except Exception as e:
+                logger.error(f"Model file poll failed: {e}")
+
+
+def _start_observer(event_handler, model_path):
+    """Start an inotify (or platform) observer; it runs in its own daemon thread"""
+    observer = Observer()
+    observer.daemon = True
+    observer.schedule(event_handler, path=str(model_path), recursive=False)
+    observer.start()
+    return observer
+
+
+def _start_poller(event_handler, model_path):
+    """Start a ManifestPoller configured from the environment"""
+    poller = ManifestPoller(
+        event_handler,
+        model_path,
+        min_interval=float(os.getenv("MODEL_POLL_MIN_INTERVAL", "0.5")),
+        max_interval=float(os.getenv("MODEL_POLL_MAX_INTERVAL", "5.0")),
+    )
+    poller.start()
+    return poller
+
+
+def start_file_watcher(model_service, model_dir="model", rollout=None):
     """
     Start the file watcher to monitor model file changes.
 
     Args:
         model_service: The ModelService instance to reload when files change
         model_dir: Directory to monitor for changes (default: "model")
+        rollout: RolloutCoordinator to wake instead of reloading directly
 
     The watchdog runs in a background thread and automatically reloads
     the model when model.pkl is modified, enabling zero-downtime updates
-    across multiple containers with shared volumes.
+    across multiple containers with shared volumes. MODEL_WATCHER_BACKEND
+    picks inotify events or the stat poller; "auto" polls on network and
+    overlay filesystems, where events for other hosts' writes never arrive.
     """
+    global _active_watcher
     try:
         # Check if watchdog is enabled via environment variable
         if not os.getenv('MODEL_WATCHDOG_ENABLED', 'true').lower() in ('true', '1', 'yes'):
@@ -113,40 +304,44 @@ def start_file_watcher(model_service, model_dir="model"):
             logger.warning(f"Model file {model_file} does not exist yet")
             logger.info("Watchdog will monitor for model file creation")
 
-        # Create event handler and observer
-        event_handler = ModelFileChangeHandler(model_service)
-        observer = Observer()
-
-        # Schedule the event handler to watch the model directory
-        observer.schedule(event_handler, path=str(model_path), recursive=False)
-
-        # Start the observer
-        observer.start()
-        container_id = os.getenv('HOSTNAME', 'unknown')
-        logger.info(f"Container {container_id}: Started file watcher for model changes in {model_dir}/")
-
-        # Start monitoring in background thread
-        def watch():
+        stop_file_watcher()
+        event_handler = ModelFileChangeHandler(model_service, rollout)
+        backend = choose_backend(model_path)
+        if backend == "inotify":
             try:
-                while observer.is_alive():
-                    time.sleep(1)
-            except KeyboardInterrupt:
-                logger.info(f"Container {container_id}: Stopping file watcher...")
-                observer.stop()
-            finally:
-                observer.join()
-                logger.info(f"Container {container_id}: File watcher stopped")
-
-        # Start monitoring thread as daemon (will stop when main process stops)
-        watch_thread = Thread(target=watch, daemon=True, name=f"ModelWatchdog-{container_id}")
-        watch_thread.start()
-
+                _active_watcher = _start_observer(event_handler, model_path)
+            except OSError as e:
+                # e.g. the inotify watch limit is exhausted
+                logger.warning(f"File events unavailable ({e}); polling instead")
+                backend = "poll"
+        if backend == "poll":
+            _active_watcher = _start_poller(event_handler, model_path)
+
+        with _status_lock:
+            _watcher_status["backend"] = backend
+            _watcher_status["filesystem"] = filesystem_type(model_path)
+        container_id = os.getenv('HOSTNAME', 'unknown')
+        logger.info(
+            f"Container {container_id}: Started {backend} file watcher for model "
+            f"changes in {model_dir}/"
+        )
         return True
 
     except Exception as e:
         logger.error(f"Failed to start file watcher: {e}")
         return False
 
+
+def stop_file_watcher():
+    """Stop the running file watcher, if any"""
+    global _active_watcher
+    watcher, _active_watcher = _active_watcher, None
+    if watcher is not None:
+        watcher.stop()
+        if not isinstance(watcher, ManifestPoller):
+            watcher.join(timeout=5)
+
+
 def get_watchdog_status():
     """
     Get the current status of the watchdog system.
@@ -183,4 +378,12 @@ def get_watchdog_status():
             "model_file_path": str(model_path)
         })
 
+    # Content hash recorded by create_model.py; the served version is its prefix
+    manifest = read_manifest(model_dir)
+    status["manifest_content_hash"] = manifest["content_hash"] if manifest else None
+
+    # Backend in use, and seconds from a model file's write to its detection
+    with _status_lock:
+        status["watcher"] = dict(_watcher_status)
+
     return status
@@ -0,0 +1,415 @@
+"""
+Pre-fork supervisor for running several uvicorn workers over one model load.
+
+``uvicorn --workers N`` starts N fresh interpreters, and each one imports
+``src.main`` and so loads the model, the demographics CSV and the warm-up
+examples on its own. The supervisor instead imports the app once, freezes the
+garbage collector and then forks the workers, so they inherit the loaded
+bundle copy-on-write and all accept connections on one shared socket.
+
+Usage:
+    python -m core.prefork --workers 4 --port 8000
+
+Signals sent to the supervisor:
+    SIGHUP   reload the model and fan the reload out to every worker
+    SIGUSR1  log the RSS/PSS of the supervisor and each worker
+    SIGTERM  graceful shutdown (SIGINT does the same)
+"""
+
+import argparse
+import gc
+import logging
+import os
+import signal
+import socket
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List
+
+import uvicorn
+from uvicorn.importer import import_from_string
+
+from core.logging_config import setup_logging
+from core.metrics import REGISTRY
+
+logger = logging.getLogger(__name__)
+
+# How workers pick up a new model: SIGHUP each one, or replace them with forks
+RELOAD_MODES = ("signal", "recycle")
+# Fields read from /proc/<pid>/smaps_rollup, reported in kB
+MEMORY_FIELDS = (
+    "Rss",
+    "Pss",
+    "Shared_Clean",
+    "Shared_Dirty",
+    "Private_Clean",
+    "Private_Dirty",
+)
+# Set in each worker so the API can find its supervisor and siblings
+SUPERVISOR_PID_ENV = "PREFORK_SUPERVISOR_PID"
+
+
+def process_memory(pid: int) -> Dict[str, int]:
+    """Resident memory breakdown of a process in kB (Linux /proc)"""
+    memory = {}
+    try:
+        with open(f"/proc/{pid}/smaps_rollup") as f:
+            for line in f:
+                name, _, value = line.partition(":")
+                if name in MEMORY_FIELDS:
+                    memory[f"{name.lower()}_kb"] = int(value.split()[0])
+    except OSError:
+        # Kernels without smaps_rollup still report the total resident set
+        try:
+            with open(f"/proc/{pid}/status") as f:
+                for line in f:
+                    if line.startswith("VmRSS:"):
+                        memory["rss_kb"] = int(line.split()[1])
+        except OSError:
+            pass
+    return memory
+
+
+def child_pids(parent_pid: int) -> List[int]:
+    """PIDs of the direct children of a process, found by scanning /proc"""
+    pids = []
+    for entry in Path("/proc").iterdir():
+        if not entry.name.isdigit():
+            continue
+        try:
+            stat = (entry / "stat").read_text()
+        except OSError:
+            continue
+        # The command name may contain spaces; fields resume after the last ")"
+        fields = stat.rpartition(")")[2].split()
+        if int(fields[1]) == parent_pid:
+            pids.append(int(entry.name))
+    return sorted(pids)
+
+
+def worker_status() -> Dict:
+    """Launch mode plus the memory of the supervisor and each worker"""
+    pid = os.getpid()
+    supervisor_pid = os.getenv(SUPERVISOR_PID_ENV)
+    if supervisor_pid is None:
+        return {
+            "mode": "single",
+            "worker_pid": pid,
+            "workers": [{"pid": pid, **process_memory(pid)}],
+        }
+
+    supervisor_pid = int(supervisor_pid)
+    return {
+        "mode": "prefork",
+        "worker_pid": pid,
+        "supervisor": {"pid": supervisor_pid, **process_memory(supervisor_pid)},
+        "workers": [
+            {"pid": child, **process_memory(child)}
+            for child in child_pids(supervisor_pid)
+        ],
+    }
+
+
+class PreforkSupervisor:
+    """
+    Load the app once, fork uvicorn workers and keep them running.
+
+    The supervisor owns the listening socket and the model watch: when the
+    model files or the appended rows (``delta.json``) change, or on SIGHUP,
+    it reloads its own copy, so workers forked later start with the new
+    model, then fans the reload out. In ``signal`` mode every worker is sent
+    SIGHUP and reloads whatever changed in place; in
+    ``recycle`` mode workers are replaced one at a time by fresh forks, which
+    keeps the new bundle shared copy-on-write at the cost of reconnections.
+
+    Configured through environment variables:
+        PREFORK_WORKERS: worker processes (default: CPU count)
+        PREFORK_RELOAD_MODE: signal or recycle (default: signal)
+        PREFORK_WATCH_INTERVAL: seconds between model file checks (default: 1)
+        PREFORK_GRACEFUL_TIMEOUT: seconds workers get to drain (default: 30)
+    """
+
+    def __init__(
+        self,
+        app: str = "src.main:app",
+        host: str = "0.0.0.0",
+        port: int = 8000,
+        workers: int = None,
+        reload_mode: str = None,
+    ):
+        self.app_path = app
+        self.host = host
+        self.port = port
+        self.workers = workers or int(
+            os.getenv("PREFORK_WORKERS", str(os.cpu_count() or 1))
+        )
+        self.reload_mode = reload_mode or os.getenv("PREFORK_RELOAD_MODE", "signal")
+        if self.reload_mode not in RELOAD_MODES:
+            raise ValueError(
+                f"Unknown reload mode {self.reload_mode!r}; "
+                f"expected one of {RELOAD_MODES}"
+            )
+        self.watch_interval = float(os.getenv("PREFORK_WATCH_INTERVAL", "1.0"))
+        self.graceful_timeout = float(os.getenv("PREFORK_GRACEFUL_TIMEOUT", "30"))
+        self.debounce_time = float(os.getenv("MODEL_RELOAD_DEBOUNCE", "1.0"))
+        self.watch_model = os.getenv("MODEL_WATCHDOG_ENABLED", "true").lower() in (
+            "true",
+            "1",
+            "yes",
+        )
+        self.app = None
+        self.model_service = None
+        self.socket = None
+        # Live workers (pid -> slot) and workers draining after a recycle
+        self.children: Dict[int, int] = {}
+        self.retiring = set()
+        self._reload_requested = False
+        self._report_requested = False
+        self._stopping = False
+
+    def load(self):
+        """Import the app in the supervisor so the model is loaded only once"""
+        # Workers of a previous run must not be merged into this one's metrics
+        REGISTRY.reset_directory()
+        self.app = import_from_string(self.app_path)
+        self.model_service = self.app.state.model_service
+        self._freeze()
+
+    @staticmethod
+    def _freeze():
+        """Move every live object out of reach of the garbage collector"""
+        # A collection in a worker would otherwise write to the GC headers of
+        # inherited objects and un-share their pages
+        gc.collect()
+        gc.freeze()
+
+    def bind(self):
+        """Open the listening socket that every worker accepts on"""
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        sock.bind((self.host, self.port))
+        sock.listen(2048)
+        sock.set_inheritable(True)
+        self.socket = sock
+
+    def spawn(self, slot: int) -> int:
+        """Fork one worker; returns its pid in the supervisor"""
+        pid = os.fork()
+        if pid == 0:
+            code = 0
+            try:
+                self._run_worker()
+            except BaseException:
+                logger.exception(f"Worker {os.getpid()} crashed")
+                code = 1
+            finally:
+                os._exit(code)
+
+        self.children[pid] = slot
+        logger.info(f"Started worker {pid} (slot {slot})")
+        return pid
+
+    def _run_worker(self):
+        """Serve the inherited app from a forked worker"""
+        for signum in (signal.SIGHUP, signal.SIGUSR1, signal.SIGTERM, signal.SIGINT):
+            signal.signal(signum, signal.SIG_DFL)
+        os.environ[SUPERVISOR_PID_ENV] = str(os.getppid())
+        # The supervisor watches the model file and signals workers instead
+        os.environ["MODEL_WATCHDOG_ENABLED"] = "false"
+        signal.signal(signal.SIGHUP, self._on_worker_sighup)
+
+        config = uvicorn.Config(self.app, lifespan="on")
+        uvicorn.Server(config).run(sockets=[self.socket])
+
+    def _on_worker_sighup(self, signum, frame):
+        """Reload off the event loop thread when the supervisor asks"""
+        threading.Thread(
+            target=self._reload_worker_model, daemon=True, name="PreforkReload"
+        ).start()
+
+    def _reload_worker_model(self):
+        """Load what changed (base model or appended rows) into this worker"""
+        try:
+            self.model_service.reload_model()
+            version = self.model_service.model_version
+            logger.info(f"Worker {os.getpid()} reloaded model {version}")
+        except Exception as e:
+            logger.error(f"Worker {os.getpid()} failed to reload model: {e}")
+
+    def reload(self, force: bool = True):
+        """Reload the model in the supervisor, then in every worker"""
+        try:
+            # An unforced reload only applies appended rows when that's all
+            # that changed, like the watchdog does
+            self.model_service.reload_model(force=force)
+        except Exception as e:
+            logger.error(f"Model reload failed, workers keep the current model: {e}")
+            return
+        self._freeze()
+        logger.info(
+            f"Supervisor loaded model {self.model_service.model_version}; "
+            f"reloading workers ({self.reload_mode})"
+        )
+
+        if self.reload_mode == "recycle":
+            # Start each replacement before draining the worker it replaces
+            for pid, slot in list(self.children.items()):
+                self.spawn(slot)
+                self._retire(pid)
+        else:
+            for pid in self.children:
+                os.kill(pid, signal.SIGHUP)
+
+    def _retire(self, pid: int):
+        """Ask a worker to finish its requests and exit without a restart"""
+        self.children.pop(pid, None)
+        self.retiring.add(pid)
+        os.kill(pid, signal.SIGTERM)
+
+    def _model_changed(self) -> bool:
+        """True once new model content or rows have been quiet for the debounce"""
+        service = self.model_service
+        mtimes = []
+        for path in (service.source_path(), service.delta_path):
+            try:
+                mtimes.append(os.path.getmtime(path))
+            except OSError:
+                pass
+        if not mtimes or time.time() - max(mtimes) < self.debounce_time:
+            return False
+        # A touched or re-copied file keeps its content hash and is skipped
+        return service.model_changed() or service.delta_changed()
+
+    def _reap(self):
+        """Collect exited workers and restart any that weren't retired"""
+        while True:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                return
+            if pid == 0:
+                return
+            if pid in self.retiring:
+                self.retiring.discard(pid)
+                logger.info(f"Retired worker {pid} exited")
+                continue
+            slot = self.children.pop(pid, None)
+            if slot is not None and not self._stopping:
+                logger.warning(f"Worker {pid} exited with status {status}; restarting")
+                self.spawn(slot)
+
+    def log_memory(self):
+        """Log RSS/PSS per process; PSS splits shared pages between sharers"""
+        processes = [("supervisor", os.getpid())]
+        processes += [("worker", pid) for pid in sorted(self.children)]
+        total_pss = 0
+        for label, pid in processes:
+            memory = process_memory(pid)
+            shared = memory.get("shared_clean_kb", 0) + memory.get("shared_dirty_kb", 0)
+            private = memory.get("private_clean_kb", 0) + memory.get(
+                "private_dirty_kb", 0
+            )
+            total_pss += memory.get("pss_kb", 0)
+            logger.info(
+                f"{label} {pid}: rss={memory.get('rss_kb', 0)}kB "
+                f"pss={memory.get('pss_kb', 0)}kB shared={shared}kB private={private}kB"
+            )
+        logger.info(f"Total PSS across {len(processes)} processes: {total_pss}kB")
+
+    def _install_signal_handlers(self):
+        def request_reload(signum, frame):
+            self._reload_requested = True
+
+        def request_report(signum, frame):
+            self._report_requested = True
+
+        def request_stop(signum, frame):
+            self._stopping = True
+
+        signal.signal(signal.SIGHUP, request_reload)
+        signal.signal(signal.SIGUSR1, request_report)
+        signal.signal(signal.SIGTERM, request_stop)
+        signal.signal(signal.SIGINT, request_stop)
+
+    def run(self):
+        """Load, fork the workers and supervise them until told to stop"""
+        self.load()
+        self.bind()
+        self._install_signal_handlers()
+        logger.info(
+            f"Pre-fork supervisor {os.getpid()} serving {self.app_path} on "
+            f"{self.host}:{self.port} with {self.workers} workers"
+        )
+        for slot in range(self.workers):
+            self.spawn(slot)
+
+        try:
+            while not self._stopping:
+                time.sleep(self.watch_interval)
+                self._reap()
+                changed = self.watch_model and self._model_changed()
+                if self._reload_requested or changed:
+                    # SIGHUP forces a full reload; a detected change doesn't
+                    force = self._reload_requested
+                    self._reload_requested = False
+                    self.reload(force=force)
+                if self._report_requested:
+                    self._report_requested = False
+                    self.log_memory()
+        finally:
+            self.shutdown()
+
+    def shutdown(self):
+        """Let workers drain, then kill any that outlive the timeout"""
+        self._stopping = True
+        pids = set(self.children) | self.retiring
+        for pid in pids:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+        deadline = time.monotonic() + self.graceful_timeout
+        while pids and time.monotonic() < deadline:
+            for pid in list(pids):
+                try:
+                    done, _ = os.waitpid(pid, os.WNOHANG)
+                except ChildProcessError:
+                    done = pid
+                if done:
+                    pids.discard(pid)
+            time.sleep(0.1)
+        for pid in pids:
+            logger.warning(f"Worker {pid} did not exit in time; killing it")
+            try:
+                os.kill(pid, signal.SIGKILL)
+            except ProcessLookupError:
+                pass
+
+        if self.socket is not None:
+            self.socket.close()
+        logger.info("Pre-fork supervisor stopped")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--app", default="src.main:app", help="ASGI app import path")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=int(os.getenv("PORT", "8000")))
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--reload-mode", choices=RELOAD_MODES, default=None)
+    args = parser.parse_args()
+
+    setup_logging()
+    PreforkSupervisor(
+        app=args.app,
+        host=args.host,
+        port=args.port,
+        workers=args.workers,
+        reload_mode=args.reload_mode,
+    ).run()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,382 @@
+"""
+Coordinated model rollouts across replicas sharing a model volume.
+
+Without coordination every replica reloads as soon as its watchdog sees new
+model files, so the whole fleet unpickles at once and versions flip at
+different moments. With ``MODEL_ROLLOUT_MODE=coordinated`` each replica runs
+a RolloutCoordinator instead, and the replicas agree through small JSON files
+in a shared, writable directory (``MODEL_ROLLOUT_DIR``); no external service
+is involved:
+
+    replicas/<id>.json   heartbeat: served, prepared and failed versions
+    leases/<slot>.json   one file per replica allowed to load right now
+    commits/<hash>.json  switch time for a prepared version
+
+Replicas load the new version in waves of ``MODEL_ROLLOUT_WAVE_SIZE``: a
+replica needs a free lease slot, and takes one only while every live peer is
+healthy (ready, with a heartbeat under ``MODEL_ROLLOUT_STALE_AFTER`` seconds
+old, or loading under a lease). It keeps the slot until its new model is
+serving. A replica that fails to load a version records it, and the rollout
+of that version stops there.
+
+With ``MODEL_ROLLOUT_COMMIT=true`` the waves only prepare the new bundle
+(load, validate, warm up). Once every live replica has prepared it, the last
+one writes a commit time a moment ahead, and all replicas publish at that
+time.
+"""
+
+import json
+import logging
+import os
+import socket
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from services.model_artifacts import replace_atomically
+from services.model_bundle import ModelBundle
+
+logger = logging.getLogger(__name__)
+
+ROLLOUT_MODES = ("independent", "coordinated")
+# Seconds between heartbeats when nothing changes
+HEARTBEAT_INTERVAL = 1.0
+
+
+def _env_flag(name: str, default: str = "false") -> bool:
+    return os.getenv(name, default).lower() in ("true", "1", "yes")
+
+
+class RolloutCoordinator:
+    """Loads new model versions in leased waves, optionally committing together"""
+
+    def __init__(
+        self,
+        model_service,
+        rollout_dir,
+        replica_id: str = None,
+        wave_size: int = 1,
+        commit: bool = False,
+        commit_delay: float = 0.5,
+        poll_interval: float = 0.25,
+        peer_timeout: float = 15.0,
+        lease_ttl: float = 120.0,
+        stale_after: float = 3.0,
+    ):
+        self.model_service = model_service
+        self.rollout_dir = Path(rollout_dir)
+        # Processes that share a hostname (pre-fork workers) still need their
+        # own heartbeat, so the default id includes the pid
+        host = os.getenv("HOSTNAME") or socket.gethostname()
+        self.replica_id = replica_id or f"{host}-{os.getpid()}"
+        self.wave_size = max(1, wave_size)
+        self.commit = commit
+        # Lead time of a commit, so every replica reads it before it is due
+        self.commit_delay = commit_delay
+        self.poll_interval = poll_interval
+        # Peers that haven't written a heartbeat for this long are gone
+        self.peer_timeout = peer_timeout
+        # Leases older than this belong to a replica that died mid-load
+        self.lease_ttl = lease_ttl
+        # Live peers whose heartbeat is older than this have crashed or
+        # wedged; no wave starts until they recover or time out
+        self.stale_after = stale_after
+
+        # Bundle loaded for a commit that hasn't happened yet, and its hash
+        self.prepared: Optional[ModelBundle] = None
+        self.failed: Optional[str] = None
+        self.waiting_for: Optional[str] = None
+        self._last_state = None
+        self._last_heartbeat = 0.0
+        self._wake = threading.Event()
+        self._stopped = threading.Event()
+        self._thread = None
+        for name in ("replicas", "leases", "commits"):
+            (self.rollout_dir / name).mkdir(parents=True, exist_ok=True)
+
+    @classmethod
+    def from_env(cls, model_service) -> Optional["RolloutCoordinator"]:
+        """
+        A coordinator when MODEL_ROLLOUT_MODE=coordinated, else None.
+
+        Only processes that run the model watchdog take part: the watchdog
+        is what wakes the coordinator, and a process without one (such as a
+        pre-fork worker) would otherwise hold up every rollout as a peer.
+        """
+        mode = os.getenv("MODEL_ROLLOUT_MODE", "independent").lower()
+        if mode not in ROLLOUT_MODES:
+            raise ValueError(f"MODEL_ROLLOUT_MODE must be one of {ROLLOUT_MODES}")
+        if mode == "independent" or not _env_flag("MODEL_WATCHDOG_ENABLED", "true"):
+            return None
+        return cls(
+            model_service,
+            os.getenv("MODEL_ROLLOUT_DIR", "rollout"),
+            wave_size=int(os.getenv("MODEL_ROLLOUT_WAVE_SIZE", "1")),
+            commit=_env_flag("MODEL_ROLLOUT_COMMIT"),
+            commit_delay=float(os.getenv("MODEL_ROLLOUT_COMMIT_DELAY", "0.5")),
+            poll_interval=float(os.getenv("MODEL_ROLLOUT_POLL_INTERVAL", "0.25")),
+            peer_timeout=float(os.getenv("MODEL_ROLLOUT_PEER_TIMEOUT", "15")),
+            lease_ttl=float(os.getenv("MODEL_ROLLOUT_LEASE_TTL", "120")),
+            stale_after=float(os.getenv("MODEL_ROLLOUT_STALE_AFTER", "3")),
+        )
+
+    # Background loop; the watchdog wakes it early when model files change
+    def start(self):
+        """Run the rollout loop in a daemon thread"""
+        self._thread = threading.Thread(
+            target=self._run, daemon=True, name=f"Rollout-{self.replica_id}"
+        )
+        self._thread.start()
+        logger.info(
+            f"Replica {self.replica_id}: coordinated rollouts in {self.rollout_dir} "
+            f"(wave size {self.wave_size}, commit {self.commit})"
+        )
+
+    def stop(self):
+        """Stop the loop and withdraw this replica's heartbeat"""
+        self._stopped.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+        self._path("replicas", self.replica_id).unlink(missing_ok=True)
+
+    def wake(self):
+        """Check for a new model version now instead of at the next poll"""
+        self._wake.set()
+
+    def _run(self):
+        while not self._stopped.is_set():
+            try:
+                self.step()
+            except Exception as e:
+                logger.error(f"Replica {self.replica_id}: rollout step failed: {e}")
+            self._wake.wait(self.poll_interval)
+            self._wake.clear()
+
+    # One pass of the protocol; also called directly by tests
+    def step(self):
+        """Advance this replica's part of the rollout of the on-disk model"""
+        service = self.model_service
+        target, _ = service.current_content_hash()
+        if target == self.served_hash():
+            self.prepared = None
+            self.waiting_for = None
+            # Appended rows are cheap to apply and need no coordination
+            delta = service.bundle.delta
+            if service.delta_digest() != (delta["digest"] if delta else None):
+                service.reload_model()
+            self.heartbeat()
+            return
+
+        if self.prepared is not None and self._hash(self.prepared) != target:
+            logger.info(f"Replica {self.replica_id}: discarding superseded bundle")
+            self.prepared = None
+        self.waiting_for = target
+        self.heartbeat()
+        peers = self.peers()
+        if self.failed == target or any(p.get("failed") == target for p in peers):
+            return
+
+        if self.prepared is None:
+            loading = self._leaseholders()
+            if not all(self._healthy(peer, loading) for peer in peers):
+                return
+            slot = self._acquire_lease(target)
+            if slot is None:
+                return
+            try:
+                self._load(target)
+            finally:
+                self._release_lease(slot)
+            self.heartbeat()
+
+        if self.prepared is not None:
+            self._commit_when_due(target, peers)
+
+    def _load(self, target: str):
+        """Load the new version, publishing it unless commits are enabled"""
+        service = self.model_service
+        try:
+            with service.lock:
+                bundle = service.preload_model()
+                if not self.commit:
+                    service.publish_bundle(bundle)
+        except Exception as e:
+            service.reload_failures += 1
+            self.failed = target
+            logger.error(f"Replica {self.replica_id}: failed to load {target}: {e}")
+            return
+        if self.commit:
+            self.prepared = bundle
+            logger.info(f"Replica {self.replica_id}: prepared {bundle.version}")
+        else:
+            logger.info(f"Replica {self.replica_id}: rolled out {bundle.version}")
+
+    def _commit_when_due(self, target: str, peers: List[Dict]):
+        """Publish the prepared bundle at the commit time all replicas share"""
+        commit = self._read_json(self._path("commits", target))
+        if commit is None:
+            if not all(target in (p.get("prepared"), p.get("version")) for p in peers):
+                return
+            commit = self._write_commit(target)
+        delay = commit["commit_at"] - time.time()
+        if delay > self.poll_interval:
+            return
+        if delay > 0:
+            time.sleep(delay)
+        with self.model_service.lock:
+            self.model_service.publish_bundle(self.prepared)
+        logger.info(f"Replica {self.replica_id}: committed {self.prepared.version}")
+        self.prepared = None
+        self.heartbeat()
+
+    def _write_commit(self, target: str) -> Dict:
+        """Record the switch time; the first replica to write it wins"""
+        for path in (self.rollout_dir / "commits").glob("*.json"):
+            if path.stem != target:
+                path.unlink(missing_ok=True)
+        commit = {
+            "target": target,
+            "commit_at": time.time() + self.commit_delay,
+            "written_by": self.replica_id,
+        }
+        if not self._create_exclusive(self._path("commits", target), commit):
+            return self._read_json(self._path("commits", target)) or commit
+        logger.info(f"Replica {self.replica_id}: all replicas prepared {target[:16]}")
+        return commit
+
+    # Lease slots: exclusive file creation is the only lock needed
+    def _acquire_lease(self, target: str) -> Optional[int]:
+        """Take a free lease slot, reclaiming ones left by dead replicas"""
+        live = {peer["replica"] for peer in self.peers()} | {self.replica_id}
+        lease = {
+            "replica": self.replica_id,
+            "target": target,
+            "acquired_at": time.time(),
+        }
+        for slot in range(self.wave_size):
+            path = self._path("leases", str(slot))
+            if self._create_exclusive(path, lease):
+                return slot
+            held = self._read_json(path)
+            if held is None:
+                continue
+            expired = time.time() - held.get("acquired_at", 0) > self.lease_ttl
+            if expired or held.get("replica") not in live:
+                # Renaming first means only one replica reclaims the slot
+                stale = path.with_name(f".{path.name}.{self.replica_id}.stale")
+                try:
+                    os.rename(path, stale)
+                except FileNotFoundError:
+                    continue
+                stale.unlink(missing_ok=True)
+                if self._create_exclusive(path, lease):
+                    return slot
+        return None
+
+    # Wave gating: a crashed or wedged peer stops heartbeating, so it stops
+    # counting as healthy long before it drops out of peers()
+    def _leaseholders(self) -> set:
+        """Replicas holding an unexpired lease, i.e. loading right now"""
+        holders = set()
+        for path in (self.rollout_dir / "leases").glob("*.json"):
+            held = self._read_json(path)
+            if held and time.time() - held.get("acquired_at", 0) <= self.lease_ttl:
+                holders.add(held.get("replica"))
+        return holders
+
+    def _healthy(self, peer: Dict, loading: set) -> bool:
+        """A live peer that lets the next wave start"""
+        if peer["replica"] in loading:
+            # Its heartbeat pauses while it loads in the current wave
+            return True
+        fresh = time.time() - peer.get("updated_at", 0) <= self.stale_after
+        return fresh and bool(peer.get("ready"))
+
+    def _release_lease(self, slot: int):
+        """Free a lease slot this replica holds"""
+        path = self._path("leases", str(slot))
+        held = self._read_json(path)
+        if held is not None and held.get("replica") == self.replica_id:
+            path.unlink(missing_ok=True)
+
+    # Heartbeats: what every replica serves, has prepared or failed to load
+    def heartbeat(self):
+        """Write this replica's status for its peers when due or changed"""
+        state = {
+            "replica": self.replica_id,
+            "version": self.served_hash(),
+            "prepared": self._hash(self.prepared) if self.prepared else None,
+            "failed": self.failed,
+            "ready": self.model_service.is_ready(),
+        }
+        now = time.time()
+        unchanged = state == self._last_state
+        if unchanged and now - self._last_heartbeat < HEARTBEAT_INTERVAL:
+            return
+        self._last_state, self._last_heartbeat = state, now
+        status = {**state, "updated_at": now}
+        replace_atomically(
+            self._path("replicas", self.replica_id),
+            lambda f: f.write(json.dumps(status).encode("utf-8")),
+        )
+
+    def peers(self) -> List[Dict]:
+        """Statuses of the other replicas with a recent heartbeat"""
+        peers = []
+        for path in (self.rollout_dir / "replicas").glob("*.json"):
+            status = self._read_json(path)
+            if (
+                status is not None
+                and status.get("replica") != self.replica_id
+                and time.time() - status.get("updated_at", 0) <= self.peer_timeout
+            ):
+                peers.append(status)
+        return peers
+
+    def served_hash(self) -> Optional[str]:
+        """Content hash of the bundle this replica serves"""
+        bundle = self.model_service.bundle
+        return self._hash(bundle) if bundle is not None else None
+
+    def status(self) -> Dict:
+        """Rollout state of this replica and its live peers"""
+        return {
+            "mode": "coordinated",
+            "replica": self.replica_id,
+            "wave_size": self.wave_size,
+            "commit": self.commit,
+            "serving": self.served_hash(),
+            "target": self.waiting_for,
+            "prepared": self._hash(self.prepared) if self.prepared else None,
+            "failed": self.failed,
+            "peers": self.peers(),
+        }
+
+    @staticmethod
+    def _hash(bundle: ModelBundle) -> Optional[str]:
+        return bundle.manifest["content_hash"] if bundle.manifest else None
+
+    def _path(self, kind: str, name: str) -> Path:
+        return self.rollout_dir / kind / f"{name}.json"
+
+    @staticmethod
+    def _create_exclusive(path: Path, document: Dict) -> bool:
+        """Create path with document unless it already exists"""
+        try:
+            fd = os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY, 0o644)
+        except FileExistsError:
+            return False
+        with os.fdopen(fd, "w") as f:
+            json.dump(document, f)
+        return True
+
+    @staticmethod
+    def _read_json(path: Path) -> Optional[Dict]:
+        try:
+            with open(path, "r") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            # Missing, or caught between creation and the first write
+            return None
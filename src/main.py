@@ -2,8 +2,11 @@ import logging
 
 from fastapi import FastAPI
 
+from core.inference_pool import InferencePool
 from core.logging_config import setup_logging
-from core.model_watchdog import start_file_watcher
+from core.metrics import MetricsMiddleware, track_services
+from core.model_watchdog import start_file_watcher, stop_file_watcher
+from core.rollout import RolloutCoordinator
 from routers import basic_router, model_router
 from services.model_service import ModelService
 
@@ -13,6 +16,15 @@ logger = logging.getLogger(__name__)
 # Create a global model service instance
 model_service = ModelService()
 
+# Bounded worker pool that keeps CPU-bound inference off the event loop
+inference_pool = InferencePool()
+
+# Staggered, optionally simultaneous reloads across replicas (None unless
+# MODEL_ROLLOUT_MODE=coordinated and this process runs the watchdog). Built at
+# startup: pre-fork workers import the app in the supervisor and only turn
+# their watchdog off after the fork
+rollout_coordinator = None
+
 app = FastAPI(
     title="MLE Project",
     description="MLE Project",
@@ -23,16 +35,28 @@ app = FastAPI(
 
 app.include_router(basic_router.router)
 app.include_router(model_router.router)
+# Request timing for /metrics
+app.add_middleware(MetricsMiddleware)
 
 # Store model service in app state for access by routers
 app.state.model_service = model_service
+app.state.inference_pool = inference_pool
+app.state.rollout_coordinator = None
+track_services(model_service, inference_pool)
 
 
 def start_watchdog():
     """Start the model file watchdog in a background thread"""
+    global rollout_coordinator
+    rollout_coordinator = RolloutCoordinator.from_env(model_service)
+    app.state.rollout_coordinator = rollout_coordinator
     try:
         logger.info("Starting model file watchdog...")
-        start_file_watcher(model_service, model_dir="model")
+        if rollout_coordinator is not None:
+            rollout_coordinator.start()
+        start_file_watcher(
+            model_service, model_dir="model", rollout=rollout_coordinator
+        )
         logger.info("Model file watchdog started successfully")
     except Exception as e:
         logger.error(f"Failed to start model file watchdog: {e}")
@@ -45,6 +69,16 @@ async def startup_event():
     start_watchdog()
 
 
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Let in-flight predictions finish before the process exits"""
+    stop_file_watcher()
+    if rollout_coordinator is not None:
+        rollout_coordinator.stop()
+    inference_pool.shutdown()
+    model_service.close()
+
+
 def main():
     logger.info("App starting...")
     logger.debug("Debugging details here")
@@ -0,0 +1,218 @@
+"""
+Columnar binary batches for high-volume clients.
+
+A columnar batch is a NumPy ``.npz`` archive (``application/x-npz``), as
+written by ``np.savez`` or ``np.savez_compressed``, with one 1-D array per
+request field, all of the same length: numbers as integer or float arrays, ``zipcode`` as a
+fixed-width string array. Predictions come back the same way, as a float64
+``prediction`` array (NaN for rejected rows) and a boolean ``valid`` array.
+Archives are always loaded with ``allow_pickle=False``, so a request can't
+smuggle objects into the server.
+"""
+
+import io
+import zipfile
+from functools import lru_cache
+from typing import Annotated, Dict, List, Tuple, Type
+
+import numpy as np
+import pandas as pd
+from pydantic import BaseModel, ConfigDict, TypeAdapter, ValidationError
+
+NPZ_MEDIA_TYPE = "application/x-npz"
+# Media types an Accept header can name to get JSON back
+JSON_MEDIA_TYPES = ("application/json", "application/*", "*/*")
+# Far more columns than any request schema has fields
+MAX_COLUMNS = 64
+# Widest array element accepted, e.g. a 64-character string
+MAX_ITEM_BYTES = 256
+
+
+class ColumnarFormatError(ValueError):
+    """The body isn't a usable columnar batch"""
+
+
+def is_npz(content_type: str) -> bool:
+    """True when a Content-Type header names the columnar format"""
+    return content_type.split(";")[0].strip().lower() == NPZ_MEDIA_TYPE
+
+
+def accepts_npz(accept: str) -> bool:
+    """True when an Accept header prefers the columnar format to JSON"""
+    quality = {}
+    for part in accept.split(","):
+        media_type, *params = [p.strip() for p in part.split(";")]
+        q = 1.0
+        for param in params:
+            if param.startswith("q="):
+                try:
+                    q = float(param[2:])
+                except ValueError:
+                    q = 0.0
+        quality[media_type.lower()] = max(q, quality.get(media_type.lower(), 0.0))
+    npz = quality.get(NPZ_MEDIA_TYPE, 0.0)
+    return npz > 0 and npz >= max(quality.get(t, 0.0) for t in JSON_MEDIA_TYPES)
+
+
+def encode_columns(columns: Dict[str, object]) -> bytes:
+    """An npz request body from equal-length columns (client side)"""
+    arrays = {}
+    for name, values in columns.items():
+        array = np.asarray(values)
+        if array.dtype == object:
+            array = array.astype(str)
+        arrays[name] = array
+    buffer = io.BytesIO()
+    np.savez(buffer, **arrays)
+    return buffer.getvalue()
+
+
+def _read_header(archive: zipfile.ZipFile, info: zipfile.ZipInfo):
+    """Shape and dtype of an npy member, read without decompressing its data"""
+    with archive.open(info) as member:
+        version = np.lib.format.read_magic(member)
+        if version == (1, 0):
+            shape, _, dtype = np.lib.format.read_array_header_1_0(member)
+        elif version == (2, 0):
+            shape, _, dtype = np.lib.format.read_array_header_2_0(member)
+        else:
+            raise ValueError(f"unsupported npy format version {version}")
+    return shape, dtype
+
+
+def decode_columns(body: bytes, max_rows: int) -> pd.DataFrame:
+    """
+    The columns of an npz request body as a DataFrame.
+
+    Every column's shape and dtype are read from its npy header and checked
+    before any array data is decompressed, so a small archive can't expand
+    into more than ``max_rows`` rows of ``MAX_ITEM_BYTES`` per column.
+
+    Raises:
+        ColumnarFormatError: if the body isn't an npz archive of at most
+            ``MAX_COLUMNS`` 1-D, non-object arrays of one length between 1
+            and ``max_rows``
+    """
+    try:
+        archive = zipfile.ZipFile(io.BytesIO(body))
+    except (zipfile.BadZipFile, OSError, EOFError) as e:
+        raise ColumnarFormatError(f"Body is not a valid npz archive: {e}")
+
+    with archive:
+        members = archive.infolist()
+        if len(members) > MAX_COLUMNS:
+            raise ColumnarFormatError(f"A batch can have at most {MAX_COLUMNS} columns")
+        lengths = set()
+        for info in members:
+            name = info.filename.removesuffix(".npy")
+            if name == info.filename:
+                raise ColumnarFormatError(f"Member {name} is not an npy array")
+            try:
+                shape, dtype = _read_header(archive, info)
+            except (ValueError, OSError, EOFError, NotImplementedError) as e:
+                raise ColumnarFormatError(f"Column {name} can't be loaded: {e}")
+            if dtype.hasobject:
+                raise ColumnarFormatError(f"Column {name} can't hold objects")
+            if len(shape) != 1:
+                raise ColumnarFormatError(f"Column {name} must be one-dimensional")
+            if dtype.itemsize > MAX_ITEM_BYTES:
+                raise ColumnarFormatError(
+                    f"Column {name} has elements over {MAX_ITEM_BYTES} bytes"
+                )
+            lengths.add(shape[0])
+
+        if len(lengths) != 1:
+            raise ColumnarFormatError("Columns must all have the same length")
+        if not 1 <= lengths.pop() <= max_rows:
+            raise ColumnarFormatError(
+                f"A batch must have between 1 and {max_rows} rows"
+            )
+
+        columns = {}
+        for info in members:
+            name = info.filename.removesuffix(".npy")
+            try:
+                with archive.open(info) as member:
+                    array = np.lib.format.read_array(member, allow_pickle=False)
+            except (ValueError, OSError, EOFError) as e:
+                raise ColumnarFormatError(f"Column {name} can't be loaded: {e}")
+            if array.dtype.kind == "S":
+                array = np.char.decode(array, "utf-8")
+            columns[name] = array
+    return pd.DataFrame(columns)
+
+
+@lru_cache(maxsize=None)
+def _column_validators(schema: Type[BaseModel]) -> Dict[str, TypeAdapter]:
+    """
+    A validator of whole columns for each schema field.
+
+    Each one checks a list of values against the field's own type and
+    constraints, so columns fail exactly as the JSON records would. NaN and
+    infinity are rejected, since JSON records can't carry them.
+    """
+    return {
+        name: TypeAdapter(
+            List[Annotated[(field.annotation, *field.metadata)]],
+            config=ConfigDict(allow_inf_nan=False),
+        )
+        for name, field in schema.model_fields.items()
+    }
+
+
+def validate_columns(
+    frame: pd.DataFrame, schema: Type[BaseModel]
+) -> Tuple[np.ndarray, Dict[int, List[Dict]]]:
+    """
+    Check every row against the schema's field types and bounds at once.
+
+    Returns a mask of the valid rows and pydantic-style errors for the
+    others. Missing or wrongly typed columns fail the whole batch.
+
+    Raises:
+        ColumnarFormatError: if a schema field has no usable column
+    """
+    missing = [name for name in schema.model_fields if name not in frame]
+    if missing:
+        raise ColumnarFormatError(f"Missing columns: {missing}")
+
+    invalid = {}
+    for name, validator in _column_validators(schema).items():
+        column = frame[name]
+        if schema.model_fields[name].annotation is str:
+            if not pd.api.types.is_string_dtype(column):
+                raise ColumnarFormatError(f"Column {name} must be a string array")
+        elif not pd.api.types.is_numeric_dtype(column):
+            raise ColumnarFormatError(f"Column {name} must be a numeric array")
+        try:
+            validator.validate_python(column.tolist())
+        except ValidationError as e:
+            for error in e.errors(include_url=False, include_context=False):
+                i = error["loc"][0]
+                invalid.setdefault(i, []).append(
+                    {"type": error["type"], "loc": [name], "msg": error["msg"]}
+                )
+
+    valid = np.ones(len(frame), dtype=bool)
+    valid[list(invalid)] = False
+    return valid, invalid
+
+
+def encode_predictions(
+    predictions: np.ndarray, valid: np.ndarray, model_version: str
+) -> bytes:
+    """An npz response body: predictions, the valid mask and the model version"""
+    buffer = io.BytesIO()
+    np.savez(
+        buffer,
+        prediction=np.asarray(predictions, dtype=np.float64),
+        valid=np.asarray(valid, dtype=bool),
+        model_version=np.array(model_version or ""),
+    )
+    return buffer.getvalue()
+
+
+def decode_predictions(body: bytes) -> Dict[str, np.ndarray]:
+    """The arrays of an npz response body (client side)"""
+    with np.load(io.BytesIO(body), allow_pickle=False) as archive:
+        return {name: archive[name] for name in archive.files}
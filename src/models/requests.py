@@ -1,7 +1,11 @@
-from typing import Optional, Dict, List
+import os
+from typing import Any, Literal, Optional, Dict, List
 
 from pydantic import BaseModel, Field
 
+# Upper bound on records accepted by a single batch request
+MAX_BATCH_RECORDS = int(os.getenv("MODEL_BATCH_MAX_RECORDS", "10000"))
+
 
 # Data models for API requests
 class FullFeatureRequest(BaseModel):
@@ -51,3 +55,37 @@ class PredictionResponse(BaseModel):
         ..., description="Processing time in milliseconds"
     )
     metadata: Dict = Field(..., description="Additional metadata")
+
+
+class BatchPredictionRequest(BaseModel):
+    mode: Literal["full", "minimal"] = Field(
+        "full", description="Feature set used to validate each record"
+    )
+    records: List[Dict[str, Any]] = Field(
+        ...,
+        min_length=1,
+        max_length=MAX_BATCH_RECORDS,
+        description="House records, validated individually against the mode's schema",
+    )
+
+
+class BatchPredictionResult(BaseModel):
+    index: int = Field(..., description="Position of the record in the request")
+    prediction: Optional[float] = Field(None, description="Predicted house price")
+    errors: Optional[List[Dict]] = Field(
+        None, description="Validation or prediction errors for this record"
+    )
+
+
+class BatchPredictionResponse(BaseModel):
+    predictions: List[BatchPredictionResult] = Field(
+        ..., description="Per-record results, in input order"
+    )
+    model_version: str = Field(..., description="Model version identifier")
+    features_used: List[str] = Field(
+        ..., description="List of features used for prediction"
+    )
+    processing_time_ms: float = Field(
+        ..., description="Processing time in milliseconds"
+    )
+    metadata: Dict = Field(..., description="Additional metadata")
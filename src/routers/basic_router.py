@@ -1,8 +1,12 @@
-from fastapi import APIRouter, Request
+from fastapi import APIRouter, Request, Response
+from fastapi.responses import PlainTextResponse
 from fastapi.params import Depends
 
-from core.dependencies import get_model_service
+from core.dependencies import get_inference_pool, get_model_service
+from core.inference_pool import InferencePool
+from core.metrics import CONTENT_TYPE, REGISTRY
 from core.model_watchdog import get_watchdog_status
+from core.prefork import worker_status
 from services.model_service import ModelService
 
 router = APIRouter()
@@ -17,27 +21,82 @@ async def root():
         "endpoints": {
             "/predict/full": "Full feature prediction endpoint",
             "/predict/minimal": "Minimal feature prediction endpoint",
-            "/health": "Health check endpoint",
+            "/predict/batch": "Batch prediction endpoint (full or minimal records)",
+            "/health": "Health check endpoint (503 until the model is warmed up)",
+            "/health/live": "Liveness probe (process is up)",
+            "/health/ready": "Readiness probe (warmed-up model is serving)",
             "/model-info": "Model information endpoint",
             "/watchdog-status": "Watchdog monitoring status endpoint",
             "/reload-model": "Manual model reload endpoint",
+            "/pool-status": "Inference pool and queue metrics endpoint",
+            "/workers": "Worker processes and their memory (pre-fork mode)",
+            "/metrics": "Prometheus metrics (per-stage latency, counters, gauges)",
         },
     }
 
 
 @router.get("/health")
 async def health_check(
-    request: Request, model_service: ModelService = Depends(get_model_service)
+    request: Request,
+    response: Response,
+    model_service: ModelService = Depends(get_model_service),
 ):
+    ready = model_service.is_ready()
+    if not ready:
+        # Keep load balancers away until the model is warmed up
+        response.status_code = 503
     return {
-        "status": "healthy",
-        "model_loaded": getattr(model_service, "model", None) is not None,
-        "demographics_loaded": getattr(model_service, "demographics_data", None)
+        "status": "healthy" if ready else "warming_up",
+        "model_loaded": getattr(model_service, "bundle", None) is not None,
+        "demographics_loaded": getattr(model_service, "demographics_store", None)
         is not None,
         "version": getattr(model_service, "model_version", None),
     }
 
 
+@router.get("/health/live")
+async def liveness():
+    """Liveness probe: the process is up and the event loop is responsive"""
+    return {"status": "alive"}
+
+
+@router.get("/health/ready")
+async def readiness(
+    request: Request,
+    response: Response,
+    model_service: ModelService = Depends(get_model_service),
+):
+    """Readiness probe: a validated, warmed-up model is serving"""
+    ready = model_service.is_ready()
+    if not ready:
+        response.status_code = 503
+    return {
+        "ready": ready,
+        "version": getattr(model_service, "model_version", None),
+        "warmup": model_service.warmup_status,
+    }
+
+
+@router.get("/pool-status")
+async def pool_status(
+    request: Request, inference_pool: InferencePool = Depends(get_inference_pool)
+):
+    """Inference worker pool and queue metrics"""
+    return inference_pool.status()
+
+
+@router.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """Prometheus text exposition of this container's metrics"""
+    return PlainTextResponse(REGISTRY.render(), media_type=CONTENT_TYPE)
+
+
+@router.get("/workers")
+async def workers(request: Request):
+    """Launch mode and the resident memory of each worker process"""
+    return worker_status()
+
+
 @router.get("/watchdog-status")
 async def watchdog_status(
     request: Request, model_service: ModelService = Depends(get_model_service)
@@ -45,16 +104,18 @@ async def watchdog_status(
     """Check if the model watchdog is active and monitoring for changes"""
     # Get enhanced watchdog status
     watchdog_info = get_watchdog_status()
+    rollout = getattr(request.app.state, "rollout_coordinator", None)
     
     # Add model service information
     response = {
         **watchdog_info,
         "model_service_status": {
-            "model_loaded": getattr(model_service, "model", None) is not None,
+            "model_loaded": getattr(model_service, "bundle", None) is not None,
             "model_version": getattr(model_service, "model_version", None),
             "model_path": str(getattr(model_service, "model_path", "unknown")),
             "last_model_load": getattr(model_service, "model_mtime", None)
         },
+        "rollout": rollout.status() if rollout else {"mode": "independent"},
         "message": "Model watchdog is active and monitoring for file changes across all containers"
     }
     
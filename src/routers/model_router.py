@@ -1,12 +1,38 @@
 import logging
 import time
+from typing import Dict, Literal, Optional
 
+import numpy as np
 import pandas as pd
 from fastapi import APIRouter, HTTPException, Request
+from fastapi.exceptions import RequestValidationError
 from fastapi.params import Depends
+from fastapi.responses import JSONResponse, Response
+from pydantic import ValidationError
 
-from core.dependencies import get_model_service
+from core.dependencies import get_inference_pool, get_model_service
+from core.inference_pool import InferencePool, InferencePoolSaturated
+from core.metrics import (
+    PREDICTION_ERRORS,
+    PREDICTIONS,
+    STAGE_SECONDS,
+    mark_handler_start,
+    mark_predicted,
+)
+from models.columnar import (
+    NPZ_MEDIA_TYPE,
+    ColumnarFormatError,
+    accepts_npz,
+    decode_columns,
+    encode_predictions,
+    is_npz,
+    validate_columns,
+)
 from models.requests import (
+    MAX_BATCH_RECORDS,
+    BatchPredictionRequest,
+    BatchPredictionResponse,
+    BatchPredictionResult,
     PredictionResponse,
     FullFeatureRequest,
     MinimalFeatureRequest,
@@ -20,6 +46,123 @@ logger = logging.getLogger(__name__)
 router = APIRouter()
 
 
+def _saturated_error(e: InferencePoolSaturated, endpoint: str) -> HTTPException:
+    """503 telling the client when to retry a rejected prediction"""
+    PREDICTION_ERRORS.inc(endpoint=endpoint, reason="saturated")
+    return HTTPException(
+        status_code=503,
+        detail=str(e),
+        headers={"Retry-After": str(e.retry_after)},
+    )
+
+
+def _score_batch(
+    model_service: ModelService, records: list, minimal: bool, use_cache: bool
+):
+    """
+    Validate, prepare and predict batch records (runs on the inference pool).
+
+    Returns the predictions, per-row errors and the bundle that scored them.
+    """
+    schema = MinimalFeatureRequest if minimal else FullFeatureRequest
+    bundle = model_service.bundle
+
+    # Validate each record on its own so one bad row doesn't fail the batch
+    predictions = np.full(len(records), np.nan)
+    errors = {}
+    valid_indices = []
+    valid_records = []
+    validation_start = time.perf_counter()
+    for i, record in enumerate(records):
+        try:
+            valid_records.append(schema.model_validate(record).model_dump())
+            valid_indices.append(i)
+        except ValidationError as e:
+            errors[i] = e.errors(include_url=False, include_context=False)
+    STAGE_SECONDS.observe(
+        time.perf_counter() - validation_start, stage="record_validation", mode="batch"
+    )
+
+    if valid_records:
+        # Prepare one feature matrix for the distinct records and predict it
+        predictions[valid_indices] = model_service.predict_records(
+            valid_records, minimal=minimal, use_cache=use_cache, bundle=bundle
+        )
+    return predictions, errors, bundle
+
+
+def _score_columns(
+    model_service: ModelService, frame: pd.DataFrame, minimal: bool, use_cache: bool
+):
+    """Validate, prepare and predict a columnar batch, column by column"""
+    schema = MinimalFeatureRequest if minimal else FullFeatureRequest
+    bundle = model_service.bundle
+
+    validation_start = time.perf_counter()
+    valid, errors = validate_columns(frame, schema)
+    STAGE_SECONDS.observe(
+        time.perf_counter() - validation_start, stage="record_validation", mode="batch"
+    )
+
+    predictions = np.full(len(frame), np.nan)
+    if valid.any():
+        # Only the schema's fields, as pydantic would keep for a JSON record
+        rows = frame.loc[valid, list(schema.model_fields)]
+        features = model_service.feature_matrix(rows, minimal, bundle)
+        # Repeated houses are predicted once, as on the JSON path
+        unique, inverse = np.unique(features, axis=0, return_inverse=True)
+        unique_df = pd.DataFrame(unique, columns=bundle.features, copy=False)
+        predictions[valid] = model_service.predict_batch(
+            unique_df, use_cache=use_cache, bundle=bundle
+        )[inverse.ravel()]
+    return predictions, errors, bundle
+
+
+async def _read_batch(
+    fastapi_request: Request, mode: Optional[str], inference_pool: InferencePool
+):
+    """Records (JSON) or a DataFrame (npz), and the mode, from the request body"""
+    body = await fastapi_request.body()
+    if is_npz(fastapi_request.headers.get("content-type", "")):
+        # Decompressing and decoding the arrays stays off the event loop
+        try:
+            frame = await inference_pool.run(decode_columns, body, MAX_BATCH_RECORDS)
+        except ColumnarFormatError as e:
+            raise HTTPException(status_code=422, detail=str(e))
+        except InferencePoolSaturated as e:
+            raise _saturated_error(e, "batch")
+        return None, frame, mode or "full"
+    try:
+        request = BatchPredictionRequest.model_validate_json(body)
+    except ValidationError as e:
+        raise RequestValidationError(
+            [
+                {**error, "loc": ("body", *error["loc"])}
+                for error in e.errors(include_url=False)
+            ]
+        )
+    return request.records, None, request.mode
+
+
+def _lean_json(content: Dict) -> Response:
+    """JSON response that skips response-model validation"""
+    return JSONResponse(content=content)
+
+
+# Request body schemas, since the batch endpoint reads its body itself
+BATCH_OPENAPI = {
+    "requestBody": {
+        "required": True,
+        "content": {
+            "application/json": {"schema": BatchPredictionRequest.model_json_schema()},
+            NPZ_MEDIA_TYPE: {
+                "schema": {"type": "string", "format": "binary"},
+            },
+        },
+    }
+}
+
+
 @router.get("/model-info")
 async def model_info(
     request: Request, model_service: ModelService = Depends(get_model_service)
@@ -29,17 +172,35 @@ async def model_info(
         "model_version": model_service.model_version,
         "features_used": model_service.features,
         "feature_count": len(model_service.features),
-        "model_type": type(model_service.model).__name__
-        if model_service.model
+        "model_type": type(
+            model_service.model or model_service.compiled_predictor
+        ).__name__
+        if model_service.bundle
         else None,
+        "model_format": model_service.model_format,
+        "neighbor_index": model_service.neighbor_index,
+        "manifest": model_service.bundle.manifest if model_service.bundle else None,
+        "reload_count": model_service.reload_count,
+        "demographics_refresh_count": model_service.demographics_refresh_count,
+        "last_load_seconds": model_service.last_load_seconds,
+        "compiled_inference": model_service.compiled_predictor is not None,
+        "prediction_cache": model_service.prediction_cache.status()
+        if model_service.prediction_cache
+        else {"enabled": False},
+        "batching": {"enabled": True, **model_service.batcher.status()}
+        if model_service.batcher
+        else {"enabled": False},
     }
 
 
 @router.post("/reload-model")
 def reload_model(
-    request: Request, model_service: ModelService = Depends(get_model_service)
+    request: Request,
+    model_service: ModelService = Depends(get_model_service),
+    force: bool = False,
 ):
-    model_service.reload_model()
+    """Reload the model if its content changed, or unconditionally with force"""
+    model_service.reload_model(force=force)
     return {"status": "reloaded", "version": model_service.model_version}
 
 
@@ -48,42 +209,57 @@ async def predict_full_features(
     request: FullFeatureRequest,
     fastapi_request: Request,
     model_service: ModelService = Depends(get_model_service),
+    inference_pool: InferencePool = Depends(get_inference_pool),
+    use_cache: bool = True,
+    lean: bool = False,
 ):
     """Predict house price using all available features"""
 
     start_time = time.time()
+    mark_handler_start(fastapi_request, mode="single")
 
     try:
         # Convert request to dict
         request_dict = request.model_dump()
 
-        # Prepare features
-        features_df = model_service.prepare_features(request_dict, minimal=False)
-
-        # Make prediction
-        prediction = model_service.predict(features_df)
+        # Prepare features and predict off the event loop
+        prediction, bundle = await model_service.predict_record_async(
+            inference_pool, request_dict, minimal=False, use_cache=use_cache
+        )
+        PREDICTIONS.inc(endpoint="full")
+        mark_predicted(fastapi_request)
+        if lean:
+            # Just the prediction: no echoed inputs, features or metadata
+            return _lean_json(
+                {"prediction": prediction, "model_version": bundle.version}
+            )
 
         # Calculate processing time
         processing_time = (time.time() - start_time) * 1000
 
-        # Get demographics for metadata
-        demographics = model_service.enrich_with_demographics(request.zipcode)
-
         return PredictionResponse(
             prediction=prediction,
             confidence=None,  # KNN doesn't provide confidence scores
-            model_version=model_service.model_version,
-            features_used=model_service.features,
+            model_version=bundle.version,
+            features_used=bundle.features,
             processing_time_ms=processing_time,
             metadata={
                 "input_features": request_dict,
-                "demographics_enriched": bool(demographics),
+                "ignored_inputs": model_service.ignored_fields(
+                    request_dict, bundle=bundle
+                ),
+                "demographics_enriched": model_service.has_demographics(
+                    request.zipcode, bundle
+                ),
                 "zipcode": request.zipcode,
                 "prediction_timestamp": pd.Timestamp.now().isoformat(),
             },
         )
 
+    except InferencePoolSaturated as e:
+        raise _saturated_error(e, "full")
     except Exception as e:
+        PREDICTION_ERRORS.inc(endpoint="full", reason="internal")
         logger.error(f"Error in full feature prediction: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -93,43 +269,169 @@ async def predict_minimal_features(
     request: MinimalFeatureRequest,
     fastapi_request: Request,
     model_service: ModelService = Depends(get_model_service),
+    inference_pool: InferencePool = Depends(get_inference_pool),
+    use_cache: bool = True,
+    lean: bool = False,
 ):
     """Predict house price using only essential features (bonus endpoint)"""
     import time
 
     start_time = time.time()
+    mark_handler_start(fastapi_request, mode="single")
 
     try:
         # Convert request to dict
         request_dict = request.model_dump()
 
-        # Prepare features (minimal mode)
-        features_df = model_service.prepare_features(request_dict, minimal=True)
-
-        # Make prediction
-        prediction = model_service.predict(features_df)
+        # Prepare features (minimal mode) and predict off the event loop
+        prediction, bundle = await model_service.predict_record_async(
+            inference_pool, request_dict, minimal=True, use_cache=use_cache
+        )
+        PREDICTIONS.inc(endpoint="minimal")
+        mark_predicted(fastapi_request)
+        if lean:
+            # Just the prediction: no echoed inputs, features or metadata
+            return _lean_json(
+                {"prediction": prediction, "model_version": bundle.version}
+            )
 
         # Calculate processing time
         processing_time = (time.time() - start_time) * 1000
 
-        # Get demographics for metadata
-        demographics = model_service.enrich_with_demographics(request.zipcode)
-
         return PredictionResponse(
             prediction=prediction,
             confidence=None,
-            model_version=model_service.model_version,
-            features_used=model_service.features,
+            model_version=bundle.version,
+            features_used=bundle.features,
             processing_time_ms=processing_time,
             metadata={
                 "input_features": request_dict,
-                "demographics_enriched": bool(demographics),
+                "ignored_inputs": model_service.ignored_fields(
+                    request_dict, minimal=True, bundle=bundle
+                ),
+                "demographics_enriched": model_service.has_demographics(
+                    request.zipcode, bundle
+                ),
                 "zipcode": request.zipcode,
                 "prediction_timestamp": pd.Timestamp.now().isoformat(),
                 "note": "Prediction made with minimal features + demographics enrichment",
             },
         )
 
+    except InferencePoolSaturated as e:
+        raise _saturated_error(e, "minimal")
     except Exception as e:
+        PREDICTION_ERRORS.inc(endpoint="minimal", reason="internal")
         logger.error(f"Error in minimal feature prediction: {e}")
         raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.post(
+    "/predict/batch",
+    response_model=BatchPredictionResponse,
+    openapi_extra=BATCH_OPENAPI,
+    responses={200: {"content": {NPZ_MEDIA_TYPE: {}}}},
+)
+async def predict_batch(
+    fastapi_request: Request,
+    model_service: ModelService = Depends(get_model_service),
+    inference_pool: InferencePool = Depends(get_inference_pool),
+    use_cache: bool = True,
+    lean: bool = False,
+    mode: Optional[Literal["full", "minimal"]] = None,
+):
+    """
+    Predict house prices for many records with a single feature matrix.
+
+    Send JSON, or columns as an npz archive (Content-Type: application/x-npz,
+    with the mode as a query parameter). Ask for application/x-npz in Accept
+    to get the predictions back as arrays, or pass lean=true for JSON
+    without the echoed features and metadata.
+    """
+
+    start_time = time.time()
+    records, frame, mode = await _read_batch(fastapi_request, mode, inference_pool)
+    mark_handler_start(fastapi_request, mode="batch")
+    minimal = mode == "minimal"
+    schema = MinimalFeatureRequest if minimal else FullFeatureRequest
+    received = len(records) if records is not None else len(frame)
+
+    try:
+        # Validate and score the records off the event loop
+        if frame is not None:
+            predictions, errors, bundle = await inference_pool.run(
+                _score_columns, model_service, frame, minimal, use_cache
+            )
+        else:
+            predictions, errors, bundle = await inference_pool.run(
+                _score_batch, model_service, records, minimal, use_cache
+            )
+    except ColumnarFormatError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    except InferencePoolSaturated as e:
+        raise _saturated_error(e, "batch")
+    except Exception as e:
+        PREDICTION_ERRORS.inc(endpoint="batch", reason="internal")
+        logger.error(f"Error in batch prediction: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+    records_predicted = received - len(errors)
+    if errors:
+        PREDICTION_ERRORS.inc(len(errors), endpoint="batch", reason="validation")
+    PREDICTIONS.inc(records_predicted, endpoint="batch")
+    mark_predicted(fastapi_request)
+    model_version = bundle.version
+
+    if accepts_npz(fastapi_request.headers.get("accept", "")):
+        valid = np.ones(received, dtype=bool)
+        valid[list(errors)] = False
+        return Response(
+            content=encode_predictions(predictions, valid, model_version),
+            media_type=NPZ_MEDIA_TYPE,
+            headers={
+                "X-Model-Version": str(model_version),
+                "X-Records-Failed": str(len(errors)),
+            },
+        )
+
+    if lean:
+        return _lean_json(
+            {
+                "predictions": [
+                    None if i in errors else p
+                    for i, p in enumerate(predictions.tolist())
+                ],
+                "errors": [
+                    {"index": i, "errors": row_errors}
+                    for i, row_errors in sorted(errors.items())
+                ],
+                "model_version": model_version,
+            }
+        )
+
+    # Calculate processing time
+    processing_time = (time.time() - start_time) * 1000
+
+    return BatchPredictionResponse(
+        predictions=[
+            BatchPredictionResult(
+                index=i,
+                prediction=None if i in errors else prediction,
+                errors=errors.get(i),
+            )
+            for i, prediction in enumerate(predictions.tolist())
+        ],
+        model_version=model_version,
+        features_used=bundle.features,
+        processing_time_ms=processing_time,
+        metadata={
+            "mode": mode,
+            "records_received": received,
+            "records_predicted": records_predicted,
+            "records_failed": received - records_predicted,
+            "ignored_inputs": model_service.ignored_fields(
+                dict.fromkeys(schema.model_fields), minimal=minimal, bundle=bundle
+            ),
+            "prediction_timestamp": pd.Timestamp.now().isoformat(),
+        },
+    )
@@ -0,0 +1,166 @@
+import logging
+from typing import List
+
+import numpy as np
+from sklearn.neighbors import KNeighborsRegressor
+from sklearn.preprocessing import RobustScaler
+
+from services.neighbor_index import IVFNeighborsRegressor
+
+logger = logging.getLogger(__name__)
+
+# Extra brute-force candidates re-ranked with exact distances
+CANDIDATE_MARGIN = 8
+# Cap on query x training distances held in memory at once (~32MB of float64)
+DISTANCE_BLOCK_ELEMENTS = 4_000_000
+
+
+class CompiledKNNPredictor:
+    """
+    Plain-NumPy inference for a fitted ``RobustScaler -> KNN`` pipeline.
+
+    Calling ``Pipeline.predict`` on a one-row DataFrame spends most of its
+    time on scikit-learn bookkeeping (feature-name validation, input checks,
+    per-step dispatch) rather than on the math. At load time this class pulls
+    out the scaler's center/scale arrays and the fitted neighbor search, then
+    predicts straight from NumPy arrays whose columns are in ``features``
+    order.
+    """
+
+    def __init__(
+        self,
+        center: np.ndarray,
+        scale: np.ndarray,
+        fit_X: np.ndarray,
+        fit_y: np.ndarray,
+        n_neighbors: int,
+        tree=None,
+        approximate_index=None,
+        tie_breaker=None,
+    ):
+        self.center = center
+        self.scale = scale
+        self.fit_X = fit_X
+        self.fit_y = fit_y
+        self.n_neighbors = n_neighbors
+        self.tree = tree
+        self.approximate_index = approximate_index
+        # Estimator whose own search resolves rows with tied k-th neighbors
+        self.tie_breaker = tie_breaker
+        # Squared norms of the training rows, reused by every brute-force query
+        self.fit_X_sq = np.einsum("ij,ij->i", fit_X, fit_X)
+
+    @classmethod
+    def from_pipeline(cls, model, features: List[str]) -> "CompiledKNNPredictor":
+        """
+        Build a compiled predictor from a fitted pipeline.
+
+        Raises:
+            ValueError: if the pipeline isn't a RobustScaler followed by a
+                uniform-weight euclidean KNN regressor, or its training
+                columns don't match ``features``
+        """
+        steps = [step for _, step in getattr(model, "steps", [])]
+        if len(steps) != 2 or not isinstance(steps[0], RobustScaler):
+            raise ValueError("Expected a RobustScaler -> KNN regressor pipeline")
+        scaler, regressor = steps
+
+        trained_features = getattr(model, "feature_names_in_", None)
+        if trained_features is not None and list(trained_features) != list(features):
+            raise ValueError("Pipeline was trained on a different feature order")
+
+        n_features = len(features)
+        center = (
+            scaler.center_ if scaler.center_ is not None else np.zeros(n_features)
+        )
+        scale = scaler.scale_ if scaler.scale_ is not None else np.ones(n_features)
+
+        if isinstance(regressor, IVFNeighborsRegressor):
+            return cls(
+                center,
+                scale,
+                regressor.fit_X_,
+                regressor.fit_y_,
+                regressor.n_neighbors,
+                approximate_index=regressor,
+            )
+
+        if not isinstance(regressor, KNeighborsRegressor):
+            raise ValueError(f"Unsupported regressor {type(regressor).__name__}")
+        if regressor.weights != "uniform" or regressor.effective_metric_ != "euclidean":
+            raise ValueError("Only uniform-weight euclidean KNN can be compiled")
+
+        if regressor._fit_method in ("kd_tree", "ball_tree"):
+            tree, tie_breaker = regressor._tree, None
+        else:
+            tree, tie_breaker = None, regressor
+        return cls(
+            center,
+            scale,
+            np.ascontiguousarray(regressor._fit_X, dtype=np.float64),
+            np.asarray(regressor._y, dtype=np.float64),
+            regressor.n_neighbors,
+            tree=tree,
+            tie_breaker=tie_breaker,
+        )
+
+    def kneighbors(self, X_scaled: np.ndarray, return_distance: bool = False):
+        """
+        Indices of the nearest training rows for already-scaled queries.
+
+        With ``return_distance``, returns ``(distances, indices)`` like
+        scikit-learn's ``kneighbors``, each row sorted by distance.
+        """
+        k = self.n_neighbors
+        if self.approximate_index is not None:
+            return self.approximate_index.kneighbors(
+                X_scaled, return_distance=return_distance
+            )
+        if self.tree is not None:
+            return self.tree.query(X_scaled, k=k, return_distance=return_distance)
+
+        # Brute force: shortlist with the dot-product identity, which is fast
+        # but loses precision, then re-rank the shortlist with exact distances
+        approx = (
+            np.einsum("ij,ij->i", X_scaled, X_scaled)[:, None]
+            - 2.0 * X_scaled @ self.fit_X.T
+            + self.fit_X_sq[None, :]
+        )
+        m = min(k + CANDIDATE_MARGIN, len(self.fit_X))
+        candidates = np.argpartition(approx, m - 1, axis=1)[:, :m]
+        diff = self.fit_X[candidates] - X_scaled[:, None, :]
+        exact = np.einsum("qmd,qmd->qm", diff, diff)
+        order = np.argsort(exact, axis=1, kind="stable")
+        candidates = np.take_along_axis(candidates, order, axis=1)
+        exact = np.take_along_axis(exact, order, axis=1)
+        nearest = candidates[:, :k]
+        distances = np.sqrt(exact[:, :k])
+
+        if m > k and self.tie_breaker is not None:
+            # When the k-th and next neighbor are equidistant, which one is
+            # kept is an implementation detail; defer to scikit-learn's search
+            tied = np.isclose(exact[:, k - 1], exact[:, k], rtol=1e-12, atol=0.0)
+            if tied.any():
+                distances[tied], nearest[tied] = self.tie_breaker.kneighbors(
+                    X_scaled[tied]
+                )
+        if return_distance:
+            return distances, nearest
+        return nearest
+
+    def predict(self, X: np.ndarray) -> np.ndarray:
+        """Predict from a raw feature matrix with columns in model order"""
+        X_scaled = np.atleast_2d(
+            (np.asarray(X, dtype=np.float64) - self.center) / self.scale
+        )
+        block = max(1, DISTANCE_BLOCK_ELEMENTS // len(self.fit_X))
+        if len(X_scaled) <= block:
+            return self.fit_y[self.kneighbors(X_scaled)].mean(axis=1)
+        return np.concatenate(
+            [
+                self.fit_y[self.kneighbors(X_scaled[start : start + block])].mean(
+                    axis=1
+                )
+                for start in range(0, len(X_scaled), block)
+            ]
+        )
@@ -0,0 +1,197 @@
+import hashlib
+import json
+import logging
+import os
+import shutil
+from pathlib import Path
+from typing import Callable, List, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+# Directory beside the source files (the data directory) that holds the typed
+# tables built from them, unless DATA_CACHE_DIR names another one
+CACHE_DIR_NAME = ".cache"
+CACHE_FORMAT_VERSION = 1
+# Written last, so its presence marks a complete table
+TABLE_FILE = "table.json"
+
+# Columns of the sales data used for training and evaluation
+SALES_COLUMNS = [
+    "price",
+    "bedrooms",
+    "bathrooms",
+    "sqft_living",
+    "sqft_lot",
+    "floors",
+    "sqft_above",
+    "sqft_basement",
+    "zipcode",
+]
+
+
+def sources_digest(sources: Sequence[Path], key: str = "") -> str:
+    """SHA-256 over the contents of the source files and a build key"""
+    digest = hashlib.sha256(f"{CACHE_FORMAT_VERSION}:{key}".encode())
+    for source in sources:
+        with open(source, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                digest.update(block)
+    return digest.hexdigest()
+
+
+def default_cache_dir(sources: Sequence[Path]) -> Path:
+    """DATA_CACHE_DIR, or the .cache directory beside the first source file"""
+    configured = os.getenv("DATA_CACHE_DIR")
+    if configured:
+        return Path(configured)
+    return Path(sources[0]).resolve().parent / CACHE_DIR_NAME
+
+
+def _save_table(table: pd.DataFrame, directory: Path, document: dict):
+    """Write one .npy per column into a fresh directory, then publish it"""
+    tmp_dir = directory.with_name(f".{directory.name}.{os.getpid()}.tmp")
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    tmp_dir.mkdir(parents=True)
+
+    columns = []
+    for i, (name, column) in enumerate(table.items()):
+        values = column.to_numpy()
+        kind = "numeric"
+        if values.dtype == object or not np.issubdtype(values.dtype, np.number):
+            # Strings (ZIP codes) are stored fixed-width so they can be mapped
+            values = values.astype(str)
+            kind = "string"
+        np.save(tmp_dir / f"{i}.npy", values)
+        columns.append({"name": name, "file": f"{i}.npy", "kind": kind})
+
+    document = {**document, "rows": len(table), "columns": columns}
+    (tmp_dir / TABLE_FILE).write_text(json.dumps(document, indent=2))
+    try:
+        os.rename(tmp_dir, directory)
+    except OSError:
+        # Another process published the same table first; theirs is identical
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+
+def _load_table(directory: Path) -> pd.DataFrame:
+    """Numeric columns memory-mapped from their .npy files, without a copy"""
+    document = json.loads((directory / TABLE_FILE).read_text())
+    data = {}
+    for column in document["columns"]:
+        # Copy-on-write mapping: callers may modify the frame, never the file.
+        # np.asarray gives pandas a plain ndarray view rather than a memmap
+        values = np.asarray(np.load(directory / column["file"], mmap_mode="c"))
+        if column["kind"] == "string":
+            # The dtype read_csv gives strings in this pandas version: object
+            # in pandas 2, the str dtype in pandas 3
+            values = pd.Series(values, dtype=object).astype(str).array
+        data[column["name"]] = values
+    return pd.DataFrame(data, copy=False)
+
+
+def cached_table(
+    name: str,
+    sources: Sequence[Path],
+    build: Callable[[], pd.DataFrame],
+    key: str = "",
+    cache_dir: Path = None,
+    use_cache: bool = True,
+    write_cache: bool = True,
+) -> pd.DataFrame:
+    """
+    Table built from source files, cached on disk until a source changes.
+
+    The cache entry is named after a hash of the sources' contents and
+    ``key`` (anything else that shapes the build, such as a column
+    selection), so editing a CSV rebuilds the table on the next call and an
+    unchanged CSV is never parsed again. Failing to write the cache only
+    costs the next caller a rebuild. With ``write_cache=False`` an existing
+    entry is read but a missing one is never written, for callers whose
+    data directory is read-only.
+    """
+    if not use_cache:
+        return build()
+
+    cache_dir = Path(cache_dir or default_cache_dir(sources))
+    digest = sources_digest(sources, key)
+    directory = cache_dir / f"{name}-{digest[:16]}"
+    if (directory / TABLE_FILE).exists():
+        try:
+            return _load_table(directory)
+        except (OSError, ValueError, KeyError) as e:
+            logger.warning(f"Rebuilding unreadable cached table {directory}: {e}")
+            if write_cache:
+                shutil.rmtree(directory, ignore_errors=True)
+
+    table = build()
+    if not write_cache:
+        return table
+    try:
+        cache_dir.mkdir(parents=True, exist_ok=True)
+        document = {
+            "format_version": CACHE_FORMAT_VERSION,
+            "name": name,
+            "digest": digest,
+            "sources": [str(source) for source in sources],
+        }
+        _save_table(table, directory, document)
+        logger.info(f"Cached table {name} ({len(table)} rows) in {directory}")
+    except OSError as e:
+        logger.warning(f"Could not cache table {name} in {cache_dir}: {e}")
+    return table
+
+
+def load_demographics(
+    demographics_path,
+    cache_dir: Path = None,
+    use_cache: bool = True,
+    write_cache: bool = True,
+) -> pd.DataFrame:
+    """ZIP code demographics with ZIP codes kept as strings"""
+    demographics_path = Path(demographics_path)
+    return cached_table(
+        "demographics",
+        [demographics_path],
+        lambda: pd.read_csv(demographics_path, dtype={"zipcode": str}),
+        cache_dir=cache_dir,
+        use_cache=use_cache,
+        write_cache=write_cache,
+    )
+
+
+def load_training_data(
+    sales_path,
+    demographics_path,
+    sales_columns: List[str] = None,
+    cache_dir: Path = None,
+    use_cache: bool = True,
+) -> Tuple[pd.DataFrame, pd.Series]:
+    """
+    Sales merged with demographics on ZIP code, split into features and price.
+
+    The merged table is shared by training, evaluation and benchmarks; it is
+    parsed and merged once per version of the two CSVs.
+    """
+    sales_path, demographics_path = Path(sales_path), Path(demographics_path)
+    sales_columns = list(sales_columns or SALES_COLUMNS)
+
+    def build() -> pd.DataFrame:
+        sales = pd.read_csv(sales_path, usecols=sales_columns, dtype={"zipcode": str})
+        demographics = pd.read_csv(demographics_path, dtype={"zipcode": str})
+        return sales.merge(demographics, how="left", on="zipcode").drop(
+            columns="zipcode"
+        )
+
+    merged = cached_table(
+        "training",
+        [sales_path, demographics_path],
+        build,
+        key=json.dumps(sales_columns),
+        cache_dir=cache_dir,
+        use_cache=use_cache,
+    )
+    y = merged.pop("price")
+    return merged, y
@@ -0,0 +1,139 @@
+import logging
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+# Element types the demographics matrix can be held in (DEMOGRAPHICS_DTYPE)
+DEMOGRAPHICS_DTYPES = {"float32": np.float32, "float64": np.float64}
+ZIPCODE_DTYPE = np.int32
+ZIPCODE_WIDTH = 5
+
+
+def zipcode_keys(zipcodes) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Integer keys for ZIP code strings, and a mask of the valid ones.
+
+    Only exactly five digits make a valid ZIP code, so the leading zeros
+    dropped by the integer ("00601" -> 601) can't make two codes collide.
+    """
+    strings = pd.Series(zipcodes, dtype="string")
+    valid = strings.str.fullmatch(r"[0-9]{5}").fillna(False).to_numpy(dtype=bool)
+    keys = np.full(len(strings), -1, dtype=ZIPCODE_DTYPE)
+    if valid.any():
+        keys[valid] = strings[valid].astype(int).to_numpy(dtype=ZIPCODE_DTYPE)
+    return keys, valid
+
+
+class DemographicsStore:
+    """
+    Per-ZIP-code demographics as two flat arrays.
+
+    ``zipcodes`` holds the ZIP codes as sorted fixed-width integers and
+    ``values`` the matching rows of one C-contiguous float64 (or float32)
+    matrix, so a lookup is a binary search and a batch lookup one
+    ``searchsorted`` plus a fancy-indexing gather. This replaces a DataFrame
+    with an object-dtype ZIP code column and a dictionary of row views,
+    which cost several times the memory of the numbers themselves.
+    """
+
+    def __init__(
+        self, zipcodes: np.ndarray, columns: Sequence[str], values: np.ndarray
+    ):
+        if len(zipcodes) != len(values) or values.shape[1:] != (len(columns),):
+            raise ValueError("Demographics values don't match ZIP codes and columns")
+        self.zipcodes = zipcodes
+        self.columns = tuple(columns)
+        self.values = values
+
+    @classmethod
+    def from_frame(
+        cls,
+        frame: pd.DataFrame,
+        columns: Optional[List[str]] = None,
+        dtype=np.float64,
+    ) -> "DemographicsStore":
+        """
+        Build a store from a DataFrame with a ``zipcode`` column.
+
+        Rows with an invalid ZIP code are dropped, and the first row wins
+        when a ZIP code appears more than once.
+        """
+        if columns is None:
+            columns = [c for c in frame.columns if c != "zipcode"]
+        keys, valid = zipcode_keys(frame["zipcode"].astype(str))
+        if not valid.all():
+            invalid = int((~valid).sum())
+            logger.warning(f"Dropping {invalid} rows with invalid ZIP codes")
+        # A stable sort keeps duplicates in file order, so the first one leads
+        order = np.flatnonzero(valid)
+        order = order[np.argsort(keys[order], kind="stable")]
+        first = np.ones(len(order), dtype=bool)
+        first[1:] = keys[order][1:] != keys[order][:-1]
+        rows = order[first]
+        values = frame[list(columns)].to_numpy(dtype=np.float64)[rows]
+        return cls(
+            np.ascontiguousarray(keys[rows]),
+            columns,
+            np.ascontiguousarray(values, dtype=dtype),
+        )
+
+    def select(self, columns: Sequence[str]) -> "DemographicsStore":
+        """A store with only the given columns, in that order"""
+        positions = [self.columns.index(column) for column in columns]
+        return DemographicsStore(
+            self.zipcodes, columns, np.ascontiguousarray(self.values[:, positions])
+        )
+
+    def lookup(self, zipcodes) -> Tuple[np.ndarray, np.ndarray]:
+        """Row ids of the ZIP codes, and which of them are in the store"""
+        keys, valid = zipcode_keys(zipcodes)
+        if len(self.zipcodes) == 0:
+            return np.zeros(len(keys), dtype=np.intp), np.zeros(len(keys), dtype=bool)
+        row_ids = np.minimum(
+            np.searchsorted(self.zipcodes, keys), len(self.zipcodes) - 1
+        )
+        return row_ids, valid & (self.zipcodes[row_ids] == keys)
+
+    def row(self, zipcode: str) -> Optional[np.ndarray]:
+        """Demographics of one ZIP code, or None if it isn't in the store"""
+        zipcode = str(zipcode)
+        if len(zipcode) != ZIPCODE_WIDTH or not zipcode.isdigit():
+            return None
+        key = int(zipcode)
+        i = int(np.searchsorted(self.zipcodes, key))
+        if i < len(self.zipcodes) and self.zipcodes[i] == key:
+            return self.values[i]
+        return None
+
+    def zipcode(self, i: int) -> str:
+        """ZIP code string of row i"""
+        return f"{int(self.zipcodes[i]):0{ZIPCODE_WIDTH}d}"
+
+    def __contains__(self, zipcode) -> bool:
+        return self.row(zipcode) is not None
+
+    def __len__(self) -> int:
+        return len(self.zipcodes)
+
+    @property
+    def nbytes(self) -> int:
+        return self.zipcodes.nbytes + self.values.nbytes
+
+
+def memory_report(
+    frame: pd.DataFrame, dtypes: Sequence[str] = ("float32", "float64")
+) -> Dict:
+    """Bytes held by the demographics as a DataFrame and as a store of each dtype"""
+    report = {
+        "rows": len(frame),
+        "columns": frame.shape[1] - 1,
+        "dataframe_bytes": int(frame.memory_usage(deep=True).sum()),
+    }
+    for name in dtypes:
+        store = DemographicsStore.from_frame(frame, dtype=DEMOGRAPHICS_DTYPES[name])
+        report[f"store_{name}_bytes"] = store.nbytes
+        report[f"store_{name}_ratio"] = store.nbytes / report["dataframe_bytes"]
+    return report
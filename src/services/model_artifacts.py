@@ -0,0 +1,114 @@
+import json
+import logging
+import os
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+import numpy as np
+from sklearn.neighbors import NearestNeighbors
+
+from services.compiled_predictor import CompiledKNNPredictor
+
+logger = logging.getLogger(__name__)
+
+# Directory, inside the model directory, holding the pickle-free artifact
+ARTIFACT_DIR = "knn_artifact"
+ARTIFACT_FORMAT_VERSION = 1
+# Written last, so its presence and mtime mark a complete artifact
+METADATA_FILE = "scaler.json"
+TRAIN_X_FILE = "train_X.npy"
+TRAIN_Y_FILE = "train_y.npy"
+
+
+def replace_atomically(path: Path, write):
+    """Write to a temporary file and rename it over ``path``.
+
+    Processes that already memory-mapped the old file keep reading the old
+    inode; overwriting it in place would change (or truncate) their pages.
+    """
+    tmp_path = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    with open(tmp_path, "wb") as f:
+        write(f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+def save_knn_artifact(
+    model, features: List[str], directory, metadata: Dict = None
+) -> Path:
+    """
+    Export a fitted ``RobustScaler -> KNN`` pipeline without pickle.
+
+    The scaler parameters, feature list and neighbor count go to JSON; the
+    scaled training matrix and targets go to raw ``.npy`` files that
+    ``load_knn_artifact`` memory-maps.
+
+    Raises:
+        ValueError: if the pipeline can't be compiled, or uses an approximate
+            neighbor index (the artifact always searches exactly)
+    """
+    predictor = CompiledKNNPredictor.from_pipeline(model, features)
+    if predictor.approximate_index is not None:
+        raise ValueError("Approximate neighbor indexes can't be exported")
+
+    directory = Path(directory)
+    directory.mkdir(parents=True, exist_ok=True)
+    train_X = np.ascontiguousarray(predictor.fit_X, dtype=np.float64)
+    train_y = np.ascontiguousarray(predictor.fit_y, dtype=np.float64)
+    replace_atomically(directory / TRAIN_X_FILE, lambda f: np.save(f, train_X))
+    replace_atomically(directory / TRAIN_Y_FILE, lambda f: np.save(f, train_y))
+
+    document = {
+        "format_version": ARTIFACT_FORMAT_VERSION,
+        "features": list(features),
+        "center": np.asarray(predictor.center, dtype=np.float64).tolist(),
+        "scale": np.asarray(predictor.scale, dtype=np.float64).tolist(),
+        "n_neighbors": int(predictor.n_neighbors),
+        "n_train": int(len(train_X)),
+        **(metadata or {}),
+    }
+    replace_atomically(
+        directory / METADATA_FILE,
+        lambda f: f.write(json.dumps(document, indent=2).encode("utf-8")),
+    )
+    return directory
+
+
+def load_knn_artifact(directory) -> Tuple[CompiledKNNPredictor, Dict]:
+    """
+    Load an exported artifact with the training data memory-mapped.
+
+    The ``.npy`` files are opened read-only with ``mmap_mode='r'``, so every
+    process on a host shares the same page-cache pages instead of holding a
+    private copy of the training matrix.
+
+    Returns:
+        The brute-force predictor and the artifact's JSON document
+    """
+    directory = Path(directory)
+    with open(directory / METADATA_FILE, "r") as f:
+        document = json.load(f)
+    if document.get("format_version") != ARTIFACT_FORMAT_VERSION:
+        raise ValueError(
+            f"Unsupported artifact format {document.get('format_version')}"
+        )
+
+    train_X = np.load(directory / TRAIN_X_FILE, mmap_mode="r")
+    train_y = np.load(directory / TRAIN_Y_FILE, mmap_mode="r")
+    if train_X.shape != (document["n_train"], len(document["features"])):
+        raise ValueError(f"Artifact training matrix has shape {train_X.shape}")
+
+    n_neighbors = document["n_neighbors"]
+    # Same brute-force search the pickled model used, for tied neighbors
+    tie_breaker = NearestNeighbors(n_neighbors=n_neighbors, algorithm="brute")
+    tie_breaker.fit(train_X)
+    predictor = CompiledKNNPredictor(
+        np.asarray(document["center"], dtype=np.float64),
+        np.asarray(document["scale"], dtype=np.float64),
+        train_X,
+        train_y,
+        n_neighbors,
+        tie_breaker=tie_breaker,
+    )
+    return predictor, document
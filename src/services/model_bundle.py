@@ -0,0 +1,44 @@
+import time
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from services.compiled_predictor import CompiledKNNPredictor
+from services.demographics_store import DemographicsStore
+
+
+@dataclass(frozen=True, eq=False)
+class ModelBundle:
+    """
+    Everything needed to serve predictions for one model version.
+
+    A bundle is built and validated completely before it is published, and is
+    never modified afterwards. ModelService swaps bundles with a single
+    reference assignment, so a request that took a reference to the current
+    bundle keeps a consistent model, feature list and demographics index for
+    its whole lifetime, even if a reload publishes a new one meanwhile.
+    """
+
+    model: Any
+    features: List[str]
+    version: str
+    mtime: float
+    neighbor_index: Dict
+    compiled_predictor: Optional[CompiledKNNPredictor] = None
+    # Demographics by ZIP code, columns ordered as in features
+    demographics_columns: Tuple[str, ...] = ()
+    demographics: Optional[DemographicsStore] = None
+    # Feature positions of the leading demographics columns that are features,
+    # and a feature row holding the defaults for unknown ZIP codes
+    demographics_positions: Optional[np.ndarray] = None
+    default_features: Optional[np.ndarray] = None
+    # Request fields that can change the prediction, keyed by minimal mode
+    relevant_fields: Dict[bool, Tuple[str, ...]] = field(
+        default_factory=lambda: {False: (), True: ()}
+    )
+    # Content hash, feature list hash and training metadata of the model files
+    manifest: Optional[Dict] = None
+    # Rows appended since the base model was fit (see services.model_delta)
+    delta: Optional[Dict] = None
+    loaded_at: float = field(default_factory=time.time)
@@ -0,0 +1,208 @@
+import json
+import logging
+import time
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+import numpy as np
+from sklearn.preprocessing import RobustScaler
+
+from services.compiled_predictor import DISTANCE_BLOCK_ELEMENTS, CompiledKNNPredictor
+from services.model_artifacts import replace_atomically
+
+logger = logging.getLogger(__name__)
+
+# Files, inside the model directory, holding rows appended since the last full
+# fit. The rows are stored unscaled so compaction can refit the scaler on them
+DELTA_FORMAT_VERSION = 1
+# Written last, so its presence and mtime mark a complete delta
+DELTA_FILE = "delta.json"
+DELTA_X_FILE = "delta_X.npy"
+DELTA_Y_FILE = "delta_y.npy"
+
+
+def base_fingerprint(predictor: CompiledKNNPredictor, base_rows: int = None) -> Dict:
+    """Identifies the base model a delta was computed against"""
+    return {
+        "n_train": int(base_rows if base_rows is not None else len(predictor.fit_X)),
+        "center": np.asarray(predictor.center, dtype=np.float64).tolist(),
+        "scale": np.asarray(predictor.scale, dtype=np.float64).tolist(),
+    }
+
+
+def matches_base(
+    document: Dict, predictor: CompiledKNNPredictor, base_rows: int
+) -> bool:
+    """True when a delta was written against this predictor's base rows"""
+    base = document["base"]
+    return (
+        base["n_train"] == base_rows
+        and np.allclose(base["center"], predictor.center, rtol=1e-12, atol=0.0)
+        and np.allclose(base["scale"], predictor.scale, rtol=1e-12, atol=0.0)
+    )
+
+
+def training_rows(predictor: CompiledKNNPredictor) -> np.ndarray:
+    """
+    The scaled training rows, in the same order as ``predictor.fit_y``.
+
+    An IVF index keeps its rows grouped by cell, so its ``fit_X`` is a
+    permutation of the training order; ``fit_row_ids_`` maps it back.
+    """
+    index = predictor.approximate_index
+    if index is None:
+        return predictor.fit_X
+    rows = np.empty_like(index.fit_X_)
+    rows[index.fit_row_ids_] = index.fit_X_
+    return rows
+
+
+def unscaled_rows(predictor: CompiledKNNPredictor, base_rows: int = None) -> np.ndarray:
+    """The base training rows in raw feature units, aligned with fit_y"""
+    fit_X = training_rows(predictor)[:base_rows]
+    return np.asarray(fit_X) * predictor.scale + predictor.center
+
+
+def scaler_drift(center: np.ndarray, scale: np.ndarray, X_raw: np.ndarray) -> float:
+    """
+    How far a RobustScaler refit on ``X_raw`` would move from the fitted one.
+
+    The larger of the center shift, in units of the current scale, and the
+    relative change of the scale, over all features. Appended rows are scaled
+    with the old parameters, so past some drift the neighbors they produce no
+    longer match what a full refit would.
+    """
+    refit = RobustScaler().fit(X_raw)
+    shift = np.abs(refit.center_ - center) / scale
+    stretch = np.abs(refit.scale_ / scale - 1.0)
+    return float(max(shift.max(), stretch.max()))
+
+
+def save_delta(
+    directory,
+    features: List[str],
+    base: Dict,
+    X_raw: np.ndarray,
+    y: np.ndarray,
+    metadata: Dict = None,
+) -> Path:
+    """Write the appended rows, replacing any previous delta"""
+    directory = Path(directory)
+    X_raw = np.ascontiguousarray(X_raw, dtype=np.float64)
+    y = np.ascontiguousarray(y, dtype=np.float64)
+    if X_raw.shape != (len(y), len(features)):
+        raise ValueError(f"Delta rows have shape {X_raw.shape}")
+
+    replace_atomically(directory / DELTA_X_FILE, lambda f: np.save(f, X_raw))
+    replace_atomically(directory / DELTA_Y_FILE, lambda f: np.save(f, y))
+    document = {
+        "format_version": DELTA_FORMAT_VERSION,
+        "features": list(features),
+        "rows": int(len(y)),
+        "base": base,
+        "created_at": time.time(),
+        **(metadata or {}),
+    }
+    replace_atomically(
+        directory / DELTA_FILE,
+        lambda f: f.write(json.dumps(document, indent=2).encode("utf-8")),
+    )
+    return directory / DELTA_FILE
+
+
+def load_delta(directory) -> Tuple[np.ndarray, np.ndarray, Dict]:
+    """Raw appended rows, their targets and the delta's JSON document"""
+    directory = Path(directory)
+    with open(directory / DELTA_FILE, "r") as f:
+        document = json.load(f)
+    if document.get("format_version") != DELTA_FORMAT_VERSION:
+        raise ValueError(f"Unsupported delta format {document.get('format_version')}")
+
+    X_raw = np.load(directory / DELTA_X_FILE)
+    y = np.load(directory / DELTA_Y_FILE)
+    if X_raw.shape != (document["rows"], len(document["features"])):
+        raise ValueError(f"Delta matrix has shape {X_raw.shape}")
+    return X_raw, y, document
+
+
+def remove_delta(directory):
+    """Delete the delta files; the metadata goes first so no half-delta loads"""
+    directory = Path(directory)
+    for name in (DELTA_FILE, DELTA_X_FILE, DELTA_Y_FILE):
+        (directory / name).unlink(missing_ok=True)
+
+
+class DeltaKNNPredictor:
+    """
+    A base predictor whose neighbor search also covers appended rows.
+
+    The base predictor is used as is, so memory-mapped training rows stay
+    shared between processes and KD-/Ball-tree indexes keep their type. The
+    appended rows get their own small brute-force search, and each query
+    keeps the k nearest of the two result sets. Building one costs time and
+    memory proportional to the delta, not the base model.
+    """
+
+    def __init__(self, base: CompiledKNNPredictor, X_scaled: np.ndarray, y):
+        self.base = base
+        self.center = base.center
+        self.scale = base.scale
+        self.n_neighbors = base.n_neighbors
+        self.approximate_index = base.approximate_index
+        self.delta = CompiledKNNPredictor(
+            base.center,
+            base.scale,
+            np.ascontiguousarray(X_scaled, dtype=np.float64),
+            np.asarray(y, dtype=np.float64),
+            min(base.n_neighbors, len(y)),
+        )
+
+    def _predict_scaled(self, X_scaled: np.ndarray) -> np.ndarray:
+        """Mean target of the k nearest base or appended rows"""
+        base_distances, base_ids = self.base.kneighbors(X_scaled, return_distance=True)
+        delta_distances, delta_ids = self.delta.kneighbors(
+            X_scaled, return_distance=True
+        )
+        distances = np.hstack([base_distances, delta_distances])
+        targets = np.hstack([self.base.fit_y[base_ids], self.delta.fit_y[delta_ids]])
+        # A stable sort lets base rows win ties, as if listed first in one index
+        order = np.argsort(distances, axis=1, kind="stable")[:, : self.n_neighbors]
+        return np.take_along_axis(targets, order, axis=1).mean(axis=1)
+
+    def predict(self, X: np.ndarray) -> np.ndarray:
+        """Predict from a raw feature matrix with columns in model order"""
+        X_scaled = np.atleast_2d(
+            (np.asarray(X, dtype=np.float64) - self.center) / self.scale
+        )
+        block = max(1, DISTANCE_BLOCK_ELEMENTS // len(self.base.fit_y))
+        if len(X_scaled) <= block:
+            return self._predict_scaled(X_scaled)
+        return np.concatenate(
+            [
+                self._predict_scaled(X_scaled[start : start + block])
+                for start in range(0, len(X_scaled), block)
+            ]
+        )
+
+
+def apply_delta(predictor, X_raw: np.ndarray, y: np.ndarray):
+    """
+    Extend a predictor's neighbor search with appended rows.
+
+    The appended rows are scaled with the base scaler. A predictor that
+    already carries a delta is rebuilt from its base, since deltas are
+    cumulative. Approximate (IVF) indexes aren't extended; create_model.py
+    refits them instead.
+
+    Raises:
+        ValueError: if the predictor uses an approximate neighbor index
+    """
+    if isinstance(predictor, DeltaKNNPredictor):
+        predictor = predictor.base
+    if predictor.approximate_index is not None:
+        raise ValueError("Approximate neighbor indexes can't take appended rows")
+    if len(y) == 0:
+        return predictor
+
+    X_scaled = (np.asarray(X_raw, dtype=np.float64) - predictor.center) / predictor.scale
+    return DeltaKNNPredictor(predictor, X_scaled, y)
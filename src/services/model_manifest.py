@@ -0,0 +1,142 @@
+import hashlib
+import json
+import logging
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from services.model_artifacts import (
+    ARTIFACT_DIR,
+    METADATA_FILE,
+    TRAIN_X_FILE,
+    TRAIN_Y_FILE,
+    replace_atomically,
+)
+
+logger = logging.getLogger(__name__)
+
+# Written last by create_model.py, next to the files it describes
+MANIFEST_FILE = "manifest.json"
+MANIFEST_FORMAT_VERSION = 1
+# Files, relative to the model directory, whose contents make up a model
+MODEL_FILES = (
+    "model.pkl",
+    "model_features.json",
+    f"{ARTIFACT_DIR}/{METADATA_FILE}",
+    f"{ARTIFACT_DIR}/{TRAIN_X_FILE}",
+    f"{ARTIFACT_DIR}/{TRAIN_Y_FILE}",
+)
+# Hex digits of the content hash used as the model version
+VERSION_LENGTH = 16
+
+
+def file_sha256(path) -> str:
+    """SHA-256 of a file's contents"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def features_hash(features: List[str]) -> str:
+    """SHA-256 of a feature list, order included"""
+    return hashlib.sha256(json.dumps(list(features)).encode("utf-8")).hexdigest()
+
+
+def model_files(model_dir, known: Dict = None) -> Dict[str, Dict]:
+    """
+    Digest, size and mtime of every model file present in ``model_dir``.
+
+    A digest from ``known`` is reused when the file's size and mtime still
+    match it, so checking an unchanged model only costs a stat per file.
+    """
+    model_dir = Path(model_dir)
+    known = known or {}
+    files = {}
+    for name in MODEL_FILES:
+        try:
+            stat = (model_dir / name).stat()
+        except FileNotFoundError:
+            continue
+        entry = known.get(name)
+        if (
+            entry is None
+            or entry["size"] != stat.st_size
+            or entry["mtime_ns"] != stat.st_mtime_ns
+        ):
+            entry = {
+                "sha256": file_sha256(model_dir / name),
+                "size": stat.st_size,
+                "mtime_ns": stat.st_mtime_ns,
+            }
+        files[name] = entry
+    return files
+
+
+def content_hash(files: Dict[str, Dict]) -> str:
+    """
+    SHA-256 over the names and digests of a model's files.
+
+    Depends only on file contents, so touching or copying a model leaves it
+    unchanged and every replica computes the same value for the same files.
+    """
+    digest = hashlib.sha256()
+    for name in sorted(files):
+        digest.update(f"{name}:{files[name]['sha256']}\n".encode("utf-8"))
+    return digest.hexdigest()
+
+
+def write_manifest(model_dir, features: List[str], metadata: Dict = None) -> Dict:
+    """Hash the model files and record them, with training metadata"""
+    model_dir = Path(model_dir)
+    files = model_files(model_dir)
+    document = {
+        "format_version": MANIFEST_FORMAT_VERSION,
+        "content_hash": content_hash(files),
+        "features_hash": features_hash(features),
+        "files": files,
+        "created_at": time.time(),
+        "metadata": metadata or {},
+    }
+    replace_atomically(
+        model_dir / MANIFEST_FILE,
+        lambda f: f.write(json.dumps(document, indent=2).encode("utf-8")),
+    )
+    return document
+
+
+def read_manifest(model_dir) -> Optional[Dict]:
+    """The model directory's manifest, or None if missing or unreadable"""
+    try:
+        with open(Path(model_dir) / MANIFEST_FILE, "r") as f:
+            document = json.load(f)
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError) as e:
+        logger.warning(f"Ignoring unreadable model manifest: {e}")
+        return None
+    if document.get("format_version") != MANIFEST_FORMAT_VERSION:
+        logger.warning(f"Ignoring manifest format {document.get('format_version')}")
+        return None
+    return document
+
+
+def current_content(
+    model_dir, known: Dict = None
+) -> Tuple[str, Dict[str, Dict], Optional[Dict]]:
+    """
+    Content hash of the model files as they are now.
+
+    Digests recorded in the manifest (and in ``known``) are reused for files
+    that haven't changed since. Returns the hash, the per-file digests and
+    the manifest when it describes exactly these files (None otherwise).
+    """
+    manifest = read_manifest(model_dir)
+    recorded = {**(manifest["files"] if manifest else {}), **(known or {})}
+    files = model_files(model_dir, recorded)
+    digest = content_hash(files)
+    if manifest is not None and manifest["content_hash"] != digest:
+        # Files replaced without a new manifest: the hash still stands
+        manifest = None
+    return digest, files, manifest
@@ -1,167 +1,1123 @@
+import asyncio
+import dataclasses
 import json
 import logging
 import os
 import pickle
 import threading
+import time
 from pathlib import Path
-from typing import Dict
+from typing import Callable, Dict, List, Optional, Tuple, Union
 
+import numpy as np
 import pandas as pd
 
+from core.metrics import STAGE_SECONDS
+from services.compiled_predictor import CompiledKNNPredictor
+from services.data_cache import load_demographics
+from services.demographics_store import DEMOGRAPHICS_DTYPES, DemographicsStore
+from services.model_artifacts import ARTIFACT_DIR, METADATA_FILE, load_knn_artifact
+from services.model_bundle import ModelBundle
+from services.model_delta import DELTA_FILE, apply_delta, load_delta, matches_base
+from services.model_manifest import (
+    VERSION_LENGTH,
+    current_content,
+    features_hash,
+    file_sha256,
+)
+from services.neighbor_index import describe_neighbor_index
+from services.prediction_batcher import PredictionBatcher
+from services.prediction_cache import PredictionCache
+
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 
+# Fields read from the request when only the minimal feature set is provided
+MINIMAL_FEATURES = [
+    "bedrooms",
+    "bathrooms",
+    "sqft_living",
+    "sqft_lot",
+    "floors",
+    "sqft_above",
+    "sqft_basement",
+]
+
+# Demographics used when a ZIP code is not present in the demographics data
+DEFAULT_DEMOGRAPHICS = {
+    "medn_hshld_incm_amt": 50000.0,
+    "hous_val_amt": 250000.0,
+    "per_urbn": 80.0,
+    "per_sbrbn": 20.0,
+}
+
+
 class ModelService:
-    def __init__(self):
+    def __init__(self, model_dir: str = "model", data_dir: str = "data"):
         self.lock = threading.Lock()
-        self.model_path = Path("model/model.pkl")
-        self.features_path = Path("model/model_features.json")
-        self.model_mtime = None
-        self.model = None
-        self.features = None
-        self.demographics_data = None
-        self.model_version = "1.0.0"
-        self.load_model()
+        self.model_path = Path(model_dir) / "model.pkl"
+        self.features_path = Path(model_dir) / "model_features.json"
+        # "pickle" loads model.pkl; "mmap" memory-maps the knn_artifact export
+        self.model_format = os.getenv("MODEL_FORMAT", "pickle").lower()
+        self.artifact_path = Path(model_dir) / ARTIFACT_DIR
+        self.model_dir = Path(model_dir)
+        # Digests of the model files as last hashed, reused while unchanged
+        self._file_digests = {}
+        # Rows appended since the last full fit (create_model.py --append)
+        self.delta_path = Path(model_dir) / DELTA_FILE
+        self.demographics_path = Path(data_dir) / "zipcode_demographics.csv"
+        # Element type of the in-memory demographics matrix; float32 is an
+        # opt-in that halves its memory at about 7 significant digits
+        self.demographics_dtype = os.getenv("DEMOGRAPHICS_DTYPE", "float64").lower()
+        if self.demographics_dtype not in DEMOGRAPHICS_DTYPES:
+            raise ValueError(
+                f"DEMOGRAPHICS_DTYPE must be one of {tuple(DEMOGRAPHICS_DTYPES)}"
+            )
+        # Rows handed to the model in a single predict call on the batch path
+        self.batch_chunk_size = int(os.getenv("MODEL_BATCH_CHUNK_SIZE", "1000"))
+        # Serve predictions from NumPy arrays instead of the sklearn Pipeline
+        self.compiled_inference = os.getenv(
+            "MODEL_COMPILED_INFERENCE", "false"
+        ).lower() in ("true", "1", "yes")
+        # Optional micro-batching of concurrent single predictions
+        self.batcher = None
+        if os.getenv("MODEL_BATCHING_ENABLED", "false").lower() in ("true", "1", "yes"):
+            self.batcher = PredictionBatcher(
+                self._predict_chunked,
+                max_batch_size=int(os.getenv("MODEL_BATCH_MAX_SIZE", "32")),
+                max_wait_ms=float(os.getenv("MODEL_BATCH_MAX_WAIT_MS", "5")),
+            )
+        # LRU/TTL cache of predictions keyed on (model version, feature vector)
+        self.prediction_cache = None
+        if os.getenv("PREDICTION_CACHE_ENABLED", "true").lower() in ("true", "1", "yes"):
+            self.prediction_cache = PredictionCache(
+                max_size=int(os.getenv("PREDICTION_CACHE_SIZE", "10000")),
+                ttl_seconds=float(os.getenv("PREDICTION_CACHE_TTL", "3600")),
+            )
+        # Recorded requests replayed through each new bundle before it serves
+        self.warmup_samples = int(os.getenv("MODEL_WARMUP_SAMPLES", "32"))
+        self.warmup_path = Path(data_dir) / "future_unseen_examples.csv"
+        self.warmup_status = None
+        self._warmup_records = None
+        # Set once a warmed-up bundle has been published
+        self.ready = threading.Event()
+        self.demographics_store: Optional[DemographicsStore] = None
+        # The published model bundle; replaced as a whole, never mutated
+        self.bundle: Optional[ModelBundle] = None
+        # Model swaps only; demographics refreshes are counted separately
+        self.reload_count = 0
+        self.reload_failures = 0
+        self.demographics_refresh_count = 0
+        self.last_load_seconds = None
         self.load_demographics()
+        self.load_model()
+
+    # Read-only views of the published bundle
+    @property
+    def model(self):
+        return self.bundle.model if self.bundle else None
+
+    @property
+    def features(self) -> Optional[List[str]]:
+        return self.bundle.features if self.bundle else None
+
+    @property
+    def model_version(self) -> Optional[str]:
+        return self.bundle.version if self.bundle else None
+
+    @property
+    def model_mtime(self) -> Optional[float]:
+        return self.bundle.mtime if self.bundle else None
+
+    @property
+    def neighbor_index(self) -> Optional[Dict]:
+        return self.bundle.neighbor_index if self.bundle else None
+
+    @property
+    def compiled_predictor(self) -> Optional[CompiledKNNPredictor]:
+        return self.bundle.compiled_predictor if self.bundle else None
+
+    @property
+    def demographics_columns(self) -> List[str]:
+        return list(self.bundle.demographics_columns) if self.bundle else []
+
+    @property
+    def demographics(self) -> Optional[DemographicsStore]:
+        return self.bundle.demographics if self.bundle else None
 
     # Load the model and features
     def load_model(self):
+        """Build a new model bundle off to the side, validate it, then publish it"""
+        # Serializes loaders only; requests never wait on this lock
         with self.lock:
-            if not self.model_path.exists() or not self.features_path.exists():
-                logger.error("Model files not found. Please run create_model.py first.")
-                raise FileNotFoundError("Model files not found")
-            with open(self.model_path, "rb") as f:
-                self.model = pickle.load(f)
-            with open(self.features_path, "r") as f:
-                self.features = json.load(f)
-            self.model_mtime = os.path.getmtime(self.model_path)
-            self.model_version = str(self.model_mtime)
-            logger.info(f"Model loaded. Version: {self.model_version}")
-
-    # Reload the model if the file has changed
-    def reload_model(self):
+            try:
+                bundle = self.preload_model()
+            except Exception:
+                self.reload_failures += 1
+                raise
+            self.publish_bundle(bundle)
+
+    # Build and validate a bundle without making it visible to requests
+    def preload_model(self) -> ModelBundle:
+        """Load the model and build a complete, warmed-up bundle"""
+        start = time.perf_counter()
+        # Hashed before loading: if the files change meanwhile, the next
+        # check sees a different hash and reloads again
+        digest, manifest = self.current_content_hash()
+        if self.model_format == "mmap":
+            bundle = self._load_artifact_bundle()
+        else:
+            bundle = self._load_pickle_bundle()
+        bundle = self._with_manifest(bundle, digest, manifest)
+
+        try:
+            bundle = self._with_delta(bundle)
+        except (OSError, ValueError) as e:
+            logger.warning(f"Serving the base model without its delta: {e}")
+        bundle = self._with_demographics(bundle)
+        self._validate_bundle(bundle)
+        self._warm_up(bundle)
+        self.last_load_seconds = time.perf_counter() - start
+        return bundle
+
+    # Unpickle the full sklearn pipeline
+    def _load_pickle_bundle(self) -> ModelBundle:
+        """Bundle around the pickled pipeline, compiled when enabled"""
+        if not self.model_path.exists() or not self.features_path.exists():
+            logger.error("Model files not found. Please run create_model.py first.")
+            raise FileNotFoundError("Model files not found")
+
+        mtime = os.path.getmtime(self.model_path)
+        with open(self.model_path, "rb") as f:
+            model = pickle.load(f)
+        with open(self.features_path, "r") as f:
+            features = json.load(f)
+
+        return ModelBundle(
+            model=model,
+            features=features,
+            version=str(mtime),
+            mtime=mtime,
+            # The neighbor index is whatever was exported with the pipeline
+            neighbor_index=describe_neighbor_index(model),
+            compiled_predictor=self._compile_model(model, features),
+        )
+
+    # Memory-map the pickle-free artifact written next to model.pkl
+    def _load_artifact_bundle(self) -> ModelBundle:
+        """Bundle around a memory-mapped brute-force predictor, without pickle"""
+        metadata_path = self.artifact_path / METADATA_FILE
+        if not metadata_path.exists():
+            logger.error("Model artifact not found. Please run create_model.py first.")
+            raise FileNotFoundError("Model artifact not found")
+
+        mtime = os.path.getmtime(metadata_path)
+        predictor, document = load_knn_artifact(self.artifact_path)
+        return ModelBundle(
+            model=None,
+            features=document["features"],
+            version=str(mtime),
+            mtime=mtime,
+            neighbor_index={
+                "index": "brute",
+                "exact": True,
+                "n_neighbors": predictor.n_neighbors,
+                "format": "mmap",
+            },
+            compiled_predictor=predictor,
+        )
+
+    # Content hash of the model files, cheap while they match the manifest
+    def current_content_hash(self):
+        """Content hash of the model files and their manifest, if current"""
+        digest, self._file_digests, manifest = current_content(
+            self.model_dir, self._file_digests
+        )
+        return digest, manifest
+
+    # Version the bundle by content, so identical files get identical versions
+    def _with_manifest(
+        self, bundle: ModelBundle, digest: str, manifest: Optional[Dict]
+    ) -> ModelBundle:
+        """Copy of the bundle versioned by its content hash"""
+        loaded_features = features_hash(bundle.features)
+        if manifest is not None and manifest["features_hash"] != loaded_features:
+            raise ValueError("Model features don't match the model manifest")
+        return dataclasses.replace(
+            bundle,
+            version=digest[:VERSION_LENGTH],
+            manifest={
+                "content_hash": digest,
+                "features_hash": loaded_features,
+                "created_at": manifest["created_at"] if manifest else None,
+                "metadata": manifest["metadata"] if manifest else None,
+            },
+        )
+
+    # Extend the bundle's neighbor search with rows appended since the last fit
+    def _with_delta(self, bundle: ModelBundle) -> ModelBundle:
+        """
+        Copy of the bundle whose predictor also searches the delta rows.
+
+        Raises:
+            ValueError: if the delta was written against another base model,
+                or the model's neighbor index can't take appended rows
+        """
+        if not self.delta_path.exists():
+            if bundle.delta is None:
+                return bundle
+            raise ValueError("Model delta was removed; reload the base model")
+
+        digest = file_sha256(self.delta_path)
+        X_raw, y, document = load_delta(self.delta_path.parent)
+        predictor = bundle.compiled_predictor
+        if predictor is None:
+            # Pickle mode without compiled inference: extract the search arrays
+            predictor = CompiledKNNPredictor.from_pipeline(
+                bundle.model, bundle.features
+            )
+        if bundle.delta is None:
+            base_rows, base_version = len(predictor.fit_X), bundle.version
+        else:
+            base_rows = bundle.delta["base_rows"]
+            base_version = bundle.delta["base_version"]
+        if document["features"] != bundle.features or not matches_base(
+            document, predictor, base_rows
+        ):
+            raise ValueError(f"Model delta {self.delta_path} belongs to another model")
+
+        return dataclasses.replace(
+            bundle,
+            model=None,
+            version=f"{base_version}+{digest[:8]}",
+            neighbor_index={
+                **bundle.neighbor_index,
+                "delta_rows": len(y),
+                "delta_index": "brute",
+            },
+            compiled_predictor=apply_delta(predictor, X_raw, y),
+            delta={
+                "rows": len(y),
+                "base_rows": base_rows,
+                "base_version": base_version,
+                "digest": digest,
+                "created_at": document["created_at"],
+            },
+        )
+
+    # Apply a new delta on top of the published base model, without unpickling
+    def apply_model_delta(self):
+        """Build, validate and publish the current bundle extended by the delta"""
         with self.lock:
-            current_mtime = os.path.getmtime(self.model_path)
-            if current_mtime != self.model_mtime:
-                logger.info("Reloading model due to file change...")
-                # Release lock before calling load_model to avoid deadlock
-                should_reload = True
+            try:
+                start = time.perf_counter()
+                bundle = self._with_delta(self.bundle)
+                self._validate_bundle(bundle)
+                self._warm_up(bundle)
+                self.last_load_seconds = time.perf_counter() - start
+            except Exception:
+                self.reload_failures += 1
+                raise
+            self.publish_bundle(bundle)
+
+    # Digest of the delta file, None when there is no delta
+    def delta_digest(self) -> Optional[str]:
+        """SHA-256 of the delta metadata file, if one exists"""
+        try:
+            return file_sha256(self.delta_path)
+        except FileNotFoundError:
+            return None
+
+    # Rows appended (or compacted away) since the delta the bundle applied
+    def delta_changed(self) -> bool:
+        """True when the delta file's digest differs from the loaded delta's"""
+        delta = self.bundle.delta if self.bundle else None
+        return self.delta_digest() != (delta["digest"] if delta else None)
+
+    # Cheap check for new model content (not just a new mtime)
+    def model_changed(self) -> bool:
+        """True when the model files' content hash differs from the loaded one"""
+        manifest = self.bundle.manifest if self.bundle else None
+        digest, _ = self.current_content_hash()
+        return manifest is None or digest != manifest["content_hash"]
+
+    # File whose modification time identifies the loaded model
+    def source_path(self) -> Path:
+        """model.pkl, or the artifact metadata file in mmap mode"""
+        if self.model_format == "mmap":
+            return self.artifact_path / METADATA_FILE
+        return self.model_path
+
+    # Make a bundle visible to requests with a single reference swap
+    def publish_bundle(self, bundle: ModelBundle, model_swap: bool = True):
+        """
+        Publish a validated bundle; in-flight requests keep the old one.
+
+        ``model_swap`` is False when only the demographics changed, so the
+        model reload count isn't bumped by a demographics refresh.
+        """
+        previous = self.bundle
+        self.bundle = bundle
+        # Cached predictions belong to the previous model or demographics
+        if self.prediction_cache is not None and previous is not None:
+            self.prediction_cache.clear()
+        if previous is not None:
+            if model_swap:
+                self.reload_count += 1
             else:
-                logger.info("Model file unchanged. No reload needed.")
-                should_reload = False
-        
-        # Call load_model outside the lock to avoid deadlock
-        if should_reload:
+                self.demographics_refresh_count += 1
+        self.ready.set()
+        logger.info(
+            f"Model loaded. Version: {bundle.version}, "
+            f"neighbor index: {bundle.neighbor_index['index']}"
+        )
+
+    # Check a freshly built bundle can predict before it is published
+    def _validate_bundle(self, bundle: ModelBundle):
+        """Run a warm-up prediction through the bundle, raising if it fails"""
+        request_data = {feature: 1.0 for feature in bundle.features}
+        request_data["zipcode"] = self._sample_zipcode(bundle)
+        features_df = self._prepare_with(bundle, [request_data], minimal=False)
+
+        prediction = self._model_predict(bundle, features_df)
+        if prediction.shape != (1,) or not np.isfinite(prediction).all():
+            raise ValueError(f"Model bundle {bundle.version} failed validation")
+        if bundle.compiled_predictor is not None and bundle.model is not None:
+            expected = bundle.model.predict(features_df)
+            if not np.allclose(prediction, expected):
+                raise ValueError(
+                    f"Compiled predictor for {bundle.version} disagrees with pipeline"
+                )
+
+    # Replay requests through a new bundle so its first real requests are fast
+    def _warm_up(self, bundle: ModelBundle):
+        """Run warm-up requests through the single and batch prediction paths"""
+        records = self._warmup_requests(bundle)
+        if not records:
+            return
+
+        start = time.perf_counter()
+        for record in records:
+            for minimal in (False, True):
+                features_df = self.prepare_features(record, minimal, bundle=bundle)
+                self.predict(features_df, use_cache=False, bundle=bundle)
+        features_df = self.prepare_features_batch(records, bundle=bundle)
+        self._predict_chunked(features_df, bundle)
+        elapsed = time.perf_counter() - start
+
+        self.warmup_status = {
+            "version": bundle.version,
+            "samples": len(records),
+            "seconds": elapsed,
+            "completed_at": time.time(),
+        }
+        logger.info(
+            f"Model {bundle.version} warmed up with {len(records)} requests "
+            f"in {elapsed * 1000:.1f}ms"
+        )
+
+    # Requests used for warm-up: recorded examples, or one synthetic request
+    def _warmup_requests(self, bundle: ModelBundle) -> List[Dict]:
+        """Up to warmup_samples request dicts covering every model feature"""
+        if self.warmup_samples <= 0:
+            return []
+        if self._warmup_records is None:
+            if self.warmup_path.exists():
+                examples = pd.read_csv(self.warmup_path, dtype={"zipcode": str})
+                self._warmup_records = examples.to_dict(orient="records")
+            else:
+                logger.warning(
+                    f"Warm-up examples not found at {self.warmup_path}; "
+                    "using a synthetic request"
+                )
+                self._warmup_records = []
+
+        records = self._warmup_records[: self.warmup_samples]
+        if not records:
+            fields = set(bundle.features) | set(MINIMAL_FEATURES)
+            request_data = {field: 1.0 for field in fields}
+            request_data["zipcode"] = self._sample_zipcode(bundle)
+            records = [request_data]
+        return records
+
+    @staticmethod
+    def _sample_zipcode(bundle: ModelBundle) -> str:
+        """A ZIP code with demographics, if there are any"""
+        if bundle.demographics is not None and len(bundle.demographics):
+            return bundle.demographics.zipcode(0)
+        return "00000"
+
+    # Ready once a warmed-up model is serving
+    def is_ready(self) -> bool:
+        """True when a validated, warmed-up bundle has been published"""
+        return self.ready.is_set() and self.bundle is not None
+
+    # Extract a NumPy-only predictor from the loaded pipeline
+    def _compile_model(self, model, features) -> Optional[CompiledKNNPredictor]:
+        """Compile the pipeline when enabled, falling back to it if unsupported"""
+        if not self.compiled_inference:
+            return None
+        try:
+            predictor = CompiledKNNPredictor.from_pipeline(model, features)
+            logger.info("Compiled inference path enabled")
+            return predictor
+        except ValueError as e:
+            logger.warning(f"Compiled inference unavailable, using pipeline: {e}")
+            return None
+
+    # Run the model on a feature matrix, via the compiled path when available
+    def _model_predict(
+        self, bundle: ModelBundle, features_df: pd.DataFrame
+    ) -> np.ndarray:
+        """Predict every row with the compiled predictor or the sklearn Pipeline"""
+        if list(features_df.columns) != bundle.features:
+            # Prepared against another bundle; re-align to this model's columns
+            features_df = self._align_features(bundle, features_df.copy())
+        if bundle.compiled_predictor is not None:
+            return bundle.compiled_predictor.predict(
+                features_df.to_numpy(dtype=np.float64)
+            )
+        return bundle.model.predict(features_df)
+
+    # Reload the model if the files' content has changed
+    def reload_model(self, force: bool = False):
+        if force:
+            logger.info("Reloading model on request...")
             self.load_model()
+            return
+        if not self.model_changed():
+            if not self.delta_changed():
+                logger.info("Model content unchanged. No reload needed.")
+                return
+            if self.delta_path.exists():
+                logger.info("Applying model delta without reloading the base model...")
+                self.apply_model_delta()
+                return
+
+        logger.info("Reloading model due to content change...")
+        self.load_model()
 
     # Load demographics data
     def load_demographics(self):
         """Load demographics data for ZIP code enrichment"""
         try:
-            demographics_path = Path("data/zipcode_demographics.csv")
+            demographics_path = self.demographics_path
             if not demographics_path.exists():
                 logger.error("Demographics data not found")
                 raise FileNotFoundError("Demographics data not found")
 
-            self.demographics_data = pd.read_csv(
-                demographics_path, dtype={"zipcode": str}
+            # Read from the data cache when create_model.py has built it, then
+            # packed into typed arrays; serving never writes the cache, so the
+            # data directory may be mounted read-only
+            self.demographics_store = DemographicsStore.from_frame(
+                load_demographics(demographics_path, write_cache=False),
+                dtype=DEMOGRAPHICS_DTYPES[self.demographics_dtype],
             )
+            # Re-publish the current model with the new demographics index
+            if self.bundle is not None:
+                with self.lock:
+                    self.publish_bundle(
+                        self._with_demographics(self.bundle), model_swap=False
+                    )
+            store = self.demographics_store
             logger.info(
-                f"Demographics data loaded successfully. Shape: {self.demographics_data.shape}"
+                f"Demographics data loaded successfully: {len(store)} ZIP codes, "
+                f"{len(store.columns)} {self.demographics_dtype} columns "
+                f"({store.nbytes / 1024:.1f} KiB)"
             )
 
         except Exception as e:
             logger.error(f"Error loading demographics data: {e}")
             raise
 
+    # Order the demographics columns for the bundle's features
+    def _with_demographics(self, bundle: ModelBundle) -> ModelBundle:
+        """Copy of the bundle with demographics stored in its feature order"""
+        if self.demographics_store is None:
+            return bundle
+        columns = list(self.demographics_store.columns)
+        feature_order = {feature: i for i, feature in enumerate(bundle.features)}
+        # Model features first (in model order), then any remaining columns
+        columns.sort(key=lambda c: feature_order.get(c, len(feature_order)))
+        positions = [feature_order[c] for c in columns if c in feature_order]
+
+        return dataclasses.replace(
+            bundle,
+            demographics_columns=tuple(columns),
+            demographics=self.demographics_store.select(columns),
+            demographics_positions=np.array(positions, dtype=np.intp),
+            default_features=self._default_features(bundle.features),
+            relevant_fields=self._relevant_fields_for(bundle.features, columns),
+        )
+
+    # Feature row used for ZIP codes without demographics
+    @staticmethod
+    def _default_features(features: List[str]) -> np.ndarray:
+        """DEFAULT_DEMOGRAPHICS at their feature positions, zero elsewhere"""
+        return np.array(
+            [DEFAULT_DEMOGRAPHICS.get(feature, 0.0) for feature in features],
+            dtype=np.float64,
+        )
+
+    # Work out which request fields actually reach the model
+    @staticmethod
+    def _relevant_fields_for(features: List[str], demographics_columns) -> Dict:
+        """Derive the prediction-relevant request fields from the feature list"""
+        demographic = set(demographics_columns)
+        uses_demographics = any(f in demographic for f in features)
+        relevant = {}
+        for minimal, candidates in ((False, features), (True, MINIMAL_FEATURES)):
+            fields = [f for f in candidates if f in features and f not in demographic]
+            # The ZIP code only matters through the demographics it selects
+            if uses_demographics:
+                fields.append("zipcode")
+            relevant[minimal] = tuple(fields)
+        return relevant
+
+    # Request fields that influence the prediction under the loaded model
+    def relevant_fields(self, minimal: bool = False) -> List[str]:
+        """Request fields that can change the prediction"""
+        return list(self.bundle.relevant_fields[minimal])
+
+    # Request fields that are accepted but dropped before prediction
+    def ignored_fields(
+        self,
+        request_data: Dict,
+        minimal: bool = False,
+        bundle: Optional[ModelBundle] = None,
+    ) -> List[str]:
+        """Fields of the request that have no effect on the prediction"""
+        relevant = (bundle or self.bundle).relevant_fields[minimal]
+        return [field for field in request_data if field not in relevant]
+
+    # Check whether a ZIP code has real (non-default) demographics
+    def has_demographics(
+        self, zipcode: str, bundle: Optional[ModelBundle] = None
+    ) -> bool:
+        """True when the ZIP code is present in the demographics data"""
+        bundle = bundle or self.bundle
+        demographics = bundle.demographics if bundle is not None else None
+        return demographics is not None and str(zipcode) in demographics
+
     # Enrich input data with demographics based on ZIP code
-    def enrich_with_demographics(self, zipcode: str) -> Dict:
+    def enrich_with_demographics(
+        self, zipcode: str, bundle: Optional[ModelBundle] = None
+    ) -> Dict:
         """Enrich data with demographic information for a given ZIP code"""
+        bundle = bundle or self.bundle
         try:
-            zipcode_str = str(zipcode)
-            demographics = self.demographics_data[
-                self.demographics_data["zipcode"] == zipcode_str
-            ]
+            row = None
+            if bundle.demographics is not None:
+                row = bundle.demographics.row(str(zipcode))
 
-            if demographics.empty:
+            if row is None:
                 logger.warning(f"No demographics data found for ZIP code: {zipcode}")
                 # Return default values if no demographics found
-                return {
-                    "medn_hshld_incm_amt": 50000.0,
-                    "hous_val_amt": 250000.0,
-                    "per_urbn": 80.0,
-                    "per_sbrbn": 20.0,
-                }
+                return dict(DEFAULT_DEMOGRAPHICS)
 
-            # Return the first (and should be only) row
-            return demographics.iloc[0].to_dict()
+            return dict(zip(bundle.demographics_columns, row.tolist()))
 
         except Exception as e:
             logger.error(f"Error enriching demographics for ZIP {zipcode}: {e}")
             return {}
 
+    # Build the raw feature mapping for a single request
+    def _build_feature_dict(
+        self,
+        bundle: ModelBundle,
+        request_data: Dict,
+        minimal: bool = False,
+        demographics: Optional[Dict] = None,
+    ) -> Dict:
+        """Collect request fields and demographics for a single house"""
+        if minimal:
+            # For minimal features, we need to add missing columns with default values
+            # and then enrich with demographics
+            features_dict = {
+                feature: request_data[feature] for feature in MINIMAL_FEATURES
+            }
+        else:
+            # Use all features expected by the model
+            features_dict = {
+                feature: request_data.get(feature, 0.0) for feature in bundle.features
+            }
+
+        # Add demographics, reusing a lookup the caller already made
+        if demographics is None:
+            demographics = self.enrich_with_demographics(
+                request_data["zipcode"], bundle
+            )
+        features_dict.update(demographics)
+        return features_dict
+
+    # Ensure the model's columns are present and in training order
+    def _align_features(
+        self, bundle: ModelBundle, features_df: pd.DataFrame
+    ) -> pd.DataFrame:
+        """Add missing features with default values and order columns"""
+        missing_features = set(bundle.features) - set(features_df.columns)
+        if missing_features:
+            logger.warning(
+                f"Missing features: {missing_features}. Adding with default values."
+            )
+            for feature in missing_features:
+                features_df[feature] = 0.0
+
+        # Select only the features the model expects, in the correct order
+        return features_df[bundle.features]
+
+    # Assemble a feature matrix for the given bundle
+    def _prepare_with(
+        self,
+        bundle: ModelBundle,
+        records: List[Dict],
+        minimal: bool,
+        demographics: Optional[List[Dict]] = None,
+    ) -> pd.DataFrame:
+        """Feature matrix for the records, aligned to the bundle's features"""
+        if demographics is None:
+            demographics = [None] * len(records)
+        rows = [
+            self._build_feature_dict(bundle, record, minimal, record_demographics)
+            for record, record_demographics in zip(records, demographics)
+        ]
+        return self._align_features(bundle, pd.DataFrame(rows))
+
     # Prepare features for model prediction
     def prepare_features(
-        self, request_data: Dict, minimal: bool = False
+        self,
+        request_data: Dict,
+        minimal: bool = False,
+        demographics: Optional[Dict] = None,
+        bundle: Optional[ModelBundle] = None,
     ) -> pd.DataFrame:
         """Prepare features for model prediction"""
         try:
-            if minimal:
-                # For minimal features, we need to add missing columns with default values
-                # and then enrich with demographics
-                features_dict = {
-                    "bedrooms": request_data["bedrooms"],
-                    "bathrooms": request_data["bathrooms"],
-                    "sqft_living": request_data["sqft_living"],
-                    "sqft_lot": request_data["sqft_lot"],
-                    "floors": request_data["floors"],
-                    "sqft_above": request_data["sqft_above"],
-                    "sqft_basement": request_data["sqft_basement"],
-                }
-
-                # Add demographics
-                demographics = self.enrich_with_demographics(request_data["zipcode"])
-                features_dict.update(demographics)
+            return self._prepare_with(
+                bundle or self.bundle,
+                [request_data],
+                minimal,
+                None if demographics is None else [demographics],
+            )
+
+        except Exception as e:
+            logger.error(f"Error preparing features: {e}")
+            raise
 
+    # Prepare one feature matrix for many requests
+    def prepare_features_batch(
+        self,
+        records: List[Dict],
+        minimal: bool = False,
+        bundle: Optional[ModelBundle] = None,
+    ) -> pd.DataFrame:
+        """Prepare a single feature matrix for a batch of requests, in input order"""
+        bundle = bundle or self.bundle
+        try:
+            matrix = self.feature_matrix(records, minimal, bundle)
+            return pd.DataFrame(matrix, columns=bundle.features, copy=False)
+
+        except Exception as e:
+            logger.error(f"Error preparing batch features: {e}")
+            raise
+
+    # Vectorized enrichment: gather demographics rows by ZIP code row id
+    def feature_matrix(
+        self,
+        data: Union[List[Dict], pd.DataFrame],
+        minimal: bool = False,
+        bundle: Optional[ModelBundle] = None,
+    ) -> np.ndarray:
+        """C-contiguous float64 features for records or a DataFrame, in model order"""
+        bundle = bundle or self.bundle
+        if isinstance(data, pd.DataFrame):
+            zipcodes = data["zipcode"].astype(str).to_numpy()
+            request_column = self._frame_column(data, minimal)
+        else:
+            zipcodes = [str(record["zipcode"]) for record in data]
+            request_column = self._records_column(data, minimal)
+        matrix, unknown = self._gather_demographics(bundle, zipcodes)
+        return self._fill_request_fields(
+            bundle, matrix, unknown, request_column, minimal
+        )
+
+    # One binary search and fancy-indexing gather instead of a lookup per row
+    def _gather_demographics(
+        self, bundle: ModelBundle, zipcodes
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """Feature rows holding the ZIP codes' demographics, and the unknown mask"""
+        matrix = np.zeros((len(zipcodes), len(bundle.features)), dtype=np.float64)
+        store = bundle.demographics
+        if store is None:
+            unknown = np.ones(len(zipcodes), dtype=bool)
+        else:
+            row_ids, known = store.lookup(zipcodes)
+            unknown = ~known
+            positions = bundle.demographics_positions
+            matrix[:, positions] = store.values[row_ids, : len(positions)]
+        if unknown.any():
+            logger.warning(
+                f"No demographics data found for {int(unknown.sum())} rows; "
+                "using default values"
+            )
+            default = bundle.default_features
+            if default is None:
+                default = self._default_features(bundle.features)
+            matrix[unknown] = default
+        return matrix, unknown
+
+    # Copy the request's own fields into gathered demographics rows
+    @staticmethod
+    def _fill_request_fields(
+        bundle: ModelBundle,
+        matrix: np.ndarray,
+        unknown: np.ndarray,
+        request_column: Callable[[str], np.ndarray],
+        minimal: bool,
+    ) -> np.ndarray:
+        """Same precedence as the per-record path, column by column"""
+        fields = set(MINIMAL_FEATURES if minimal else bundle.features)
+        demographic = set(bundle.demographics_columns)
+        for position, feature in enumerate(bundle.features):
+            if feature not in fields:
+                continue
+            # Known ZIP codes override demographic columns, unknown ones the defaults
+            known_overrides = feature in demographic
+            unknown_overrides = feature in DEFAULT_DEMOGRAPHICS
+            if known_overrides and unknown_overrides:
+                continue
+            values = request_column(feature)
+            if known_overrides:
+                matrix[unknown, position] = values[unknown]
+            elif unknown_overrides:
+                matrix[~unknown, position] = values[~unknown]
             else:
-                # Use all features expected by the model
-                features_dict = {
-                    feature: request_data.get(feature, 0.0) for feature in self.features
-                }
+                matrix[:, position] = values
+        return matrix
 
-                # Add demographics
-                demographics = self.enrich_with_demographics(request_data["zipcode"])
-                features_dict.update(demographics)
+    @staticmethod
+    def _records_column(records: List[Dict], minimal: bool):
+        """Column getter over request dicts; absent full-mode fields are 0.0"""
+        if minimal:
+            return lambda field: np.array([r[field] for r in records], dtype=np.float64)
+        return lambda field: np.array(
+            [r.get(field, 0.0) for r in records], dtype=np.float64
+        )
 
-            # Create DataFrame and ensure correct column order
-            features_df = pd.DataFrame([features_dict])
+    @staticmethod
+    def _frame_column(frame: pd.DataFrame, minimal: bool):
+        """Column getter over a DataFrame; absent full-mode columns are 0.0"""
 
-            # Ensure all required features are present
-            missing_features = set(self.features) - set(features_df.columns)
-            if missing_features:
-                logger.warning(
-                    f"Missing features: {missing_features}. Adding with default values."
-                )
-                for feature in missing_features:
-                    features_df[feature] = 0.0
+        def column(field: str) -> np.ndarray:
+            if minimal or field in frame:
+                return frame[field].to_numpy(dtype=np.float64)
+            return np.zeros(len(frame), dtype=np.float64)
 
-            # Select only the features the model expects, in the correct order
-            features_df = features_df[self.features]
+        return column
 
-            return features_df
+    # Prepare features for a DataFrame of houses with one gather on zipcode
+    def prepare_features_frame(
+        self,
+        frame: pd.DataFrame,
+        minimal: bool = False,
+        bundle: Optional[ModelBundle] = None,
+    ) -> pd.DataFrame:
+        """Vectorized prepare_features_batch for records held in a DataFrame"""
+        bundle = bundle or self.bundle
+        try:
+            matrix = self.feature_matrix(frame, minimal, bundle)
+            return pd.DataFrame(
+                matrix, columns=bundle.features, index=frame.index, copy=False
+            )
 
         except Exception as e:
-            logger.error(f"Error preparing features: {e}")
+            logger.error(f"Error preparing features for a frame: {e}")
             raise
 
+    # Cache key for one feature row under a model version
+    @staticmethod
+    def _cache_key(bundle: ModelBundle, row: np.ndarray) -> tuple:
+        """Canonical (model version, feature vector) key for the prediction cache"""
+        # Adding 0.0 folds -0.0 into 0.0 so equal vectors have equal bytes
+        return bundle.version, (row + 0.0).tobytes()
+
+    # Cache key for a request, built only from fields that reach the model
+    def request_cache_key(
+        self,
+        request_data: Dict,
+        minimal: bool = False,
+        bundle: Optional[ModelBundle] = None,
+    ) -> tuple:
+        """Key shared by requests that differ only in ignored fields"""
+        bundle = bundle or self.bundle
+        fields = bundle.relevant_fields[minimal]
+        values = tuple(
+            str(request_data[field])
+            if field == "zipcode"
+            else float(request_data.get(field, 0.0))
+            for field in fields
+        )
+        return bundle.version, fields, values
+
+    # Cache lookup and feature preparation for a single request
+    def _prepare_record(
+        self,
+        request_data: Dict,
+        minimal: bool,
+        use_cache: bool,
+        bundle: Optional[ModelBundle] = None,
+    ) -> tuple:
+        """The bundle, cache key, cached prediction or else the feature frame"""
+        # One bundle for the whole request, even if a reload publishes another
+        bundle = bundle or self.bundle
+        key = None
+        if use_cache and self.prediction_cache is not None:
+            key = self.request_cache_key(request_data, minimal, bundle)
+            cached = self.prediction_cache.get(key)
+            if cached is not None:
+                return bundle, key, cached, None
+
+        demographics_start = time.perf_counter()
+        demographics = self.enrich_with_demographics(request_data["zipcode"], bundle)
+        features_start = time.perf_counter()
+        features_df = self.prepare_features(
+            request_data, minimal, demographics, bundle=bundle
+        )
+        STAGE_SECONDS.observe(
+            features_start - demographics_start, stage="demographics", mode="single"
+        )
+        STAGE_SECONDS.observe(
+            time.perf_counter() - features_start, stage="features", mode="single"
+        )
+        return bundle, key, None, features_df
+
+    # Predict a single request, consulting the cache before preparing features
+    def predict_record(
+        self,
+        request_data: Dict,
+        minimal: bool = False,
+        use_cache: bool = True,
+        bundle: Optional[ModelBundle] = None,
+    ) -> float:
+        """Predict one request; cache hits skip enrichment and feature preparation"""
+        bundle, key, cached, features_df = self._prepare_record(
+            request_data, minimal, use_cache, bundle
+        )
+        if cached is not None:
+            return cached
+
+        predict_start = time.perf_counter()
+        prediction = self.predict(features_df, use_cache=False, bundle=bundle)
+        STAGE_SECONDS.observe(
+            time.perf_counter() - predict_start, stage="predict", mode="single"
+        )
+        if key is not None:
+            self.prediction_cache.put(key, prediction)
+        return prediction
+
+    # Predict a single request from the event loop
+    async def predict_record_async(
+        self,
+        inference_pool,
+        request_data: Dict,
+        minimal: bool = False,
+        use_cache: bool = True,
+    ) -> Tuple[float, ModelBundle]:
+        """
+        predict_record for async handlers, with CPU work on the inference pool.
+
+        Returns the prediction and the bundle that made it, so a response can
+        describe that model even if a reload publishes another meanwhile.
+        With batching enabled, only feature preparation holds a pool worker;
+        the model call is awaited on the event loop, so concurrent requests
+        can fill a batch however small the pool is.
+        """
+        bundle = self.bundle
+        if self.batcher is None:
+            prediction = await inference_pool.run(
+                self.predict_record,
+                request_data,
+                minimal=minimal,
+                use_cache=use_cache,
+                bundle=bundle,
+            )
+            return prediction, bundle
+
+        _, key, cached, features_df = await inference_pool.run(
+            self._prepare_record, request_data, minimal, use_cache, bundle
+        )
+        if cached is not None:
+            return cached, bundle
+
+        predict_start = time.perf_counter()
+        predictions = await asyncio.wrap_future(
+            self.batcher.submit(features_df, bundle)
+        )
+        STAGE_SECONDS.observe(
+            time.perf_counter() - predict_start, stage="predict", mode="single"
+        )
+        prediction = float(predictions[0])
+        if key is not None:
+            self.prediction_cache.put(key, prediction)
+        return prediction, bundle
+
+    # Stop background work owned by the service
+    def close(self):
+        """Stop the prediction batcher's thread once queued requests are served"""
+        if self.batcher is not None:
+            self.batcher.close()
+
+    # Predict many requests, de-duplicating and consulting the cache
+    def predict_records(
+        self,
+        records: List[Dict],
+        minimal: bool = False,
+        use_cache: bool = True,
+        bundle: Optional[ModelBundle] = None,
+    ) -> np.ndarray:
+        """Predict every request, in order, computing each distinct input once"""
+        bundle = bundle or self.bundle
+        cache = self.prediction_cache if use_cache else None
+
+        # Requests that differ only in ignored fields share one computation
+        unique_positions = {}
+        unique_records = []
+        positions = []
+        for record in records:
+            key = self.request_cache_key(record, minimal, bundle)
+            position = unique_positions.get(key)
+            if position is None:
+                position = unique_positions[key] = len(unique_records)
+                unique_records.append((key, record))
+            positions.append(position)
+
+        unique_predictions = np.empty(len(unique_records), dtype=float)
+        misses = []
+        for i, (key, _) in enumerate(unique_records):
+            cached = cache.get(key) if cache is not None else None
+            if cached is None:
+                misses.append(i)
+            else:
+                unique_predictions[i] = cached
+
+        if misses:
+            miss_records = [unique_records[i][1] for i in misses]
+            demographics_start = time.perf_counter()
+            matrix, unknown = self._gather_demographics(
+                bundle, [str(record["zipcode"]) for record in miss_records]
+            )
+            features_start = time.perf_counter()
+            matrix = self._fill_request_fields(
+                bundle,
+                matrix,
+                unknown,
+                self._records_column(miss_records, minimal),
+                minimal,
+            )
+            features_df = pd.DataFrame(matrix, columns=bundle.features, copy=False)
+            predict_start = time.perf_counter()
+            computed = self._predict_chunked(features_df, bundle)
+            predict_end = time.perf_counter()
+
+            STAGE_SECONDS.observe(
+                features_start - demographics_start, stage="demographics", mode="batch"
+            )
+            STAGE_SECONDS.observe(
+                predict_start - features_start, stage="features", mode="batch"
+            )
+            STAGE_SECONDS.observe(
+                predict_end - predict_start, stage="predict", mode="batch"
+            )
+            unique_predictions[misses] = computed
+            if cache is not None:
+                for i, prediction in zip(misses, computed):
+                    cache.put(unique_records[i][0], float(prediction))
+
+        return unique_predictions[positions]
+
     # Make prediction using the model
-    def predict(self, features_df: pd.DataFrame) -> float:
+    def predict(
+        self,
+        features_df: pd.DataFrame,
+        use_cache: bool = True,
+        bundle: Optional[ModelBundle] = None,
+    ) -> float:
         """Make prediction using the loaded model"""
+        bundle = bundle or self.bundle
         try:
-            prediction = self.model.predict(features_df)[0]
-            return float(prediction)
+            key = None
+            if use_cache and self.prediction_cache is not None:
+                key = self._cache_key(
+                    bundle, features_df.to_numpy(dtype=np.float64)[0]
+                )
+                cached = self.prediction_cache.get(key)
+                if cached is not None:
+                    return cached
+
+            if self.batcher is not None:
+                # Coalesce with concurrent callers into a single model call
+                prediction = self.batcher.submit(features_df, bundle).result()[0]
+            else:
+                prediction = self._model_predict(bundle, features_df)[0]
+
+            prediction = float(prediction)
+            if key is not None:
+                self.prediction_cache.put(key, prediction)
+            return prediction
         except Exception as e:
             logger.error(f"Error making prediction: {e}")
             raise
+
+    # Make predictions for a feature matrix, chunk by chunk
+    def _predict_chunked(
+        self, features_df: pd.DataFrame, bundle: Optional[ModelBundle] = None
+    ) -> np.ndarray:
+        """Run the model over the feature matrix in batch_chunk_size pieces"""
+        bundle = bundle or self.bundle
+        chunk_size = max(1, self.batch_chunk_size)
+        predictions = [
+            self._model_predict(bundle, features_df.iloc[start : start + chunk_size])
+            for start in range(0, len(features_df), chunk_size)
+        ]
+        if not predictions:
+            return np.empty(0, dtype=float)
+        return np.concatenate(predictions).astype(float)
+
+    # Make predictions for a feature matrix, reusing cached rows
+    def predict_batch(
+        self,
+        features_df: pd.DataFrame,
+        use_cache: bool = True,
+        bundle: Optional[ModelBundle] = None,
+    ) -> np.ndarray:
+        """Make predictions for every row of the feature matrix"""
+        bundle = bundle or self.bundle
+        try:
+            if not use_cache or self.prediction_cache is None:
+                return self._predict_chunked(features_df, bundle)
+
+            keys = [
+                self._cache_key(bundle, row)
+                for row in features_df.to_numpy(dtype=np.float64)
+            ]
+            predictions = np.empty(len(keys), dtype=float)
+            misses = []
+            for i, key in enumerate(keys):
+                cached = self.prediction_cache.get(key)
+                if cached is None:
+                    misses.append(i)
+                else:
+                    predictions[i] = cached
+
+            # Only the rows missing from the cache reach the model
+            if misses:
+                computed = self._predict_chunked(features_df.iloc[misses], bundle)
+                predictions[misses] = computed
+                for i, prediction in zip(misses, computed):
+                    self.prediction_cache.put(keys[i], float(prediction))
+            return predictions
+        except Exception as e:
+            logger.error(f"Error making batch prediction: {e}")
+            raise
@@ -0,0 +1,176 @@
+import logging
+from typing import Dict
+
+import numpy as np
+from sklearn.base import BaseEstimator, RegressorMixin
+from sklearn.neighbors import KNeighborsRegressor
+
+logger = logging.getLogger(__name__)
+
+# Neighbor index choices understood by build_neighbors_regressor
+NEIGHBOR_INDEXES = ("brute", "kd_tree", "ball_tree", "ivf")
+
+
+class IVFNeighborsRegressor(BaseEstimator, RegressorMixin):
+    """
+    Approximate KNN regressor backed by an inverted-file (IVF) index.
+
+    Training rows are clustered into ``n_lists`` cells with a few rounds of
+    k-means. A query only computes exact distances to the rows of its
+    ``n_probe`` closest cells, so the cost grows with the probed cells
+    rather than the whole training set. When those cells hold fewer than k
+    rows, the probe widens to the next closest cells, so every query gets k
+    real neighbors. Predictions are the uniform mean of the k nearest
+    targets found, like ``KNeighborsRegressor``. Pure NumPy, so it pickles
+    and loads anywhere the rest of the pipeline does.
+    """
+
+    def __init__(
+        self,
+        n_neighbors: int = 5,
+        n_lists: int = None,
+        n_probe: int = 8,
+        n_iter: int = 10,
+        random_state: int = 42,
+    ):
+        self.n_neighbors = n_neighbors
+        self.n_lists = n_lists
+        self.n_probe = n_probe
+        self.n_iter = n_iter
+        self.random_state = random_state
+
+    def fit(self, X, y):
+        X = np.ascontiguousarray(X, dtype=np.float64)
+        y = np.asarray(y, dtype=np.float64)
+        rng = np.random.default_rng(self.random_state)
+        n_lists = self.n_lists or max(1, int(np.sqrt(len(X))))
+        n_lists = min(n_lists, len(X))
+
+        # Lloyd's k-means, seeded from random training rows
+        centroids = X[rng.choice(len(X), size=n_lists, replace=False)].copy()
+        for _ in range(self.n_iter):
+            assignments = self._nearest_centroids(X, centroids, 1)[:, 0]
+            counts = np.bincount(assignments, minlength=n_lists)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, assignments, X)
+            occupied = counts > 0
+            centroids[occupied] = sums[occupied] / counts[occupied, None]
+        assignments = self._nearest_centroids(X, centroids, 1)[:, 0]
+
+        # Store rows grouped by cell so each list is a contiguous slice,
+        # remembering each row's position in the training data
+        order = np.argsort(assignments, kind="stable")
+        self.centroids_ = centroids
+        self.list_offsets_ = np.concatenate(
+            [[0], np.cumsum(np.bincount(assignments, minlength=n_lists))]
+        )
+        self.fit_X_ = X[order]
+        self.fit_row_ids_ = order
+        self.fit_y_ = y
+        self.n_features_in_ = X.shape[1]
+        return self
+
+    @staticmethod
+    def _nearest_centroids(X, centroids, n):
+        """Indices of the n closest centroids for every row of X"""
+        distances = (
+            np.einsum("ij,ij->i", X, X)[:, None]
+            - 2.0 * X @ centroids.T
+            + np.einsum("ij,ij->i", centroids, centroids)[None, :]
+        )
+        n = min(n, len(centroids))
+        if n == len(centroids):
+            return np.argsort(distances, axis=1)
+        nearest = np.argpartition(distances, n - 1, axis=1)[:, :n]
+        return np.take_along_axis(
+            nearest,
+            np.argsort(np.take_along_axis(distances, nearest, axis=1), axis=1),
+            axis=1,
+        )
+
+    def kneighbors(self, X, n_neighbors: int = None, return_distance: bool = True):
+        """Approximate k nearest training rows for every query row"""
+        X = np.ascontiguousarray(X, dtype=np.float64)
+        k = n_neighbors or self.n_neighbors
+        if k > len(self.fit_X_):
+            raise ValueError(f"Expected n_neighbors <= {len(self.fit_X_)}, got {k}")
+        cell_sizes = np.diff(self.list_offsets_)
+        probes = self._nearest_centroids(X, self.centroids_, self.n_probe)
+
+        distances = np.empty((len(X), k))
+        indices = np.empty((len(X), k), dtype=np.intp)
+        for i, (query, cells) in enumerate(zip(X, probes)):
+            if cell_sizes[cells].sum() < k:
+                # Too few rows in the probed cells: widen the probe through
+                # the next closest cells until k rows are candidates
+                order = self._nearest_centroids(
+                    query[None], self.centroids_, len(self.centroids_)
+                )[0]
+                needed = np.searchsorted(np.cumsum(cell_sizes[order]), k) + 1
+                cells = order[: max(needed, len(cells))]
+            candidates = np.concatenate(
+                [
+                    np.arange(self.list_offsets_[c], self.list_offsets_[c + 1])
+                    for c in cells
+                ]
+            )
+            diff = self.fit_X_[candidates] - query
+            candidate_distances = np.einsum("ij,ij->i", diff, diff)
+            nearest = np.argpartition(candidate_distances, k - 1)[:k]
+            nearest = nearest[np.argsort(candidate_distances[nearest])]
+            distances[i] = np.sqrt(candidate_distances[nearest])
+            indices[i] = self.fit_row_ids_[candidates[nearest]]
+
+        if return_distance:
+            return distances, indices
+        return indices
+
+    def predict(self, X):
+        indices = self.kneighbors(X, return_distance=False)
+        return self.fit_y_[indices].mean(axis=1)
+
+
+def build_neighbors_regressor(
+    index: str = "brute", n_neighbors: int = 5, leaf_size: int = 30, **ivf_params
+):
+    """
+    Create the neighbor regressor for the requested index.
+
+    Args:
+        index: one of NEIGHBOR_INDEXES. "brute", "kd_tree" and "ball_tree"
+            are exact scikit-learn searches; "ivf" is the approximate
+            IVFNeighborsRegressor.
+        n_neighbors: number of neighbors averaged per prediction
+        leaf_size: leaf size for the KD-/Ball-tree indexes
+        ivf_params: extra IVFNeighborsRegressor parameters (n_lists, n_probe)
+    """
+    if index not in NEIGHBOR_INDEXES:
+        raise ValueError(
+            f"Unknown neighbor index '{index}', expected one of {NEIGHBOR_INDEXES}"
+        )
+    if index == "ivf":
+        return IVFNeighborsRegressor(n_neighbors=n_neighbors, **ivf_params)
+    return KNeighborsRegressor(
+        n_neighbors=n_neighbors, algorithm=index, leaf_size=leaf_size
+    )
+
+
+def describe_neighbor_index(model) -> Dict:
+    """Summarize the neighbor index used by a fitted model or pipeline"""
+    estimator = model.steps[-1][1] if hasattr(model, "steps") else model
+    if isinstance(estimator, IVFNeighborsRegressor):
+        return {
+            "index": "ivf",
+            "exact": False,
+            "n_neighbors": estimator.n_neighbors,
+            "n_lists": len(estimator.centroids_),
+            "n_probe": estimator.n_probe,
+        }
+    if isinstance(estimator, KNeighborsRegressor):
+        return {
+            "index": getattr(estimator, "_fit_method", estimator.algorithm),
+            "exact": True,
+            "n_neighbors": estimator.n_neighbors,
+            "leaf_size": estimator.leaf_size,
+        }
+    return {"index": type(estimator).__name__, "exact": None}
@@ -0,0 +1,177 @@
+import logging
+import os
+import queue
+import threading
+import time
+import weakref
+from concurrent.futures import Future
+from typing import Any, Callable
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+# Queued after the last submission to stop a batcher's collecting thread
+_STOP = object()
+# Open batchers, so a forked child can restart their threads
+_batchers = weakref.WeakSet()
+
+
+def _restart_after_fork():
+    """Threads don't survive fork(); pre-forked workers need their own"""
+    for batcher in list(_batchers):
+        batcher._start()
+
+
+os.register_at_fork(after_in_child=_restart_after_fork)
+
+
+class PredictionBatcher:
+    """
+    Dynamic micro-batcher that coalesces concurrent predictions.
+
+    Callers submit small feature frames (usually one row) and get a Future
+    back. A background thread collects submissions until either
+    ``max_batch_size`` rows are waiting or ``max_wait_ms`` has passed since
+    the first one arrived, stacks them into one matrix, makes a single model
+    call and resolves each caller's Future with its own rows.
+
+    An optional ``context`` travels with each submission and is passed back
+    to ``predict_fn``; submissions with different contexts (e.g. requests
+    pinned to different model bundles during a reload) are never stacked
+    together.
+
+    Callers on an event loop should await the Future with
+    ``asyncio.wrap_future`` rather than block a worker thread on it, or
+    batches can never grow past the number of blocked threads.
+    """
+
+    def __init__(
+        self,
+        predict_fn: Callable[[pd.DataFrame, Any], np.ndarray],
+        max_batch_size: int = 32,
+        max_wait_ms: float = 5.0,
+    ):
+        self.predict_fn = predict_fn
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max(0.0, max_wait_ms) / 1000.0
+        self._lock = threading.Lock()
+        self._batches = 0
+        self._rows = 0
+        self._largest_batch = 0
+        self._closed = False
+        self._start()
+        _batchers.add(self)
+        logger.info(
+            f"Prediction batcher started: up to {self.max_batch_size} rows "
+            f"or {max_wait_ms}ms per batch"
+        )
+
+    def _start(self):
+        """Start the collecting thread with an empty queue"""
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(
+            target=self._run, daemon=True, name="PredictionBatcher"
+        )
+        self._thread.start()
+
+    def submit(self, features_df: pd.DataFrame, context: Any = None) -> Future:
+        """Queue a feature frame; the Future resolves to its predictions"""
+        future = Future()
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("Prediction batcher is closed")
+            self._queue.put((features_df, future, context))
+        return future
+
+    def close(self, timeout: float = 5.0):
+        """Predict what is already queued, then stop the collecting thread"""
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            self._queue.put(_STOP)
+        _batchers.discard(self)
+        self._thread.join(timeout)
+
+    def _collect(self):
+        """
+        Block for the first request, then gather more until full or timed out.
+
+        Returns the batch, its row count and whether the batcher was closed.
+        """
+        item = self._queue.get()
+        if item is _STOP:
+            return [], 0, True
+        batch = [item]
+        rows = len(item[0])
+        deadline = time.monotonic() + self.max_wait
+
+        while rows < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                item = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if item is _STOP:
+                return batch, rows, True
+            batch.append(item)
+            rows += len(item[0])
+
+        return batch, rows, False
+
+    def _run(self):
+        while True:
+            batch, rows, closed = self._collect()
+            if closed and not batch:
+                return
+            # One model call per context, in order of first appearance
+            groups = {}
+            for item in batch:
+                groups.setdefault(id(item[2]), []).append(item)
+            for group in groups.values():
+                self._predict_group(group)
+
+            with self._lock:
+                self._batches += 1
+                self._rows += rows
+                self._largest_batch = max(self._largest_batch, rows)
+            if closed:
+                return
+
+    def _predict_group(self, group):
+        """Stack the frames sharing a context, predict once and fan results out"""
+        frames = [features_df for features_df, _, _ in group]
+        try:
+            # Stack the raw values instead of concatenating DataFrames
+            stacked = pd.DataFrame(
+                np.vstack([f.to_numpy(dtype=np.float64) for f in frames]),
+                columns=frames[0].columns,
+            )
+            predictions = self.predict_fn(stacked, group[0][2])
+        except Exception as e:
+            logger.error(f"Error predicting batch of {len(frames)} frames: {e}")
+            for _, future, _ in group:
+                future.set_exception(e)
+            return
+
+        offset = 0
+        for features_df, future, _ in group:
+            future.set_result(predictions[offset : offset + len(features_df)])
+            offset += len(features_df)
+
+    def status(self) -> dict:
+        """Batch sizing configuration and counters"""
+        with self._lock:
+            return {
+                "max_batch_size": self.max_batch_size,
+                "max_wait_ms": self.max_wait * 1000.0,
+                "batches": self._batches,
+                "rows": self._rows,
+                "largest_batch": self._largest_batch,
+                "mean_batch_size": self._rows / self._batches if self._batches else 0.0,
+                "queued": self._queue.qsize(),
+            }
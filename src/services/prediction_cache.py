@@ -0,0 +1,78 @@
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Hashable, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class PredictionCache:
+    """
+    Thread-safe LRU cache with a time-to-live for model predictions.
+
+    For a fixed model version KNN predictions are deterministic, so repeated
+    queries for the same house can skip the neighbor search entirely. Entries
+    are evicted least-recently-used once ``max_size`` is reached and are
+    treated as missing once they are older than ``ttl_seconds``.
+    """
+
+    def __init__(self, max_size: int = 10000, ttl_seconds: float = 3600.0):
+        self.max_size = max(1, max_size)
+        self.ttl_seconds = ttl_seconds
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self._expirations = 0
+        self._clears = 0
+
+    def get(self, key: Hashable) -> Optional[float]:
+        """Return the cached prediction for ``key``, or None on a miss"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self._misses += 1
+                return None
+            value, expires_at = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                self._expirations += 1
+                self._misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self._hits += 1
+            return value
+
+    def put(self, key: Hashable, value: float):
+        """Store a prediction, evicting the least recently used entry if full"""
+        with self._lock:
+            self._entries[key] = (value, time.monotonic() + self.ttl_seconds)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self._evictions += 1
+
+    def clear(self):
+        """Drop every entry, e.g. when a new model is loaded"""
+        with self._lock:
+            self._entries.clear()
+            self._clears += 1
+
+    def status(self) -> dict:
+        """Cache configuration and hit/miss/eviction counters"""
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                "enabled": True,
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "ttl_seconds": self.ttl_seconds,
+                "hits": self._hits,
+                "misses": self._misses,
+                "hit_rate": self._hits / lookups if lookups else 0.0,
+                "evictions": self._evictions,
+                "expirations": self._expirations,
+                "clears": self._clears,
+            }
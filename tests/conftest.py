@@ -0,0 +1,40 @@
+import os
+from pathlib import Path
+
+import pytest
+
+import create_model
+from services.model_service import ModelService
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+
+
+@pytest.fixture(scope="session")
+def model_dir(tmp_path_factory):
+    """Train the model once per session into a temporary directory"""
+    output_dir = tmp_path_factory.mktemp("model")
+    cwd = os.getcwd()
+    # create_model reads its CSVs relative to the repository root
+    os.chdir(REPO_ROOT)
+    try:
+        create_model.main(output_dir=str(output_dir))
+    finally:
+        os.chdir(cwd)
+    return output_dir
+
+
+@pytest.fixture
+def model_service(model_dir):
+    """A ModelService backed by the session's freshly trained model"""
+    return ModelService(model_dir=str(model_dir), data_dir=str(REPO_ROOT / "data"))
+
+
+@pytest.fixture(scope="session")
+def unseen_examples():
+    """House records from future_unseen_examples.csv as request dicts"""
+    import pandas as pd
+
+    examples = pd.read_csv(
+        REPO_ROOT / "data" / "future_unseen_examples.csv", dtype={"zipcode": str}
+    )
+    return examples.to_dict(orient="records")
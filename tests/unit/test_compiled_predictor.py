@@ -0,0 +1,59 @@
+import numpy as np
+import pytest
+from sklearn import pipeline, preprocessing
+
+from services.compiled_predictor import CompiledKNNPredictor
+from services.model_service import ModelService
+from services.neighbor_index import build_neighbors_regressor
+from tests.conftest import REPO_ROOT
+
+
+@pytest.fixture
+def unseen_features(model_service, unseen_examples):
+    """Feature matrix for every row of future_unseen_examples.csv"""
+    return model_service.prepare_features_batch(unseen_examples)
+
+
+def test_compiled_predictions_match_pickled_pipeline(model_service, unseen_features):
+    """The compiled path reproduces the pickled pipeline on the unseen examples"""
+    model = model_service.model
+    compiled = CompiledKNNPredictor.from_pipeline(model, model_service.features)
+    X = unseen_features.to_numpy(dtype=np.float64)
+
+    expected = model.predict(unseen_features)
+    np.testing.assert_array_equal(compiled.predict(X), expected)
+    single = [compiled.predict(X[i : i + 1])[0] for i in range(len(X))]
+    np.testing.assert_array_equal(single, expected)
+
+
+@pytest.mark.parametrize("index", ["kd_tree", "ball_tree", "ivf"])
+def test_compiled_predictions_match_other_indexes(unseen_features, index, monkeypatch):
+    """Tree and IVF pipelines compile to the same predictions too"""
+    import create_model
+
+    monkeypatch.chdir(REPO_ROOT)
+    x, y = create_model.load_data(
+        str(REPO_ROOT / create_model.SALES_PATH),
+        str(REPO_ROOT / create_model.DEMOGRAPHICS_PATH),
+        create_model.SALES_COLUMN_SELECTION,
+    )
+    model = pipeline.make_pipeline(
+        preprocessing.RobustScaler(), build_neighbors_regressor(index)
+    ).fit(x, y)
+    compiled = CompiledKNNPredictor.from_pipeline(model, list(x.columns))
+
+    np.testing.assert_allclose(
+        compiled.predict(unseen_features.to_numpy(dtype=np.float64)),
+        model.predict(unseen_features),
+    )
+
+
+def test_model_service_uses_compiled_path(model_dir, unseen_features, monkeypatch):
+    """MODEL_COMPILED_INFERENCE switches ModelService to the compiled predictor"""
+    monkeypatch.setenv("MODEL_COMPILED_INFERENCE", "true")
+    service = ModelService(model_dir=str(model_dir), data_dir=str(REPO_ROOT / "data"))
+
+    assert service.compiled_predictor is not None
+    np.testing.assert_array_equal(
+        service.predict_batch(unseen_features), service.model.predict(unseen_features)
+    )
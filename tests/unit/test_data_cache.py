@@ -0,0 +1,104 @@
+import shutil
+
+import pandas as pd
+
+import create_model
+from services.data_cache import cached_table, load_demographics, load_training_data
+from tests.conftest import REPO_ROOT
+
+DATA_DIR = REPO_ROOT / "data"
+
+
+def test_cached_table_round_trips_types_without_copying(tmp_path):
+    """The cached table equals the parsed one and maps its numeric columns"""
+    sales = DATA_DIR / "kc_house_data.csv"
+    demographics = DATA_DIR / "zipcode_demographics.csv"
+    expected_x, expected_y = load_training_data(sales, demographics, use_cache=False)
+
+    load_training_data(sales, demographics, cache_dir=tmp_path)
+    x, y = load_training_data(sales, demographics, cache_dir=tmp_path)
+
+    pd.testing.assert_frame_equal(x, expected_x)
+    pd.testing.assert_series_equal(y, expected_y)
+    assert not x["sqft_living"].to_numpy().flags.owndata
+
+    # Writes stay private to the caller; the next load sees the cached values
+    x.loc[0, "sqft_living"] = -1
+    reloaded, _ = load_training_data(sales, demographics, cache_dir=tmp_path)
+    assert reloaded.loc[0, "sqft_living"] == expected_x.loc[0, "sqft_living"]
+
+
+def test_cached_table_rebuilds_when_a_source_changes(tmp_path):
+    """Unchanged sources reuse the cache; edited sources are parsed again"""
+    source = tmp_path / "demographics.csv"
+    shutil.copy(DATA_DIR / "zipcode_demographics.csv", source)
+    builds = []
+
+    def build():
+        builds.append(1)
+        return pd.read_csv(source, dtype={"zipcode": str})
+
+    cache_dir = tmp_path / "cache"
+    first = cached_table("demographics", [source], build, cache_dir=cache_dir)
+    again = cached_table("demographics", [source], build, cache_dir=cache_dir)
+    assert len(builds) == 1
+    pd.testing.assert_frame_equal(again, first)
+
+    edited = first.copy()
+    edited.loc[0, "ppltn_qty"] = 1.0
+    edited.to_csv(source, index=False)
+    rebuilt = cached_table("demographics", [source], build, cache_dir=cache_dir)
+    assert len(builds) == 2
+    assert rebuilt.loc[0, "ppltn_qty"] == 1.0
+
+
+def test_cached_string_columns_match_parsed_ones(tmp_path):
+    """Cached ZIP codes come back with read_csv's string dtype, under any pandas"""
+    source = DATA_DIR / "zipcode_demographics.csv"
+    expected = load_demographics(source, use_cache=False)
+
+    load_demographics(source, cache_dir=tmp_path)
+    cached = load_demographics(source, cache_dir=tmp_path)
+
+    pd.testing.assert_frame_equal(cached, expected)
+
+
+def test_load_data_reads_the_given_demographics(tmp_path):
+    """create_model.load_data merges the demographics file it is given"""
+    demographics = pd.read_csv(
+        DATA_DIR / "zipcode_demographics.csv", dtype={"zipcode": str}
+    )
+    demographics["hous_val_amt"] = 123.0
+    path = tmp_path / "demographics.csv"
+    demographics.to_csv(path, index=False)
+
+    x, _ = create_model.load_data(
+        str(DATA_DIR / "kc_house_data.csv"),
+        str(path),
+        create_model.SALES_COLUMN_SELECTION,
+    )
+    assert (x["hous_val_amt"] == 123.0).all()
+
+
+def test_cache_sits_beside_the_data_and_serving_only_reads_it(tmp_path, monkeypatch):
+    """The default cache follows the data dir; write_cache=False never writes"""
+    monkeypatch.delenv("DATA_CACHE_DIR", raising=False)
+    data_dir = tmp_path / "data"
+    data_dir.mkdir()
+    source = data_dir / "zipcode_demographics.csv"
+    shutil.copy(DATA_DIR / "zipcode_demographics.csv", source)
+    (tmp_path / "elsewhere").mkdir()
+    monkeypatch.chdir(tmp_path / "elsewhere")
+
+    first = load_demographics(source, write_cache=False)
+    assert not (data_dir / ".cache").exists()
+
+    load_demographics(source)
+    assert list((data_dir / ".cache").glob("demographics-*"))
+    assert not list((tmp_path / "elsewhere").iterdir())
+
+    def no_parsing(*args, **kwargs):
+        raise AssertionError("the CSV was parsed again")
+
+    monkeypatch.setattr(pd, "read_csv", no_parsing)
+    pd.testing.assert_frame_equal(load_demographics(source, write_cache=False), first)
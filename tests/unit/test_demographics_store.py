@@ -0,0 +1,59 @@
+import numpy as np
+import pandas as pd
+
+from services.data_cache import load_demographics
+from services.demographics_store import DemographicsStore, memory_report
+from services.model_service import ModelService
+from tests.conftest import REPO_ROOT
+
+DATA_DIR = str(REPO_ROOT / "data")
+DEMOGRAPHICS_PATH = REPO_ROOT / "data" / "zipcode_demographics.csv"
+
+
+def test_store_looks_up_sorted_integer_zipcodes():
+    """Lookups agree with the DataFrame; first duplicates win, bad codes miss"""
+    frame = pd.DataFrame(
+        {
+            "zipcode": ["98115", "00601", "98001", "98115", "9811x"],
+            "income": [1.0, 2.0, 3.0, 4.0, 5.0],
+        }
+    )
+    store = DemographicsStore.from_frame(frame, dtype=np.float64)
+
+    assert store.zipcodes.dtype == np.int32
+    assert list(store.zipcodes) == [601, 98001, 98115]
+    assert store.values.flags["C_CONTIGUOUS"]
+    assert store.row("98115")[0] == 1.0
+    assert store.zipcode(0) == "00601" and "601" not in store
+
+    row_ids, known = store.lookup(["98001", "00601", "99999", "9811x", "601"])
+    assert list(known) == [True, True, False, False, False]
+    assert list(store.values[row_ids[known], 0]) == [3.0, 2.0]
+
+
+def test_store_is_smaller_than_the_dataframe():
+    """The memory report shows the store below the DataFrame it replaces"""
+    report = memory_report(load_demographics(DEMOGRAPHICS_PATH))
+
+    assert report["store_float64_bytes"] < report["dataframe_bytes"]
+    assert report["store_float32_bytes"] < report["store_float64_bytes"]
+
+
+def test_float32_demographics_keep_predictions(
+    model_dir, unseen_examples, monkeypatch
+):
+    """Predictions with float32 demographics stay within 0.1% of float64"""
+    predictions = {}
+    for dtype in ("float32", "float64"):
+        monkeypatch.setenv("DEMOGRAPHICS_DTYPE", dtype)
+        service = ModelService(model_dir=str(model_dir), data_dir=DATA_DIR)
+        assert service.demographics.values.dtype == np.dtype(dtype)
+        for minimal in (False, True):
+            predictions[dtype, minimal] = service.predict_records(
+                unseen_examples, minimal=minimal, use_cache=False
+            )
+
+    for minimal in (False, True):
+        np.testing.assert_allclose(
+            predictions["float32", minimal], predictions["float64", minimal], rtol=1e-3
+        )
@@ -0,0 +1,84 @@
+import asyncio
+import threading
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from core.inference_pool import InferencePool, InferencePoolSaturated
+from routers import model_router
+
+
+def test_pool_runs_work_off_the_event_loop():
+    """Tasks run on worker threads, not the thread running the event loop"""
+    pool = InferencePool(max_workers=1, max_queue=0)
+
+    async def scenario():
+        return threading.get_ident(), await pool.run(threading.get_ident)
+
+    loop_thread, worker_thread = asyncio.run(scenario())
+
+    assert loop_thread != worker_thread
+    assert pool.status()["completed"] == 1
+
+
+def test_pool_rejects_work_when_saturated():
+    """Once workers and queue are full, new work is rejected immediately"""
+    pool = InferencePool(max_workers=1, max_queue=0)
+    release = threading.Event()
+
+    async def scenario():
+        blocked = asyncio.ensure_future(pool.run(release.wait))
+        await asyncio.sleep(0.05)
+        with pytest.raises(InferencePoolSaturated):
+            await pool.run(lambda: None)
+        release.set()
+        await blocked
+
+    asyncio.run(scenario())
+
+    status = pool.status()
+    assert status["rejected"] == 1
+    assert status["completed"] == 1
+    assert status["in_flight"] == 0
+
+
+def test_cancelled_request_keeps_its_worker_counted():
+    """A cancelled caller doesn't free capacity while its task still runs"""
+    pool = InferencePool(max_workers=1, max_queue=0)
+    release = threading.Event()
+
+    async def scenario():
+        blocked = asyncio.ensure_future(pool.run(release.wait))
+        await asyncio.sleep(0.05)
+        blocked.cancel()
+        await asyncio.sleep(0.05)
+        assert pool.status()["in_flight"] == 1
+        with pytest.raises(InferencePoolSaturated):
+            await pool.run(lambda: None)
+        release.set()
+
+    asyncio.run(scenario())
+    pool.shutdown()
+
+    status = pool.status()
+    assert status["in_flight"] == 0
+    assert status["completed"] == 1
+
+
+def test_saturated_pool_returns_503_with_retry_after(model_service, unseen_examples):
+    """Prediction endpoints answer 503 with Retry-After when the pool is full"""
+
+    class SaturatedPool:
+        async def run(self, fn, *args, **kwargs):
+            raise InferencePoolSaturated(retry_after=3)
+
+    app = FastAPI()
+    app.include_router(model_router.router)
+    app.state.model_service = model_service
+    app.state.inference_pool = SaturatedPool()
+
+    response = TestClient(app).post("/predict/full", json=unseen_examples[0])
+
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "3"
@@ -0,0 +1,89 @@
+import json
+import subprocess
+import sys
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from core.inference_pool import InferencePool
+from core.metrics import REGISTRY, MetricsMiddleware, MetricsRegistry, track_services
+from routers import basic_router, model_router
+
+
+def test_histogram_renders_cumulative_buckets():
+    """Bucket counts are cumulative and end with +Inf, _sum and _count"""
+    registry = MetricsRegistry()
+    histogram = registry.histogram("stage_seconds", "Stage time", ["stage"], [0.1, 1])
+    histogram.observe(0.05, stage="predict")
+    histogram.observe(0.5, stage="predict")
+    histogram.observe(5, stage="predict")
+
+    text = registry.render()
+    assert 'stage_seconds_bucket{container="' in text
+    assert 'stage="predict",le="0.1"} 1' in text
+    assert 'stage="predict",le="1"} 2' in text
+    assert 'stage="predict",le="+Inf"} 3' in text
+    assert 'stage_seconds_count{container="' in text
+    assert "# TYPE stage_seconds histogram" in text
+
+
+def test_snapshots_are_merged_across_processes(tmp_path, monkeypatch):
+    """Counters sum over every worker; gauges only come from live workers"""
+    monkeypatch.setenv("METRICS_DIR", str(tmp_path))
+    monkeypatch.setenv("HOSTNAME", "api-1")
+    registry = MetricsRegistry()
+    counter = registry.counter("requests_total", "Requests", ["route"])
+    gauge = registry.gauge("in_flight", "In flight")
+    counter.inc(2, route="/predict/full")
+    gauge.set(3)
+
+    # A worker that has since exited left its snapshot behind
+    exited = subprocess.run(
+        [sys.executable, "-c", "import os; print(os.getpid())"],
+        capture_output=True,
+        text=True,
+    )
+    dead_pid = int(exited.stdout)
+    snapshot = registry.snapshot()
+    snapshot["pid"] = dead_pid
+    snapshot["metrics"]["requests_total"]["samples"] = [[["/predict/full"], 5.0]]
+    snapshot["metrics"]["in_flight"]["samples"] = [[[], 7.0]]
+    (tmp_path / f"api-1-{dead_pid}.json").write_text(json.dumps(snapshot))
+
+    text = registry.render()
+    assert 'requests_total{container="api-1",route="/predict/full"} 7' in text
+    assert "in_flight{" in text and "} 3" in text
+    assert "} 7\n" not in text.split("# TYPE in_flight gauge")[1]
+
+
+def test_metrics_endpoint_reports_prediction_stages(model_service, unseen_examples):
+    """Predictions through the API show up in every stage histogram"""
+    app = FastAPI()
+    app.include_router(basic_router.router)
+    app.include_router(model_router.router)
+    app.add_middleware(MetricsMiddleware)
+    inference_pool = InferencePool(max_workers=2)
+    app.state.model_service = model_service
+    app.state.inference_pool = inference_pool
+    REGISTRY.clear()
+    track_services(model_service, inference_pool)
+    client = TestClient(app)
+
+    record = unseen_examples[0]
+    assert client.post("/predict/full", json=record).status_code == 200
+    assert client.post("/predict/full", json=record).status_code == 200
+    batch = {"records": [record, {"zipcode": "1"}]}
+    assert client.post("/predict/batch?use_cache=false", json=batch).status_code == 200
+
+    text = client.get("/metrics").text
+    for stage in ("validation", "demographics", "features", "predict", "response"):
+        assert f'stage="{stage}",mode="single"' in text
+        assert f'stage="{stage}",mode="batch"' in text
+    assert 'predictions_total{container="' in text
+    assert 'endpoint="full"} 2' in text
+    assert 'endpoint="batch",reason="validation"} 1' in text
+    assert 'prediction_cache_lookups_total{container="' in text
+    assert 'result="hit"} 1' in text
+    labels = f'container="{REGISTRY.container}",version="{model_service.model_version}"'
+    assert f"model_info{{{labels}}} 1" in text
+    assert 'route="/predict/full",status="200"} 2' in text
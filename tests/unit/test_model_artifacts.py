@@ -0,0 +1,63 @@
+import copy
+
+import numpy as np
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from routers import basic_router
+from services.model_artifacts import ARTIFACT_DIR, load_knn_artifact, save_knn_artifact
+from services.model_service import ModelService
+from tests.conftest import REPO_ROOT
+
+
+def test_artifact_matches_pipeline_predictions(model_service, unseen_examples):
+    """The memory-mapped artifact reproduces the pickled pipeline exactly"""
+    predictor, document = load_knn_artifact(
+        model_service.model_path.parent / ARTIFACT_DIR
+    )
+    assert isinstance(predictor.fit_X, np.memmap)
+    assert isinstance(predictor.fit_y, np.memmap)
+
+    features_df = model_service.prepare_features_batch(unseen_examples)
+    assert document["features"] == list(features_df.columns)
+    np.testing.assert_array_equal(
+        predictor.predict(features_df.to_numpy()),
+        model_service.model.predict(features_df),
+    )
+
+
+def test_service_serves_from_memory_mapped_artifact(
+    model_dir, model_service, unseen_examples, monkeypatch
+):
+    """MODEL_FORMAT=mmap serves the same predictions without unpickling"""
+    monkeypatch.setenv("MODEL_FORMAT", "mmap")
+    service = ModelService(model_dir=str(model_dir), data_dir=str(REPO_ROOT / "data"))
+
+    assert service.model is None
+    assert service.neighbor_index["format"] == "mmap"
+    np.testing.assert_array_equal(
+        service.predict_records(unseen_examples, use_cache=False),
+        model_service.predict_records(unseen_examples, use_cache=False),
+    )
+
+    # Health reports the published bundle, not the (absent) pickled estimator
+    app = FastAPI()
+    app.include_router(basic_router.router)
+    app.state.model_service = service
+    assert TestClient(app).get("/health").json()["model_loaded"] is True
+
+
+def test_reexport_leaves_mapped_artifact_intact(model_service, tmp_path):
+    """Files are replaced by rename, so an existing mapping keeps its data"""
+    save_knn_artifact(model_service.model, model_service.features, tmp_path)
+    predictor, _ = load_knn_artifact(tmp_path)
+    before = np.array(predictor.fit_X)
+
+    retrained = copy.deepcopy(model_service.model)
+    regressor = retrained.steps[-1][1]
+    regressor._fit_X = regressor._fit_X[::-1].copy()
+    save_knn_artifact(retrained, model_service.features, tmp_path)
+
+    np.testing.assert_array_equal(predictor.fit_X, before)
+    reloaded, _ = load_knn_artifact(tmp_path)
+    np.testing.assert_array_equal(reloaded.fit_X, before[::-1])
@@ -0,0 +1,68 @@
+import dataclasses
+import json
+import shutil
+
+import numpy as np
+import pytest
+from sklearn.dummy import DummyRegressor
+
+from services.model_service import ModelService
+from tests.conftest import REPO_ROOT
+
+
+def constant_bundle(bundle, value):
+    """Copy of the bundle whose model always predicts the given value"""
+    model = DummyRegressor(strategy="constant", constant=value)
+    model.fit(np.zeros((1, len(bundle.features))), [value])
+    return dataclasses.replace(
+        bundle, model=model, version=f"constant-{value}", compiled_predictor=None
+    )
+
+
+def test_in_flight_request_keeps_its_bundle(model_service, unseen_examples):
+    """A reload published mid-request does not change that request's model"""
+    record = unseen_examples[0]
+    expected = model_service.predict_record(record, use_cache=False)
+    replacement = constant_bundle(model_service.bundle, 1.0)
+
+    prepare = model_service.prepare_features
+
+    def prepare_then_reload(*args, **kwargs):
+        features_df = prepare(*args, **kwargs)
+        model_service.publish_bundle(replacement)
+        return features_df
+
+    model_service.prepare_features = prepare_then_reload
+    assert model_service.predict_record(record, use_cache=False) == expected
+
+    # Requests that start after the swap see the new model
+    model_service.prepare_features = prepare
+    assert model_service.predict_record(record, use_cache=False) == 1.0
+    assert model_service.model_version == "constant-1.0"
+
+
+def test_failed_validation_keeps_serving_previous_bundle(model_dir, tmp_path):
+    """A model that cannot predict is never published"""
+    for name in ("model.pkl", "model_features.json"):
+        shutil.copy(model_dir / name, tmp_path / name)
+    service = ModelService(model_dir=str(tmp_path), data_dir=str(REPO_ROOT / "data"))
+    previous = service.bundle
+
+    # Features the pipeline was not trained on make every prediction fail
+    features = json.loads((tmp_path / "model_features.json").read_text())
+    (tmp_path / "model_features.json").write_text(json.dumps(features + ["bogus"]))
+    with pytest.raises(ValueError):
+        service.load_model()
+
+    assert service.bundle is previous
+    assert service.reload_count == 0
+
+
+def test_demographics_refresh_is_not_a_model_reload(model_service):
+    """Re-publishing for new demographics leaves the model reload count alone"""
+    version = model_service.model_version
+    model_service.load_demographics()
+
+    assert model_service.model_version == version
+    assert model_service.reload_count == 0
+    assert model_service.demographics_refresh_count == 1
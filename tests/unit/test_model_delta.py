@@ -0,0 +1,167 @@
+import pickle
+import shutil
+
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn import pipeline, preprocessing
+from sklearn.neighbors import KNeighborsRegressor
+
+import create_model
+from services import model_service as model_service_module
+from services.compiled_predictor import CompiledKNNPredictor
+from services.model_delta import DELTA_FILE, apply_delta
+from services.model_service import ModelService
+from services.neighbor_index import build_neighbors_regressor
+from tests.conftest import REPO_ROOT
+
+
+@pytest.fixture
+def served_model(model_dir, tmp_path, monkeypatch):
+    """A private copy of the session model, and a CSV of new sales"""
+    # create_model reads the demographics relative to the repository root
+    monkeypatch.chdir(REPO_ROOT)
+    model_copy = tmp_path / "model"
+    shutil.copytree(model_dir, model_copy)
+    sales = pd.read_csv(REPO_ROOT / "data" / "kc_house_data.csv", nrows=40)
+    sales_path = tmp_path / "new_sales.csv"
+    sales.to_csv(sales_path, index=False)
+    return model_copy, sales_path
+
+
+def test_service_applies_delta_without_unpickling(
+    served_model, unseen_examples, monkeypatch
+):
+    """A delta extends the loaded neighbor search exactly, without model.pkl"""
+    model_copy, sales_path = served_model
+    service = ModelService(model_dir=str(model_copy), data_dir=str(REPO_ROOT / "data"))
+    base_version = service.model_version
+    base, _ = create_model.load_served_model(model_copy)
+    base_X, base_y = np.array(base.fit_X), np.array(base.fit_y)
+
+    create_model.append_sales(str(sales_path), str(model_copy), drift_threshold=1.0)
+    assert (model_copy / DELTA_FILE).exists()
+
+    def no_unpickling(*args, **kwargs):
+        raise AssertionError("the base model was unpickled")
+
+    monkeypatch.setattr(model_service_module.pickle, "load", no_unpickling)
+    service.reload_model()
+    assert service.bundle.delta["rows"] == 40
+    assert service.model_version.startswith(f"{base_version}+")
+
+    x_new, y_new = create_model.load_data(
+        str(sales_path),
+        create_model.DEMOGRAPHICS_PATH,
+        create_model.SALES_COLUMN_SELECTION,
+    )
+    x_new = (x_new[service.features].to_numpy() - base.center) / base.scale
+    reference = KNeighborsRegressor(n_neighbors=base.n_neighbors, algorithm="brute")
+    reference.fit(np.vstack([base_X, x_new]), np.concatenate([base_y, y_new]))
+
+    features_df = service.prepare_features_batch(unseen_examples)
+    np.testing.assert_allclose(
+        service.predict_batch(features_df, use_cache=False),
+        reference.predict((features_df.to_numpy() - base.center) / base.scale),
+    )
+
+
+def test_delta_keeps_the_base_index_and_mapped_rows(
+    served_model, unseen_examples, monkeypatch
+):
+    """The base rows stay memory-mapped and the base index keeps its type"""
+    model_copy, sales_path = served_model
+    monkeypatch.setenv("MODEL_FORMAT", "mmap")
+    service = ModelService(model_dir=str(model_copy), data_dir=str(REPO_ROOT / "data"))
+    base = service.compiled_predictor
+    index = service.neighbor_index["index"]
+
+    create_model.append_sales(str(sales_path), str(model_copy), drift_threshold=1.0)
+    service.reload_model()
+
+    predictor = service.compiled_predictor
+    assert predictor.base is base
+    assert isinstance(predictor.base.fit_X, np.memmap)
+    assert service.neighbor_index["index"] == index
+    assert service.neighbor_index["delta_rows"] == 40
+
+    # Appending again rebuilds only the delta on the same base
+    create_model.append_sales(str(sales_path), str(model_copy), drift_threshold=1.0)
+    service.apply_model_delta()
+    assert service.compiled_predictor.base is base
+    assert service.bundle.delta["rows"] == 80
+
+
+def test_compaction_refits_and_removes_delta(served_model):
+    """Compaction folds the appended rows into a full refit"""
+    model_copy, sales_path = served_model
+    create_model.append_sales(str(sales_path), str(model_copy), drift_threshold=1.0)
+    n_base = create_model.load_served_model(model_copy)[0].fit_X.shape[0]
+
+    create_model.compact(str(model_copy))
+
+    assert not (model_copy / DELTA_FILE).exists()
+    with open(model_copy / "model.pkl", "rb") as f:
+        model = pickle.load(f)
+    assert model.steps[-1][1].n_samples_fit_ == n_base + 40
+
+
+def test_scaler_drift_over_threshold_forces_full_refit(served_model):
+    """Rows that move the scaler too far are not appended as a delta"""
+    model_copy, sales_path = served_model
+    n_base = create_model.load_served_model(model_copy)[0].fit_X.shape[0]
+
+    create_model.append_sales(str(sales_path), str(model_copy), drift_threshold=0.0)
+
+    assert not (model_copy / DELTA_FILE).exists()
+    predictor, _ = create_model.load_served_model(model_copy)
+    assert predictor.fit_X.shape[0] == n_base + 40
+
+
+def test_appending_to_ivf_model_matches_fresh_fit(served_model, monkeypatch):
+    """IVF rows are grouped by cell; appending must keep them with their prices"""
+    model_copy, sales_path = served_model
+    monkeypatch.setattr(create_model, "NEIGHBOR_INDEX", "ivf")
+    x, y = create_model.load_data(
+        create_model.SALES_PATH,
+        create_model.DEMOGRAPHICS_PATH,
+        create_model.SALES_COLUMN_SELECTION,
+    )
+    x_base, y_base = x.iloc[:3000], y.iloc[:3000]
+    create_model.refit(x_base, y_base, model_copy)
+
+    create_model.append_sales(str(sales_path), str(model_copy), drift_threshold=1.0)
+
+    x_new, y_new = create_model.load_data(
+        str(sales_path),
+        create_model.DEMOGRAPHICS_PATH,
+        create_model.SALES_COLUMN_SELECTION,
+    )
+    reference = create_model.train_model(
+        pd.concat([x_base, x_new[x_base.columns]]), pd.concat([y_base, y_new])
+    )
+    with open(model_copy / "model.pkl", "rb") as f:
+        model = pickle.load(f)
+    queries = x.iloc[3000:3200]
+    np.testing.assert_allclose(model.predict(queries), reference.predict(queries))
+
+
+@pytest.mark.parametrize("index", ["brute", "kd_tree", "ball_tree"])
+def test_delta_search_matches_one_index_over_all_rows(index):
+    """Merging base and delta neighbors equals searching every row at once"""
+    rng = np.random.default_rng(0)
+    X, y = rng.normal(size=(600, 4)), rng.normal(size=600)
+    model = pipeline.make_pipeline(
+        preprocessing.RobustScaler(), build_neighbors_regressor(index)
+    ).fit(X[:500], y[:500])
+    base = CompiledKNNPredictor.from_pipeline(model, [f"x{i}" for i in range(4)])
+
+    predictor = apply_delta(base, X[500:], y[500:])
+
+    scaled = (X - base.center) / base.scale
+    reference = KNeighborsRegressor(n_neighbors=base.n_neighbors).fit(scaled, y)
+    queries = rng.normal(size=(50, 4))
+    np.testing.assert_allclose(
+        predictor.predict(queries),
+        reference.predict((queries - base.center) / base.scale),
+    )
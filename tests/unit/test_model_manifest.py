@@ -0,0 +1,76 @@
+import json
+import os
+import shutil
+
+import pytest
+
+import create_model
+from services.model_manifest import MANIFEST_FILE, VERSION_LENGTH
+from services.model_service import ModelService
+from tests.conftest import REPO_ROOT
+
+DATA_DIR = str(REPO_ROOT / "data")
+
+
+@pytest.fixture
+def model_copy(model_dir, tmp_path):
+    """A private copy of the session model"""
+    shutil.copytree(model_dir, tmp_path / "model")
+    return tmp_path / "model"
+
+
+def test_version_is_the_content_hash(model_dir, model_copy):
+    """Copies of the same files get the same version, whatever their mtimes"""
+    manifest = json.loads((model_dir / MANIFEST_FILE).read_text())
+    os.utime(model_copy / "model.pkl", (1, 1))
+
+    original = ModelService(model_dir=str(model_dir), data_dir=DATA_DIR)
+    copy = ModelService(model_dir=str(model_copy), data_dir=DATA_DIR)
+
+    assert original.model_version == manifest["content_hash"][:VERSION_LENGTH]
+    assert copy.model_version == original.model_version
+    assert copy.bundle.manifest["metadata"] == manifest["metadata"]
+
+
+def test_unchanged_content_skips_reload(model_copy):
+    """Touching or appending nothing to the model files doesn't reload it"""
+    service = ModelService(model_dir=str(model_copy), data_dir=DATA_DIR)
+    os.utime(model_copy / "model.pkl")
+    with open(model_copy / "model.pkl", "ab") as f:
+        f.write(b"")
+
+    service.reload_model()
+
+    assert service.reload_count == 0
+    assert not service.model_changed()
+
+    # An explicit force reloads the unchanged content anyway
+    service.reload_model(force=True)
+    assert service.reload_count == 1
+
+
+def test_new_content_reloads_with_or_without_manifest(model_copy, monkeypatch):
+    """New model files reload, even when copied in without their manifest"""
+    service = ModelService(model_dir=str(model_copy), data_dir=DATA_DIR)
+    first_version = service.model_version
+    monkeypatch.chdir(REPO_ROOT)
+    x, y = create_model.load_data(
+        create_model.SALES_PATH,
+        create_model.DEMOGRAPHICS_PATH,
+        create_model.SALES_COLUMN_SELECTION,
+    )
+
+    create_model.refit(x.iloc[:5000], y.iloc[:5000], model_copy)
+    service.reload_model()
+    assert service.reload_count == 1
+    assert service.model_version != first_version
+    assert service.bundle.manifest["metadata"]["n_train"] == 5000
+
+    # Replace model.pkl behind the manifest's back: the hash still changes
+    manifest = (model_copy / MANIFEST_FILE).read_text()
+    create_model.refit(x.iloc[:4000], y.iloc[:4000], model_copy)
+    (model_copy / MANIFEST_FILE).write_text(manifest)
+    assert service.model_changed()
+    service.reload_model()
+    assert service.reload_count == 2
+    assert service.bundle.manifest["metadata"] is None
@@ -0,0 +1,352 @@
+import numpy as np
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from core.inference_pool import InferencePool
+from routers import model_router
+from services.data_cache import load_demographics
+
+
+def make_client(model_service, inference_pool=None):
+    """Build a test app around the given model service"""
+    app = FastAPI()
+    app.include_router(model_router.router)
+    app.state.model_service = model_service
+    app.state.inference_pool = inference_pool or InferencePool(max_workers=2)
+    return TestClient(app)
+
+
+def test_batch_predictions_match_single_predictions(model_service, unseen_examples):
+    """Batch feature assembly and prediction match the single-record path"""
+    records = unseen_examples[:25]
+
+    batch = model_service.predict_batch(model_service.prepare_features_batch(records))
+    single = [
+        model_service.predict(model_service.prepare_features(record))
+        for record in records
+    ]
+
+    np.testing.assert_allclose(batch, single)
+
+
+def test_batch_predictions_are_chunked(model_service, unseen_examples):
+    """Chunking the feature matrix doesn't change the predictions"""
+    features_df = model_service.prepare_features_batch(unseen_examples[:10])
+    expected = model_service.predict_batch(features_df)
+
+    model_service.batch_chunk_size = 3
+    np.testing.assert_allclose(model_service.predict_batch(features_df), expected)
+
+
+def test_batch_endpoint_reports_row_errors_in_order(model_service, unseen_examples):
+    """Invalid records get per-row errors without failing the batch"""
+    records = [dict(unseen_examples[0]), {"bedrooms": -1}, dict(unseen_examples[1])]
+    client = make_client(model_service)
+
+    response = client.post("/predict/batch", json={"records": records})
+
+    assert response.status_code == 200
+    results = response.json()["predictions"]
+    assert [result["index"] for result in results] == [0, 1, 2]
+    assert results[0]["prediction"] is not None and results[0]["errors"] is None
+    assert results[1]["prediction"] is None and results[1]["errors"]
+    assert results[2]["prediction"] is not None
+    assert response.json()["metadata"]["records_failed"] == 1
+
+
+def test_demographics_store_matches_dataframe_lookup(model_service):
+    """The demographics store returns the values of filtering the DataFrame"""
+    data = load_demographics(model_service.demographics_path)
+    for zipcode in data["zipcode"].head(5):
+        expected = data[data["zipcode"] == zipcode].iloc[0].drop("zipcode").to_dict()
+        actual = model_service.enrich_with_demographics(zipcode)
+        assert actual.keys() == expected.keys()
+        assert actual == expected
+
+    demographic_features = [
+        f for f in model_service.features if f in model_service.demographics_columns
+    ]
+    assert (
+        model_service.demographics_columns[: len(demographic_features)]
+        == demographic_features
+    )
+
+
+def test_unknown_zipcode_uses_default_demographics(model_service):
+    """Unknown ZIP codes fall back to the default demographics"""
+    demographics = model_service.enrich_with_demographics("00000")
+
+    assert demographics["medn_hshld_incm_amt"] == 50000.0
+    assert demographics["hous_val_amt"] == 250000.0
+
+
+def test_batcher_coalesces_concurrent_predictions(model_service, unseen_examples):
+    """Concurrent single predictions share model calls and keep their own rows"""
+    from concurrent.futures import ThreadPoolExecutor
+
+    from services.prediction_batcher import PredictionBatcher
+
+    frames = [model_service.prepare_features(r) for r in unseen_examples[:40]]
+    expected = [model_service.predict(f, use_cache=False) for f in frames]
+
+    model_service.batcher = PredictionBatcher(
+        model_service._predict_chunked, max_batch_size=16, max_wait_ms=50
+    )
+    with ThreadPoolExecutor(max_workers=16) as executor:
+        batched = list(
+            executor.map(lambda f: model_service.predict(f, use_cache=False), frames)
+        )
+
+    np.testing.assert_allclose(batched, expected)
+    status = model_service.batcher.status()
+    assert status["rows"] == len(frames)
+    assert status["largest_batch"] > 1
+
+
+def test_async_batching_is_not_capped_by_the_pool(model_service, unseen_examples):
+    """Batches fill past the pool size when handlers await the batcher"""
+    import asyncio
+
+    from services.prediction_batcher import PredictionBatcher
+
+    records = unseen_examples[:24]
+    expected = [model_service.predict_record(r, use_cache=False) for r in records]
+
+    pool = InferencePool(max_workers=1, max_queue=64)
+    model_service.batcher = PredictionBatcher(
+        model_service._predict_chunked, max_batch_size=32, max_wait_ms=100
+    )
+
+    async def scenario():
+        return await asyncio.gather(
+            *[
+                model_service.predict_record_async(pool, r, use_cache=False)
+                for r in records
+            ]
+        )
+
+    batched = [prediction for prediction, _ in asyncio.run(scenario())]
+    model_service.close()
+    pool.shutdown()
+
+    np.testing.assert_allclose(batched, expected)
+    assert model_service.batcher.status()["largest_batch"] > 1
+    with pytest.raises(RuntimeError):
+        model_service.batcher.submit(model_service.prepare_features(records[0]))
+
+
+def test_response_describes_the_bundle_that_predicted(
+    model_service, unseen_examples, monkeypatch
+):
+    """A reload during a request doesn't relabel the prediction"""
+    import dataclasses
+
+    original = model_service.bundle
+
+    def swap_after(predict):
+        def predict_then_swap(*args, **kwargs):
+            prediction = predict(*args, **kwargs)
+            model_service.bundle = dataclasses.replace(original, version="swapped")
+            return prediction
+
+        return predict_then_swap
+
+    for name in ("predict_record", "predict_records"):
+        monkeypatch.setattr(
+            model_service, name, swap_after(getattr(model_service, name))
+        )
+    client = make_client(model_service)
+    for query in ("", "?lean=true"):
+        model_service.bundle = original
+        response = client.post(f"/predict/full{query}", json=unseen_examples[0])
+        assert response.json()["model_version"] == original.version
+
+    model_service.bundle = original
+    response = client.post(
+        "/predict/batch", json={"records": unseen_examples[:3], "mode": "full"}
+    )
+    assert model_service.model_version == "swapped"
+    assert response.json()["model_version"] == original.version
+
+
+def test_frame_features_match_per_record_features(model_service, unseen_examples):
+    """The gather-based frame path builds the same matrix as per-record assembly"""
+    import pandas as pd
+
+    frame = pd.DataFrame(unseen_examples[:20])
+    frame.loc[3, "zipcode"] = "00000"
+    records = frame.to_dict(orient="records")
+
+    for minimal in (False, True):
+        expected = pd.concat(
+            [model_service.prepare_features(r, minimal=minimal) for r in records]
+        )
+        actual = model_service.prepare_features_frame(frame, minimal=minimal)
+        np.testing.assert_allclose(
+            actual.to_numpy(dtype=float), expected.to_numpy(dtype=float)
+        )
+        assert list(actual.columns) == model_service.features
+
+
+def test_feature_matrix_gathers_demographics_in_model_order(
+    model_service, unseen_examples
+):
+    """Records map to dense demographics rows, unknown ZIP codes to the defaults"""
+    records = [dict(record) for record in unseen_examples[:30]]
+    records[5]["zipcode"] = "00000"
+
+    matrix = model_service.feature_matrix(records)
+
+    assert matrix.dtype == np.float64 and matrix.flags["C_CONTIGUOUS"]
+    assert matrix.shape == (30, len(model_service.features))
+    expected = [model_service.prepare_features(r).to_numpy()[0] for r in records]
+    np.testing.assert_allclose(matrix, expected)
+    income = model_service.features.index("medn_hshld_incm_amt")
+    assert matrix[5, income] == 50000.0
+
+    np.testing.assert_allclose(
+        model_service.predict_records(records, use_cache=False),
+        [
+            model_service.predict(model_service.prepare_features(r), use_cache=False)
+            for r in records
+        ],
+    )
+
+
+def test_batch_endpoint_negotiates_columnar_npz(model_service, unseen_examples):
+    """npz columns in and out give the JSON endpoint's predictions"""
+    import pandas as pd
+
+    from models.columnar import (
+        NPZ_MEDIA_TYPE,
+        decode_predictions,
+        encode_columns,
+    )
+
+    frame = pd.DataFrame(unseen_examples[:20])
+    frame.loc[2, "bedrooms"] = -1
+    client = make_client(model_service)
+    expected = client.post(
+        "/predict/batch", json={"records": frame.to_dict(orient="records")}
+    ).json()["predictions"]
+
+    response = client.post(
+        "/predict/batch",
+        content=encode_columns({name: frame[name].to_numpy() for name in frame}),
+        headers={"Content-Type": NPZ_MEDIA_TYPE, "Accept": NPZ_MEDIA_TYPE},
+    )
+
+    assert response.status_code == 200
+    assert response.headers["content-type"] == NPZ_MEDIA_TYPE
+    assert response.headers["x-records-failed"] == "1"
+    arrays = decode_predictions(response.content)
+    assert list(arrays["valid"]) == [result["errors"] is None for result in expected]
+    assert np.isnan(arrays["prediction"][2])
+    np.testing.assert_allclose(
+        arrays["prediction"][arrays["valid"]],
+        [result["prediction"] for result in expected if result["errors"] is None],
+    )
+    assert str(arrays["model_version"]) == model_service.model_version
+
+
+def test_columnar_errors_match_json_errors(model_service, unseen_examples):
+    """npz columns fail row by row with the JSON records' pydantic errors"""
+    import pandas as pd
+
+    from models.columnar import NPZ_MEDIA_TYPE, encode_columns
+
+    frame = pd.DataFrame(unseen_examples[:5]).astype({"bedrooms": float})
+    frame.loc[1, "bedrooms"] = 2.5
+    frame.loc[2, "lat"] = 49.0
+    frame.loc[3, "zipcode"] = "981"
+    client = make_client(model_service)
+    expected = client.post(
+        "/predict/batch", json={"records": frame.to_dict(orient="records")}
+    ).json()["predictions"]
+    frame.loc[4, "bedrooms"] = np.nan
+
+    response = client.post(
+        "/predict/batch",
+        content=encode_columns({name: frame[name].to_numpy() for name in frame}),
+        headers={"Content-Type": NPZ_MEDIA_TYPE},
+    )
+
+    results = response.json()["predictions"]
+    for result, json_result in zip(results[:4], expected):
+        json_errors = [
+            {key: error[key] for key in ("type", "loc", "msg")}
+            for error in json_result["errors"] or []
+        ]
+        assert result["errors"] == (json_errors or None)
+    assert [result["errors"] is None for result in results] == [
+        True, False, False, False, False
+    ]
+    assert [error["type"] for error in results[4]["errors"]] == ["finite_number"]
+
+
+def test_compressed_columnar_batches_decode(unseen_examples):
+    """np.savez_compressed archives decode to the same columns as np.savez"""
+    import io
+
+    import pandas as pd
+
+    from models.columnar import decode_columns, encode_columns
+
+    frame = pd.DataFrame(unseen_examples[:5])
+    plain = encode_columns({name: frame[name].to_numpy() for name in frame})
+    compressed = io.BytesIO()
+    np.savez_compressed(compressed, **np.load(io.BytesIO(plain)))
+
+    pd.testing.assert_frame_equal(
+        decode_columns(compressed.getvalue(), max_rows=5),
+        decode_columns(plain, max_rows=5),
+    )
+
+
+def test_columnar_limits_are_checked_before_decompressing(monkeypatch):
+    """A header claiming too many rows is rejected without reading its data"""
+    import io
+    import zipfile
+
+    from models import columnar
+
+    def bomb(shape, dtype="<f8"):
+        buffer = io.BytesIO()
+        with zipfile.ZipFile(buffer, "w", zipfile.ZIP_DEFLATED) as archive:
+            with archive.open("bedrooms.npy", "w") as member:
+                header = {"descr": dtype, "fortran_order": False, "shape": shape}
+                np.lib.format.write_array_header_1_0(member, header)
+                member.write(bytes(1 << 16))
+        return buffer.getvalue()
+
+    def read_array(*args, **kwargs):
+        raise AssertionError("array data was decompressed")
+
+    monkeypatch.setattr(np.lib.format, "read_array", read_array)
+    for body, message in (
+        (bomb((10**9,)), "between 1 and 100 rows"),
+        (bomb((10, 10)), "one-dimensional"),
+        (bomb((10,), "|O"), "can't hold objects"),
+        (bomb((10,), "<U1000"), "over 256 bytes"),
+    ):
+        with pytest.raises(columnar.ColumnarFormatError, match=message):
+            columnar.decode_columns(body, max_rows=100)
+
+
+def test_lean_responses_drop_echoed_fields(model_service, unseen_examples):
+    """lean=true returns predictions without features_used or metadata"""
+    client = make_client(model_service)
+    record = dict(unseen_examples[0])
+
+    single = client.post("/predict/full?lean=true", json=record).json()
+    assert set(single) == {"prediction", "model_version"}
+    full = client.post("/predict/full", json=record).json()
+    assert single["prediction"] == full["prediction"]
+
+    batch = client.post(
+        "/predict/batch?lean=true", json={"records": [record, {"bedrooms": -1}]}
+    ).json()
+    assert set(batch) == {"predictions", "errors", "model_version"}
+    assert batch["predictions"] == [full["prediction"], None]
+    assert batch["errors"][0]["index"] == 1
@@ -0,0 +1,110 @@
+import json
+import time
+
+import pytest
+
+from core import model_watchdog
+from services.model_delta import DELTA_FILE
+from services.model_manifest import MANIFEST_FILE
+
+
+class CountingService:
+    """Stands in for ModelService; only counts reloads"""
+
+    def __init__(self):
+        self.model_version = "v0"
+        self.reload_count = 0
+
+    def reload_model(self):
+        self.reload_count += 1
+        self.model_version = f"v{self.reload_count}"
+
+
+class SilentObserver:
+    """An observer on a filesystem that never delivers events"""
+
+    scheduled = []
+
+    def __init__(self):
+        self.daemon = False
+
+    def schedule(self, handler, path, recursive=False):
+        self.scheduled.append(path)
+
+    def start(self):
+        pass
+
+    def stop(self):
+        pass
+
+    def join(self, timeout=None):
+        pass
+
+
+@pytest.fixture
+def silent_nfs(tmp_path, monkeypatch):
+    """A model directory on a simulated NFS mount with no file events"""
+    monkeypatch.setattr(model_watchdog, "Observer", SilentObserver)
+    monkeypatch.setattr(model_watchdog, "filesystem_type", lambda path: "nfs4")
+    monkeypatch.setenv("MODEL_POLL_MIN_INTERVAL", "0.02")
+    monkeypatch.setenv("MODEL_POLL_MAX_INTERVAL", "0.1")
+    monkeypatch.setenv("MODEL_RELOAD_DEBOUNCE", "0")
+    (tmp_path / MANIFEST_FILE).write_text(json.dumps({"content_hash": "a"}))
+    yield tmp_path
+    model_watchdog.stop_file_watcher()
+
+
+def wait_for(condition, timeout=5.0):
+    deadline = time.time() + timeout
+    while not condition() and time.time() < deadline:
+        time.sleep(0.01)
+    return condition()
+
+
+def test_auto_backend_polls_when_no_events_arrive(silent_nfs, monkeypatch):
+    """On a network mount the manifest poller picks up new models"""
+    monkeypatch.setenv("MODEL_WATCHER_BACKEND", "auto")
+    service = CountingService()
+    assert model_watchdog.start_file_watcher(service, str(silent_nfs))
+    assert SilentObserver.scheduled == []
+
+    (silent_nfs / MANIFEST_FILE).write_text(json.dumps({"content_hash": "b"}))
+    assert wait_for(lambda: service.reload_count == 1)
+    (silent_nfs / DELTA_FILE).write_text("{}")
+    assert wait_for(lambda: service.reload_count == 2)
+
+    watcher = model_watchdog.get_watchdog_status()["watcher"]
+    assert watcher["backend"] == "poll"
+    assert watcher["detections"] >= 2
+    assert 0 <= watcher["last_detection_latency"] < 5
+
+
+def test_poll_interval_backs_off_and_resets(silent_nfs):
+    """Quiet polls stretch the interval; a change brings it back down"""
+    service = CountingService()
+    poller = model_watchdog.ManifestPoller(
+        model_watchdog.ModelFileChangeHandler(service),
+        silent_nfs,
+        min_interval=0.1,
+        max_interval=1.0,
+        backoff=2.0,
+    )
+    for _ in range(5):
+        assert poller.poll_once() == []
+    assert poller.interval == 1.0
+
+    (silent_nfs / MANIFEST_FILE).write_text(json.dumps({"content_hash": "longer"}))
+    assert poller.poll_once() == [str(silent_nfs / MANIFEST_FILE)]
+    assert poller.interval == 0.1
+    assert service.reload_count == 1
+
+
+def test_poller_notices_a_pickle_replaced_without_a_manifest(silent_nfs):
+    """A model.pkl copied in by hand is reported like a new manifest"""
+    service = CountingService()
+    poller = model_watchdog.ManifestPoller(
+        model_watchdog.ModelFileChangeHandler(service), silent_nfs
+    )
+    (silent_nfs / "model.pkl").write_bytes(b"new model")
+    assert poller.poll_once() == [str(silent_nfs / "model.pkl")]
+    assert service.reload_count == 1
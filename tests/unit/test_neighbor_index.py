@@ -0,0 +1,72 @@
+import numpy as np
+import pytest
+from sklearn.neighbors import KNeighborsRegressor
+
+from services.neighbor_index import (
+    IVFNeighborsRegressor,
+    build_neighbors_regressor,
+    describe_neighbor_index,
+)
+
+
+@pytest.fixture
+def training_data():
+    rng = np.random.default_rng(0)
+    return rng.normal(size=(2000, 8)), rng.uniform(1e5, 1e6, size=2000)
+
+
+def test_ivf_probing_every_list_is_exact(training_data):
+    """Probing all cells makes the IVF search identical to brute force"""
+    X, y = training_data
+    queries = X[:50] + 0.01
+
+    ivf = IVFNeighborsRegressor(n_lists=16, n_probe=16).fit(X, y)
+    exact = KNeighborsRegressor(algorithm="brute").fit(X, y)
+
+    np.testing.assert_array_equal(
+        ivf.kneighbors(queries, return_distance=False),
+        exact.kneighbors(queries, return_distance=False),
+    )
+    np.testing.assert_allclose(ivf.predict(queries), exact.predict(queries))
+
+
+def test_ivf_recall_with_partial_probing(training_data):
+    """Probing a few cells still finds most of the true neighbors"""
+    X, y = training_data
+    queries = X[:100] + 0.01
+
+    ivf = IVFNeighborsRegressor(n_lists=16, n_probe=4).fit(X, y)
+    exact = KNeighborsRegressor(algorithm="brute").fit(X, y)
+    approx = ivf.kneighbors(queries, return_distance=False)
+    truth = exact.kneighbors(queries, return_distance=False)
+
+    recall = np.mean([len(set(a) & set(b)) / 5 for a, b in zip(approx, truth)])
+    assert recall > 0.8
+
+
+def test_ivf_widens_probe_past_small_cells(training_data):
+    """Probed cells with fewer than k rows never pad the neighbors"""
+    X, y = training_data[0][:200], training_data[1][:200]
+    queries = X[:50] + 0.01
+
+    # One row per cell, so a single probe holds fewer than k rows
+    ivf = IVFNeighborsRegressor(n_lists=len(X), n_probe=1).fit(X, y)
+    exact = KNeighborsRegressor(algorithm="brute").fit(X, y)
+    distances, indices = ivf.kneighbors(queries)
+
+    assert np.isfinite(distances).all()
+    np.testing.assert_array_equal(
+        indices, exact.kneighbors(queries, return_distance=False)
+    )
+    np.testing.assert_allclose(ivf.predict(queries), exact.predict(queries))
+
+
+def test_build_neighbors_regressor_choices():
+    """Each index name maps to the matching estimator"""
+    assert build_neighbors_regressor("kd_tree").algorithm == "kd_tree"
+    assert describe_neighbor_index(build_neighbors_regressor("ball_tree", leaf_size=40))[
+        "leaf_size"
+    ] == 40
+    assert isinstance(build_neighbors_regressor("ivf"), IVFNeighborsRegressor)
+    with pytest.raises(ValueError):
+        build_neighbors_regressor("annoy")
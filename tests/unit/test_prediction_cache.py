@@ -0,0 +1,100 @@
+import time
+
+from services.prediction_cache import PredictionCache
+
+
+def test_cache_evicts_least_recently_used():
+    """The oldest untouched entry is evicted once the cache is full"""
+    cache = PredictionCache(max_size=2)
+    cache.put("a", 1.0)
+    cache.put("b", 2.0)
+    cache.get("a")
+    cache.put("c", 3.0)
+
+    assert cache.get("b") is None
+    assert cache.get("a") == 1.0
+    assert cache.status()["evictions"] == 1
+
+
+def test_cache_entries_expire():
+    """Entries older than the TTL count as misses"""
+    cache = PredictionCache(ttl_seconds=0.01)
+    cache.put("a", 1.0)
+    time.sleep(0.02)
+
+    assert cache.get("a") is None
+    assert cache.status()["expirations"] == 1
+
+
+def test_model_service_serves_repeat_predictions_from_cache(
+    model_service, unseen_examples
+):
+    """Repeat queries hit the cache; use_cache=False bypasses it"""
+    features_df = model_service.prepare_features(unseen_examples[0])
+
+    first = model_service.predict(features_df)
+    assert model_service.predict(features_df) == first
+    assert model_service.prediction_cache.status()["hits"] == 1
+
+    model_service.predict(features_df, use_cache=False)
+    assert model_service.prediction_cache.status()["hits"] == 1
+
+
+def test_batch_only_predicts_cache_misses(model_service, unseen_examples):
+    """Cached rows are filled in and only misses reach the model"""
+    features_df = model_service.prepare_features_batch(unseen_examples[:6])
+    model_service.predict_batch(features_df.iloc[:3])
+
+    predictions = model_service.predict_batch(features_df)
+
+    status = model_service.prediction_cache.status()
+    assert status["hits"] == 3
+    assert status["size"] == 6
+    assert list(predictions) == list(model_service.predict_batch(features_df, use_cache=False))
+
+
+def test_cache_is_cleared_when_a_model_is_loaded(model_service, unseen_examples):
+    """Loading a model drops predictions made by the previous one"""
+    model_service.predict(model_service.prepare_features(unseen_examples[0]))
+    model_service.load_model()
+
+    assert model_service.prediction_cache.status()["size"] == 0
+
+
+def test_requests_differing_in_ignored_fields_share_a_cache_entry(
+    model_service, unseen_examples
+):
+    """Fields dropped by the model don't fragment the cache"""
+    record = dict(unseen_examples[0])
+    variant = {**record, "waterfront": 1, "view": 4, "grade": 13, "lat": 47.9}
+
+    assert model_service.request_cache_key(record) == model_service.request_cache_key(
+        variant
+    )
+    assert model_service.request_cache_key(
+        record
+    ) != model_service.request_cache_key({**record, "bedrooms": 9})
+    assert {"waterfront", "view", "grade", "lat", "long", "yr_built"} <= set(
+        model_service.ignored_fields(variant)
+    )
+
+    first = model_service.predict_record(record)
+    assert model_service.predict_record(variant) == first
+    assert model_service.prediction_cache.status()["hits"] == 1
+
+
+def test_batch_deduplicates_records_with_the_same_relevant_inputs(
+    model_service, unseen_examples
+):
+    """Duplicate records in a batch are computed once and answered in order"""
+    record = dict(unseen_examples[0])
+    other = dict(unseen_examples[1])
+    records = [record, other, {**record, "view": 3}, {**other, "lat": 47.1}]
+
+    predictions = model_service.predict_records(records, use_cache=False)
+
+    assert predictions[0] == predictions[2]
+    assert predictions[1] == predictions[3]
+    assert predictions[0] == model_service.predict(
+        model_service.prepare_features(record), use_cache=False
+    )
@@ -0,0 +1,116 @@
+import os
+import shutil
+import signal
+import subprocess
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import create_model
+from core.prefork import (
+    SUPERVISOR_PID_ENV,
+    PreforkSupervisor,
+    child_pids,
+    process_memory,
+    worker_status,
+)
+from services.model_service import ModelService
+from services.prediction_batcher import PredictionBatcher
+from tests.conftest import REPO_ROOT
+
+
+def test_process_memory_reads_proc():
+    """The current process reports a non-zero resident set"""
+    memory = process_memory(os.getpid())
+    assert memory["rss_kb"] > 0
+
+
+def test_worker_status_lists_supervisor_children(monkeypatch):
+    """In pre-fork mode every child of the supervisor is reported"""
+    assert worker_status()["mode"] == "single"
+
+    child = subprocess.Popen([sys.executable, "-c", "import time; time.sleep(30)"])
+    try:
+        assert child.pid in child_pids(os.getpid())
+        monkeypatch.setenv(SUPERVISOR_PID_ENV, str(os.getpid()))
+        status = worker_status()
+        assert status["mode"] == "prefork"
+        assert status["supervisor"]["pid"] == os.getpid()
+        assert child.pid in [worker["pid"] for worker in status["workers"]]
+    finally:
+        child.kill()
+        child.wait()
+
+
+def test_unknown_reload_mode_is_rejected():
+    """Reload modes are validated when the supervisor is configured"""
+    with pytest.raises(ValueError):
+        PreforkSupervisor(reload_mode="restart")
+
+
+def test_batcher_runs_in_forked_worker(model_service, unseen_examples):
+    """The batcher's collecting thread is restarted in a forked child"""
+    model_service.batcher = PredictionBatcher(
+        model_service._predict_chunked, max_batch_size=4, max_wait_ms=1
+    )
+    features_df = model_service.prepare_features(unseen_examples[0])
+    expected = model_service.predict(features_df, use_cache=False)
+
+    pid = os.fork()
+    if pid == 0:
+        ok = False
+        try:
+            future = model_service.batcher.submit(features_df, model_service.bundle)
+            ok = np.isclose(future.result(timeout=10)[0], expected)
+        finally:
+            os._exit(0 if ok else 1)
+
+    _, status = os.waitpid(pid, 0)
+    assert os.waitstatus_to_exitcode(status) == 0
+
+
+def test_appended_rows_reach_signalled_workers(model_dir, tmp_path, monkeypatch):
+    """The supervisor notices a new delta and its workers apply it"""
+    monkeypatch.chdir(REPO_ROOT)
+    monkeypatch.setenv("MODEL_RELOAD_DEBOUNCE", "0")
+    model_copy = tmp_path / "model"
+    shutil.copytree(model_dir, model_copy)
+    sales_path = tmp_path / "new_sales.csv"
+    pd.read_csv(REPO_ROOT / "data" / "kc_house_data.csv", nrows=40).to_csv(
+        sales_path, index=False
+    )
+    supervisor = PreforkSupervisor()
+    supervisor.model_service = ModelService(
+        model_dir=str(model_copy), data_dir=str(REPO_ROOT / "data")
+    )
+    base_version = supervisor.model_service.model_version
+    ready_read, ready_write = os.pipe()
+
+    pid = os.fork()
+    if pid == 0:
+        ok = False
+        try:
+            signal.signal(signal.SIGHUP, supervisor._on_worker_sighup)
+            os.write(ready_write, b"1")
+            deadline = time.monotonic() + 30
+            while time.monotonic() < deadline and not ok:
+                time.sleep(0.05)
+                bundle = supervisor.model_service.bundle
+                ok = bundle.delta is not None and bundle.delta["rows"] == 40
+        finally:
+            os._exit(0 if ok else 1)
+
+    os.read(ready_read, 1)
+    supervisor.children[pid] = 0
+    assert not supervisor._model_changed()
+    create_model.append_sales(str(sales_path), str(model_copy), drift_threshold=1.0)
+    assert supervisor._model_changed()
+    supervisor.reload(force=False)
+
+    _, status = os.waitpid(pid, 0)
+    assert os.waitstatus_to_exitcode(status) == 0
+    assert supervisor.model_service.model_version.startswith(f"{base_version}+")
+    assert not supervisor._model_changed()
@@ -0,0 +1,170 @@
+import importlib
+import json
+import os
+import shutil
+import time
+
+import pytest
+
+import create_model
+from core.rollout import RolloutCoordinator
+from services.model_service import ModelService
+from tests.conftest import REPO_ROOT
+
+
+@pytest.fixture
+def fleet(model_dir, tmp_path, monkeypatch):
+    """Two replicas sharing a model directory, and a way to publish a new model"""
+    monkeypatch.setenv("MODEL_WARMUP_SAMPLES", "2")
+    shutil.copytree(model_dir, tmp_path / "model")
+    data_dir = str(REPO_ROOT / "data")
+    services = [
+        ModelService(model_dir=str(tmp_path / "model"), data_dir=data_dir)
+        for _ in range(2)
+    ]
+
+    def new_model():
+        monkeypatch.chdir(REPO_ROOT)
+        x, y = create_model.load_data(
+            create_model.SALES_PATH,
+            create_model.DEMOGRAPHICS_PATH,
+            create_model.SALES_COLUMN_SELECTION,
+        )
+        create_model.refit(x.iloc[:3000], y.iloc[:3000], tmp_path / "model")
+
+    return services, tmp_path / "rollout", new_model
+
+
+def coordinators(services, rollout_dir, **kwargs):
+    """One coordinator per replica, with their first heartbeats written"""
+    replicas = [
+        RolloutCoordinator(service, rollout_dir, replica_id=f"replica-{i}", **kwargs)
+        for i, service in enumerate(services)
+    ]
+    for replica in replicas:
+        replica.heartbeat()
+    return replicas
+
+
+def test_replicas_reload_in_waves(fleet):
+    """A replica waits for the lease the previous wave holds"""
+    services, rollout_dir, new_model = fleet
+    first, second = coordinators(services, rollout_dir, wave_size=1)
+    old_version = services[0].model_version
+    new_model()
+
+    target, _ = services[0].current_content_hash()
+    slot = first._acquire_lease(target)
+    second.step()
+    assert services[1].model_version == old_version
+
+    first._release_lease(slot)
+    first.step()
+    assert services[0].model_version != old_version
+    second.step()
+    assert services[1].model_version == services[0].model_version
+
+
+def test_prepare_then_commit_switches_together(fleet):
+    """Prepared replicas keep serving the old model until the shared commit"""
+    services, rollout_dir, new_model = fleet
+    first, second = coordinators(services, rollout_dir, commit=True, commit_delay=0)
+    old_version = services[0].model_version
+    new_model()
+
+    first.step()
+    assert first.prepared is not None
+    assert services[0].model_version == old_version
+
+    # The last replica to prepare writes the commit and switches
+    second.step()
+    commits = list((rollout_dir / "commits").glob("*.json"))
+    assert len(commits) == 1
+    assert json.loads(commits[0].read_text())["written_by"] == "replica-1"
+    assert services[1].model_version != old_version
+
+    first.step()
+    assert services[0].model_version == services[1].model_version
+
+
+def test_failed_replica_halts_the_rollout(fleet):
+    """No replica loads a version that a peer failed to load"""
+    services, rollout_dir, new_model = fleet
+    first, second = coordinators(services, rollout_dir)
+    old_version = services[1].model_version
+    new_model()
+
+    first.failed, _ = services[0].current_content_hash()
+    first.heartbeat()
+    second.step()
+
+    assert services[1].model_version == old_version
+    assert second.status()["target"] == first.failed
+
+
+def test_stale_peer_holds_back_the_next_wave(fleet):
+    """A peer that stopped heartbeating blocks waves until it is back"""
+    services, rollout_dir, new_model = fleet
+    first, second = coordinators(services, rollout_dir)
+    old_version = services[0].model_version
+    new_model()
+
+    # A wedged replica: still within the peer timeout, but silent for a while
+    heartbeat = rollout_dir / "replicas" / "replica-1.json"
+    status = json.loads(heartbeat.read_text())
+    status["updated_at"] = time.time() - 5
+    heartbeat.write_text(json.dumps(status))
+    assert [peer["replica"] for peer in first.peers()] == ["replica-1"]
+    first.step()
+    assert services[0].model_version == old_version
+
+    second._last_state = None
+    second.heartbeat()
+    first.step()
+    assert services[0].model_version != old_version
+
+
+def test_only_watchdog_processes_coordinate(model_service, tmp_path, monkeypatch):
+    """No coordinator without the watchdog; default ids tell processes apart"""
+    monkeypatch.setenv("MODEL_ROLLOUT_MODE", "coordinated")
+    monkeypatch.setenv("MODEL_ROLLOUT_DIR", str(tmp_path / "rollout"))
+    monkeypatch.setenv("HOSTNAME", "api-1")
+    monkeypatch.setenv("MODEL_WATCHDOG_ENABLED", "false")
+    assert RolloutCoordinator.from_env(model_service) is None
+
+    monkeypatch.setenv("MODEL_WATCHDOG_ENABLED", "true")
+    coordinator = RolloutCoordinator.from_env(model_service)
+    assert coordinator.replica_id == f"api-1-{os.getpid()}"
+
+
+def test_forked_workers_start_no_coordinator(model_dir, tmp_path, monkeypatch):
+    """A worker forked from a coordinating process, watchdog off, stays out"""
+    for name, target in (("model", model_dir), ("data", REPO_ROOT / "data")):
+        (tmp_path / name).symlink_to(target)
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setenv("MODEL_ROLLOUT_MODE", "coordinated")
+    monkeypatch.setenv("MODEL_ROLLOUT_DIR", str(tmp_path / "rollout"))
+    monkeypatch.setenv("MODEL_WATCHDOG_ENABLED", "true")
+    main = importlib.import_module("main")
+    monkeypatch.setattr(main, "start_file_watcher", lambda *args, **kwargs: None)
+
+    pid = os.fork()
+    if pid == 0:
+        ok = False
+        try:
+            # What the pre-fork supervisor does in each worker before startup
+            os.environ["MODEL_WATCHDOG_ENABLED"] = "false"
+            main.start_watchdog()
+            ok = main.app.state.rollout_coordinator is None
+        finally:
+            os._exit(0 if ok else 1)
+    _, status = os.waitpid(pid, 0)
+    assert os.waitstatus_to_exitcode(status) == 0
+    assert not list((tmp_path / "rollout").glob("replicas/*.json"))
+
+    main.start_watchdog()
+    try:
+        coordinator = main.app.state.rollout_coordinator
+        assert coordinator.replica_id.endswith(f"-{os.getpid()}")
+    finally:
+        coordinator.stop()
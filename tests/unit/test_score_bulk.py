@@ -0,0 +1,98 @@
+import importlib.util
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from tests.conftest import REPO_ROOT
+
+spec = importlib.util.spec_from_file_location(
+    "score_bulk", REPO_ROOT / "tools" / "score_bulk.py"
+)
+score_bulk = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(score_bulk)
+
+
+@pytest.fixture
+def houses(model_service, tmp_path, monkeypatch):
+    """A CSV of 35 houses, three of them invalid, and the service to score it"""
+    monkeypatch.setattr(score_bulk, "_service", model_service)
+    frame = pd.read_csv(
+        REPO_ROOT / "data" / "future_unseen_examples.csv", dtype=str, nrows=35
+    )
+    frame.loc[3, "bedrooms"] = "-1"
+    frame.loc[17, "lat"] = "north"
+    frame.loc[30, "zipcode"] = None
+    path = tmp_path / "houses.csv"
+    frame.to_csv(path, index=False)
+    return path
+
+
+def test_rows_that_fail_validation_are_reported(houses, model_service, tmp_path):
+    """Bad rows get an empty prediction and their errors; the rest are scored"""
+    output = tmp_path / "scored.csv"
+    stats = score_bulk.score_file(houses, output, chunk_size=10, workers=1)
+
+    scored = pd.read_csv(output, dtype={"zipcode": str}, keep_default_na=False)
+    assert stats["rows"] == len(scored) == 35
+    errors = scored[score_bulk.ERROR_COLUMN]
+    assert errors[3] == "bedrooms: Input should be greater than or equal to 0"
+    assert errors[17] == "lat: Input should be a valid number"
+    assert errors[30].startswith("zipcode: ")
+    failed = errors != ""
+    assert list(np.flatnonzero(failed)) == [3, 17, 30]
+    assert (scored.loc[failed, score_bulk.PREDICTION_COLUMN] == "").all()
+
+    records = pd.read_csv(houses, dtype={"zipcode": str})[~failed.to_numpy()]
+    np.testing.assert_allclose(
+        scored.loc[~failed, score_bulk.PREDICTION_COLUMN].astype(float),
+        model_service.predict_records(
+            records.to_dict(orient="records"), use_cache=False
+        ),
+    )
+    assert not output.with_name("scored.csv.progress.json").exists()
+
+
+def test_resume_truncates_a_torn_chunk_and_continues(houses, tmp_path, monkeypatch):
+    """An interrupted run resumes after its last complete chunk"""
+    expected = tmp_path / "expected.csv"
+    score_bulk.score_file(houses, expected, chunk_size=10, workers=1)
+
+    output = tmp_path / "scored.csv"
+    progress_path = tmp_path / "scored.csv.progress.json"
+    score_chunk = score_bulk.score_chunk
+    calls = []
+
+    def interrupted(chunk, minimal):
+        calls.append(1)
+        if len(calls) == 3:
+            raise KeyboardInterrupt
+        return score_chunk(chunk, minimal)
+
+    monkeypatch.setattr(score_bulk, "score_chunk", interrupted)
+    with pytest.raises(KeyboardInterrupt):
+        score_bulk.score_file(houses, output, chunk_size=10, workers=1)
+    monkeypatch.setattr(score_bulk, "score_chunk", score_chunk)
+    assert progress_path.exists()
+
+    # Half of the third chunk reached the disk before the process died
+    with open(output, "ab") as f:
+        f.write(b"3,2.5,1810,4")
+    with pytest.raises(RuntimeError, match="chunk_size changed"):
+        score_bulk.score_file(houses, output, chunk_size=5, workers=1, resume=True)
+
+    stats = score_bulk.score_file(houses, output, chunk_size=10, workers=1, resume=True)
+    assert stats["rows"] == 15 and stats["total_rows"] == 35
+    assert output.read_bytes() == expected.read_bytes()
+    assert not progress_path.exists()
+
+
+def test_resume_refuses_output_without_a_sidecar(houses, tmp_path):
+    """A finished output can't be resumed, since its progress is unknown"""
+    output = tmp_path / "scored.csv"
+    score_bulk.score_file(houses, output, chunk_size=10, workers=1)
+    finished = output.read_bytes()
+
+    with pytest.raises(RuntimeError, match="rerun without --resume"):
+        score_bulk.score_file(houses, output, chunk_size=10, workers=1, resume=True)
+    assert output.read_bytes() == finished
@@ -0,0 +1,41 @@
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from routers import basic_router
+from services.model_service import ModelService
+from tests.conftest import REPO_ROOT
+
+
+def make_client(model_service):
+    """Build a test app around the health endpoints"""
+    app = FastAPI()
+    app.include_router(basic_router.router)
+    app.state.model_service = model_service
+    return TestClient(app)
+
+
+def test_model_is_warmed_up_before_it_serves(model_dir, monkeypatch):
+    """Loading replays the configured number of recorded requests"""
+    monkeypatch.setenv("MODEL_WARMUP_SAMPLES", "5")
+    service = ModelService(model_dir=str(model_dir), data_dir=str(REPO_ROOT / "data"))
+
+    assert service.is_ready()
+    assert service.warmup_status["samples"] == 5
+    assert service.warmup_status["version"] == service.model_version
+
+    service.load_model()
+    assert service.warmup_status["version"] == service.model_version
+
+
+def test_readiness_is_separate_from_liveness(model_service):
+    """A live process reports 503 on readiness until a warm model is published"""
+    client = make_client(model_service)
+    assert client.get("/health/ready").status_code == 200
+    assert client.get("/health").status_code == 200
+
+    model_service.ready.clear()
+    assert client.get("/health/live").status_code == 200
+    assert client.get("/health/ready").status_code == 503
+    response = client.get("/health")
+    assert response.status_code == 503
+    assert response.json()["status"] == "warming_up"
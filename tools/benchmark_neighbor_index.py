@@ -0,0 +1,174 @@
+#!/usr/bin/env python3
+"""
+Recall-vs-latency benchmark for the KNN neighbor indexes.
+
+This script compares every neighbor index supported by create_model.py
+against exact brute-force KNN on the same scaled training data:
+1. Loads and merges the training data exactly like create_model.py
+2. Optionally amplifies the training set with jittered copies (--scale)
+   to see how each index behaves as the sales history grows
+3. Fits each index and times single-row and batched queries
+4. Measures recall@k of the returned neighbors and the prediction
+   difference against the exact search
+5. Writes a text report to evaluation_results/neighbor_index_report.txt
+
+Usage:
+    python tools/benchmark_neighbor_index.py [--scale 10] [--queries 500]
+"""
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+from sklearn import model_selection, preprocessing
+
+ROOT_DIR = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT_DIR))
+sys.path.insert(0, str(ROOT_DIR / "src"))
+
+import create_model  # noqa: E402
+from services.neighbor_index import build_neighbors_regressor  # noqa: E402
+
+# Index configurations compared against exact brute-force search
+CONFIGURATIONS = [
+    ("brute", {}),
+    ("kd_tree", {"leaf_size": 30}),
+    ("ball_tree", {"leaf_size": 30}),
+    ("ivf", {"n_probe": 1}),
+    ("ivf", {"n_probe": 4}),
+    ("ivf", {"n_probe": 8}),
+    ("ivf", {"n_probe": 16}),
+]
+
+
+def load_scaled_data(scale: int, seed: int = 42):
+    """Load the training split, scale it and optionally amplify it"""
+    x, y = create_model.load_data(
+        create_model.SALES_PATH,
+        create_model.DEMOGRAPHICS_PATH,
+        create_model.SALES_COLUMN_SELECTION,
+    )
+    x_train, x_test, y_train, _ = model_selection.train_test_split(
+        x, y, random_state=42
+    )
+    scaler = preprocessing.RobustScaler().fit(x_train)
+    train = scaler.transform(x_train)
+    target = y_train.to_numpy(dtype=np.float64)
+
+    if scale > 1:
+        # Jittered copies keep the distribution but grow the search space
+        rng = np.random.default_rng(seed)
+        copies = [train] + [
+            train + rng.normal(0.0, 0.05, size=train.shape) for _ in range(scale - 1)
+        ]
+        train = np.vstack(copies)
+        target = np.tile(target, scale)
+
+    return train, target, scaler.transform(x_test)
+
+
+def benchmark_index(index, params, train, target, queries, exact_neighbors, exact_pred):
+    """Fit one index and measure latency, recall and prediction drift"""
+    fit_start = time.perf_counter()
+    regressor = build_neighbors_regressor(index, **params).fit(train, target)
+    fit_seconds = time.perf_counter() - fit_start
+
+    # Single-row latency, the shape of a /predict/full request
+    single_times = []
+    for query in queries[:200]:
+        start = time.perf_counter()
+        regressor.kneighbors(query[None, :], return_distance=False)
+        single_times.append((time.perf_counter() - start) * 1000)
+
+    batch_start = time.perf_counter()
+    neighbors = regressor.kneighbors(queries, return_distance=False)
+    batch_ms_per_row = (time.perf_counter() - batch_start) * 1000 / len(queries)
+
+    k = exact_neighbors.shape[1]
+    recall = np.mean(
+        [len(set(a) & set(b)) / k for a, b in zip(exact_neighbors, neighbors)]
+    )
+    predictions = target[neighbors].mean(axis=1)
+
+    return {
+        "index": index,
+        "params": params,
+        "fit_seconds": fit_seconds,
+        "single_p50_ms": float(np.percentile(single_times, 50)),
+        "single_p95_ms": float(np.percentile(single_times, 95)),
+        "batch_ms_per_row": batch_ms_per_row,
+        "recall": float(recall),
+        "prediction_mae": float(np.abs(predictions - exact_pred).mean()),
+    }
+
+
+def write_report(results, train_rows, n_queries, output_path: Path):
+    """Write the comparison table to disk and print it"""
+    report = []
+    report.append("=" * 60)
+    report.append("NEIGHBOR INDEX RECALL VS LATENCY REPORT")
+    report.append("=" * 60)
+    report.append("")
+    report.append(f"Training rows: {train_rows}")
+    report.append(f"Queries: {n_queries}")
+    report.append("Recall and prediction MAE are measured against exact brute force.")
+    report.append("")
+    report.append(
+        f"{'index':24s} {'fit s':>7s} {'p50 ms':>8s} {'p95 ms':>8s} "
+        f"{'batch ms/row':>13s} {'recall@5':>9s} {'pred MAE $':>11s}"
+    )
+    report.append("-" * 86)
+    for r in results:
+        params = ",".join(f"{k}={v}" for k, v in r["params"].items())
+        label = f"{r['index']}({params})" if params else r["index"]
+        report.append(
+            f"{label:24s} {r['fit_seconds']:7.2f} {r['single_p50_ms']:8.3f} "
+            f"{r['single_p95_ms']:8.3f} {r['batch_ms_per_row']:13.4f} "
+            f"{r['recall']:9.4f} {r['prediction_mae']:11.2f}"
+        )
+
+    output_path.parent.mkdir(exist_ok=True)
+    output_path.write_text("\n".join(report) + "\n")
+    print("\n".join(report))
+    print(f"\n✅ Report saved to {output_path}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument(
+        "--scale", type=int, default=1, help="Amplify the training set N times"
+    )
+    parser.add_argument(
+        "--queries", type=int, default=500, help="Number of test rows to query"
+    )
+    parser.add_argument(
+        "--output",
+        default="evaluation_results/neighbor_index_report.txt",
+        help="Report path",
+    )
+    args = parser.parse_args()
+
+    train, target, test = load_scaled_data(args.scale)
+    queries = np.ascontiguousarray(test[: args.queries])
+    print(f"📊 Benchmarking neighbor indexes on {len(train)} training rows...")
+
+    exact = build_neighbors_regressor("brute").fit(train, target)
+    exact_neighbors = exact.kneighbors(queries, return_distance=False)
+    exact_pred = target[exact_neighbors].mean(axis=1)
+
+    results = []
+    for index, params in CONFIGURATIONS:
+        print(f"   {index} {params}...")
+        results.append(
+            benchmark_index(
+                index, params, train, target, queries, exact_neighbors, exact_pred
+            )
+        )
+
+    write_report(results, len(train), len(queries), Path(args.output))
+
+
+if __name__ == "__main__":
+    main()
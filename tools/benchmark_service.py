@@ -0,0 +1,374 @@
+#!/usr/bin/env python3
+"""
+In-process microbenchmarks for the ModelService hot paths.
+
+This script times the service methods directly, without HTTP in the way,
+and compares them against the baseline committed to the repository:
+1. Trains a model on the same data as create_model.py, optionally
+   amplified with jittered copies (--train-scales) to grow the search space
+2. Times load_model and predict/predict_batch for every training-set size,
+   and prepare_features, prepare_features_batch, enrich_with_demographics
+   and load_demographics once
+3. Runs each benchmark in timed rounds and records the median and best
+   time per call
+4. Compares the best times with benchmarks/baseline.json (the minimum is
+   the least disturbed by other load on the machine) and exits non-zero
+   when a hot path is slower than the baseline by more than --threshold;
+   a benchmark over its limit is re-timed (--retries) before it counts
+
+A fixed NumPy/Python calibration workload is timed with every run; the
+baseline is scaled by how much faster or slower this machine runs it, so a
+baseline recorded on one machine still gates runs on another. It can't
+correct for other library versions, so the baseline is recorded in the locked
+environment (uv run) and --check refuses to compare when Python, NumPy,
+pandas or scikit-learn differ from the baseline's (--allow-version-mismatch
+overrides this).
+
+Usage:
+    python tools/benchmark_service.py [--check] [--threshold 0.5]
+    python tools/benchmark_service.py --update-baseline
+"""
+
+import argparse
+import json
+import logging
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Callable, Dict, List
+
+import numpy as np
+import pandas as pd
+import sklearn
+from sklearn import model_selection
+
+ROOT_DIR = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT_DIR))
+sys.path.insert(0, str(ROOT_DIR / "src"))
+
+import create_model  # noqa: E402
+from services.model_service import ModelService  # noqa: E402
+
+DATA_DIR = ROOT_DIR / "data"
+EXAMPLES_PATH = DATA_DIR / "future_unseen_examples.csv"
+BASELINE_PATH = ROOT_DIR / "benchmarks" / "baseline.json"
+OUTPUT_PATH = ROOT_DIR / "evaluation_results" / "service_benchmark.json"
+BATCH_SIZES = [1, 32, 256, 1024]
+TRAIN_SCALES = [1, 4]
+# Allowed slowdown over the (machine-adjusted) baseline before failing
+THRESHOLD = float(os.getenv("BENCH_THRESHOLD", "0.5"))
+# Differences below this are timer noise, whatever the relative change
+MIN_DELTA_MS = float(os.getenv("BENCH_MIN_DELTA_MS", "0.05"))
+# Times a benchmark over its limit is re-timed before it counts as regressed
+RETRIES = 2
+# Environment entries that must match the baseline's for timings to compare;
+# the calibration workload can't correct for a different library version
+PINNED_ENVIRONMENT = ("python", "numpy", "pandas", "scikit-learn")
+
+
+def environment() -> Dict:
+    """Interpreter, library versions and machine the timings come from"""
+    return {
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "pandas": pd.__version__,
+        "scikit-learn": sklearn.__version__,
+        "machine": platform.machine(),
+        "cpus": os.cpu_count(),
+    }
+
+
+def environment_mismatches(baseline: Dict, current: Dict) -> List[str]:
+    """The pinned entries where this run differs from the baseline"""
+    recorded = baseline.get("environment", {})
+    return [
+        f"{name} {recorded.get(name)} (baseline) vs {current[name]} (this run)"
+        for name in PINNED_ENVIRONMENT
+        if recorded.get(name) != current[name]
+    ]
+
+
+def calibrate(rounds: int = 15) -> float:
+    """Best milliseconds per call of a fixed NumPy and pure-Python workload"""
+    rng = np.random.default_rng(0)
+    data = rng.random(200_000)
+
+    def workload():
+        np.sort(data)
+        sum(i * i for i in range(50_000))
+
+    return time_call(workload, rounds=max(rounds, 15))["min_ms"]
+
+
+def time_call(fn: Callable, rounds: int = 7, min_round_seconds: float = 0.05) -> Dict:
+    """Median and minimum time per call over ``rounds`` timed rounds"""
+    # Warm up, then pick how many calls a round needs to be measurable
+    fn()
+    number = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(number):
+            fn()
+        if time.perf_counter() - start >= min_round_seconds or number >= 10_000:
+            break
+        number *= 2
+
+    per_call = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        for _ in range(number):
+            fn()
+        per_call.append((time.perf_counter() - start) * 1000 / number)
+    return {
+        "median_ms": statistics.median(per_call),
+        "min_ms": min(per_call),
+        "calls": number * rounds,
+    }
+
+
+def scaled_training_set(scale: int, seed: int = 42):
+    """The create_model.py training split, amplified with jittered copies"""
+    x, y = create_model.load_data(
+        create_model.SALES_PATH,
+        create_model.DEMOGRAPHICS_PATH,
+        create_model.SALES_COLUMN_SELECTION,
+    )
+    x_train, _, y_train, _ = model_selection.train_test_split(x, y, random_state=42)
+    if scale <= 1:
+        return x_train, y_train
+
+    # Jittered copies keep the distribution but grow the search space
+    rng = np.random.default_rng(seed)
+    copies = [x_train] + [
+        x_train * rng.normal(1.0, 0.02, size=x_train.shape) for _ in range(scale - 1)
+    ]
+    return pd.concat(copies, ignore_index=True), pd.concat(
+        [y_train] * scale, ignore_index=True
+    )
+
+
+def load_records(n: int) -> List[Dict]:
+    """``n`` request records, cycling through the unseen examples"""
+    examples = pd.read_csv(EXAMPLES_PATH, dtype={"zipcode": str})
+    records = examples.to_dict(orient="records")
+    return [records[i % len(records)] for i in range(n)]
+
+
+def allowed_ms(reference_ms: float, speed: float, threshold: float) -> float:
+    """Slowest acceptable time for a benchmark with the given baseline"""
+    expected = reference_ms * speed
+    return max(expected * (1 + threshold), expected + MIN_DELTA_MS)
+
+
+def run_benchmarks(
+    batch_sizes: List[int],
+    train_scales: List[int],
+    rounds: int,
+    limits: Dict[str, float] = None,
+    retries: int = RETRIES,
+):
+    """Time every hot path; returns {benchmark name: timing}"""
+    results = {}
+    limits = limits or {}
+    records = load_records(max(batch_sizes))
+
+    def measure(name: str, fn: Callable):
+        timing = time_call(fn, rounds=rounds)
+        attempts = 1
+        # Re-time a slow result before it counts, to rule out a burst of load
+        while timing["min_ms"] > limits.get(name, float("inf")) and attempts <= retries:
+            retry = time_call(fn, rounds=rounds)
+            if retry["min_ms"] < timing["min_ms"]:
+                timing = retry
+            attempts += 1
+        results[name] = {**timing, "attempts": attempts}
+
+    for scale in train_scales:
+        x_train, y_train = scaled_training_set(scale)
+        print(f"📊 Training set x{scale}: {len(x_train)} rows")
+
+        with tempfile.TemporaryDirectory() as model_dir:
+            create_model.save_model(
+                create_model.train_model(x_train, y_train),
+                list(x_train.columns),
+                Path(model_dir),
+            )
+            service = ModelService(model_dir=model_dir, data_dir=str(DATA_DIR))
+
+            measure(f"load_model/train=x{scale}", service.load_model)
+            for n in batch_sizes:
+                features_df = service.prepare_features_batch(records[:n])
+                predict = service.predict if n == 1 else service.predict_batch
+                measure(
+                    f"predict/batch={n}/train=x{scale}",
+                    lambda: predict(features_df, use_cache=False),
+                )
+
+            if scale != train_scales[0]:
+                continue
+            # Feature preparation and demographics don't depend on training size
+            record = records[0]
+            measure(
+                "enrich_with_demographics",
+                lambda: service.enrich_with_demographics(record["zipcode"]),
+            )
+            measure("prepare_features/full", lambda: service.prepare_features(record))
+            measure(
+                "prepare_features/minimal",
+                lambda: service.prepare_features(record, minimal=True),
+            )
+            for n in batch_sizes:
+                if n > 1:
+                    batch = records[:n]
+                    measure(
+                        f"prepare_features_batch/batch={n}",
+                        lambda: service.prepare_features_batch(batch),
+                    )
+            measure("load_demographics", service.load_demographics)
+    return results
+
+
+def compare(
+    results: Dict, calibration_ms: float, baseline: Dict, threshold: float
+) -> List[Dict]:
+    """One row per benchmark with its baseline, allowed time and verdict"""
+    # >1 when this machine is slower than the one that recorded the baseline
+    speed = calibration_ms / baseline["calibration_ms"]
+    rows = []
+    for name, timing in results.items():
+        reference = baseline["benchmarks"].get(name)
+        row = {"name": name, "min_ms": timing["min_ms"]}
+        if reference is None:
+            row["status"] = "new"
+        else:
+            expected = reference["min_ms"] * speed
+            limit = allowed_ms(reference["min_ms"], speed, threshold)
+            row.update(
+                baseline_ms=expected,
+                change=timing["min_ms"] / expected - 1,
+                status="regressed" if timing["min_ms"] > limit else "ok",
+            )
+        rows.append(row)
+    return rows
+
+
+def print_comparison(rows: List[Dict], speed: float, threshold: float):
+    """Table of current vs baseline timings"""
+    print("\n" + "=" * 72)
+    print("MODEL SERVICE MICROBENCHMARKS")
+    print("=" * 72)
+    print(f"Machine speed vs baseline: {speed:.2f}x time, threshold +{threshold:.0%}")
+    print(f"{'benchmark':40s} {'best ms':>10s} {'baseline':>10s} {'change':>8s}")
+    print("-" * 72)
+    for row in rows:
+        if row["status"] == "new":
+            print(f"{row['name']:40s} {row['min_ms']:10.3f} {'-':>10s} {'new':>8s}")
+            continue
+        marker = "  ❌" if row["status"] == "regressed" else ""
+        print(
+            f"{row['name']:40s} {row['min_ms']:10.3f} {row['baseline_ms']:10.3f} "
+            f"{row['change']:+8.1%}{marker}"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=BATCH_SIZES)
+    parser.add_argument("--train-scales", type=int, nargs="+", default=TRAIN_SCALES)
+    parser.add_argument("--rounds", type=int, default=15, help="timed rounds each")
+    parser.add_argument(
+        "--threshold", type=float, default=THRESHOLD, help="allowed slowdown (0.5)"
+    )
+    parser.add_argument(
+        "--retries", type=int, default=RETRIES, help="re-timings of slow results"
+    )
+    parser.add_argument(
+        "--check", action="store_true", help="exit 1 when a benchmark regressed"
+    )
+    parser.add_argument(
+        "--update-baseline", action="store_true", help="record this run as baseline"
+    )
+    parser.add_argument(
+        "--allow-version-mismatch",
+        action="store_true",
+        help="compare with --check even if library versions differ from the baseline",
+    )
+    parser.add_argument("--baseline", default=str(BASELINE_PATH))
+    parser.add_argument("--output", default=str(OUTPUT_PATH))
+    args = parser.parse_args()
+
+    # create_model.py reads its CSVs relative to the repository root
+    os.chdir(ROOT_DIR)
+    # Load and warm-up messages would drown the table
+    logging.disable(logging.INFO)
+
+    baseline_path = Path(args.baseline)
+    baseline = None
+    current_environment = environment()
+    if baseline_path.exists() and not args.update_baseline:
+        baseline = json.loads(baseline_path.read_text())
+        mismatches = environment_mismatches(baseline, current_environment)
+        if mismatches:
+            print("⚠️  This environment differs from the baseline's:")
+            for mismatch in mismatches:
+                print(f"   {mismatch}")
+            print("   Run inside the locked environment (uv run), or re-record it")
+            if args.check and not args.allow_version_mismatch:
+                sys.exit(1)
+
+    # Calibrate on both sides of the run so a burst of load skews neither
+    calibration_ms = calibrate(args.rounds)
+    limits = {}
+    if baseline is not None:
+        speed = calibration_ms / baseline["calibration_ms"]
+        limits = {
+            name: allowed_ms(reference["min_ms"], speed, args.threshold)
+            for name, reference in baseline["benchmarks"].items()
+        }
+    results = run_benchmarks(
+        args.batch_sizes, args.train_scales, args.rounds, limits, args.retries
+    )
+    calibration_ms = min(calibration_ms, calibrate(args.rounds))
+    document = {
+        "calibration_ms": calibration_ms,
+        "environment": current_environment,
+        "config": {
+            "batch_sizes": args.batch_sizes,
+            "train_scales": args.train_scales,
+            "rounds": args.rounds,
+        },
+        "benchmarks": results,
+    }
+
+    output_path = Path(args.output)
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    output_path.write_text(json.dumps(document, indent=2))
+
+    if args.update_baseline:
+        baseline_path.parent.mkdir(parents=True, exist_ok=True)
+        baseline_path.write_text(json.dumps(document, indent=2) + "\n")
+        print(f"\n✅ Baseline saved to {baseline_path}")
+        return
+    if baseline is None:
+        print(f"\n❌ No baseline at {baseline_path}; run with --update-baseline")
+        sys.exit(1 if args.check else 0)
+
+    rows = compare(results, calibration_ms, baseline, args.threshold)
+    print_comparison(rows, calibration_ms / baseline["calibration_ms"], args.threshold)
+    print(f"\n📁 Results saved to {output_path}")
+
+    regressed = [row["name"] for row in rows if row["status"] == "regressed"]
+    if regressed:
+        print(f"\n❌ {len(regressed)} hot path(s) regressed: {', '.join(regressed)}")
+        if args.check:
+            sys.exit(1)
+    else:
+        print("\n✅ No regressions against the baseline")
+
+
+if __name__ == "__main__":
+    main()
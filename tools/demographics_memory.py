@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""
+Memory report for the demographics held by every serving process.
+
+Compares the pandas DataFrame that load_demographics returns (float64
+columns plus an object-dtype zipcode column) with the DemographicsStore the
+service keeps (sorted int32 ZIP codes and one float32 or float64 matrix):
+1. Reports both representations for data/zipcode_demographics.csv
+2. Repeats the comparison for a synthetic table of --rows ZIP codes (about
+   as many as there are US ZCTAs by default), built by resampling the real
+   rows under new ZIP codes
+3. With --predictions, scores data/future_unseen_examples.csv with float32
+   and float64 demographics and reports the largest prediction difference
+
+Usage:
+    python tools/demographics_memory.py [--rows 33000] [--predictions]
+"""
+
+import argparse
+import json
+import logging
+import os
+import sys
+from pathlib import Path
+from typing import Dict
+
+import numpy as np
+import pandas as pd
+
+ROOT_DIR = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT_DIR / "src"))
+
+from services.data_cache import load_demographics  # noqa: E402
+from services.demographics_store import memory_report  # noqa: E402
+
+DATA_DIR = ROOT_DIR / "data"
+DEMOGRAPHICS_PATH = DATA_DIR / "zipcode_demographics.csv"
+# Roughly the number of ZIP Code Tabulation Areas in the US
+US_ZCTA_ROWS = 33000
+
+
+def synthetic_demographics(
+    frame: pd.DataFrame, rows: int, seed: int = 0
+) -> pd.DataFrame:
+    """rows distinct ZIP codes with demographics resampled from frame"""
+    rng = np.random.default_rng(seed)
+    synthetic = frame.iloc[rng.integers(0, len(frame), rows)].reset_index(drop=True)
+    zipcodes = rng.choice(100000, size=rows, replace=False)
+    synthetic["zipcode"] = [f"{zipcode:05d}" for zipcode in zipcodes]
+    return synthetic
+
+
+def prediction_difference(model_dir: str) -> Dict:
+    """Largest difference between float32 and float64 demographics predictions"""
+    from services.model_service import ModelService
+
+    examples = pd.read_csv(
+        DATA_DIR / "future_unseen_examples.csv", dtype={"zipcode": str}
+    ).to_dict(orient="records")
+    predictions = {}
+    for dtype in ("float32", "float64"):
+        os.environ["DEMOGRAPHICS_DTYPE"] = dtype
+        service = ModelService(model_dir=model_dir, data_dir=str(DATA_DIR))
+        predictions[dtype] = service.predict_records(examples, use_cache=False)
+
+    difference = np.abs(predictions["float32"] - predictions["float64"])
+    relative = difference / np.abs(predictions["float64"])
+    return {
+        "examples": len(examples),
+        "max_abs_difference": float(difference.max()),
+        "max_rel_difference": float(relative.max()),
+        "changed_predictions": int((difference > 0).sum()),
+    }
+
+
+def print_report(title: str, report: Dict):
+    print(f"\n{title}: {report['rows']} ZIP codes x {report['columns']} columns")
+    print(f"  DataFrame        {report['dataframe_bytes'] / 1024:10.1f} KiB")
+    for dtype in ("float64", "float32"):
+        size = report[f"store_{dtype}_bytes"]
+        ratio = report[f"store_{dtype}_ratio"]
+        print(f"  Store ({dtype})  {size / 1024:10.1f} KiB  ({ratio:.0%} of DataFrame)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--rows", type=int, default=US_ZCTA_ROWS)
+    parser.add_argument(
+        "--predictions",
+        action="store_true",
+        help="Also compare float32 and float64 predictions",
+    )
+    parser.add_argument("--model-dir", default=str(ROOT_DIR / "model"))
+    parser.add_argument("--output", help="Write the report as JSON to this file")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.WARNING)
+
+    frame = load_demographics(DEMOGRAPHICS_PATH)
+    results = {
+        "current": memory_report(frame),
+        "synthetic": memory_report(synthetic_demographics(frame, args.rows)),
+    }
+    print_report("data/zipcode_demographics.csv", results["current"])
+    print_report("Synthetic nationwide table", results["synthetic"])
+
+    if args.predictions:
+        results["predictions"] = prediction_difference(args.model_dir)
+        print("\nfloat32 vs float64 predictions:")
+        for key, value in results["predictions"].items():
+            print(f"  {key}: {value}")
+
+    if args.output:
+        Path(args.output).write_text(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
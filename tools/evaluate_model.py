@@ -18,11 +18,29 @@ The script handles the complete ML model evaluation pipeline including:
 - Generalization testing on unseen examples
 - Comprehensive visualization generation
 - Detailed evaluation report creation
+
+Performance features:
+- The merged feature matrix comes from the shared data cache
+  (services.data_cache), rebuilt only when an input CSV changes
+- Cross-validation runs its folds in parallel (--n-jobs) with a single
+  cross_val_predict; every CV metric is computed from those predictions
+- Cross-validation, test set evaluation, feature importance and the
+  generalization test run concurrently; test predictions are computed once
+  and reused by the visualizations
+
+Usage:
+    python tools/evaluate_model.py [--n-jobs 4] [--no-cache]
 """
 
+import argparse
+import io
 import json
+import os
 import pickle
+import sys
+import threading
 import warnings
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 
 import matplotlib.pyplot as plt
@@ -30,7 +48,16 @@ import numpy as np
 import pandas as pd
 import seaborn as sns
 from sklearn.metrics import mean_squared_error, mean_absolute_error, r2_score
-from sklearn.model_selection import cross_val_score, train_test_split
+from sklearn.model_selection import KFold, cross_val_predict, train_test_split
+
+ROOT_DIR = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT_DIR / "src"))
+
+from services.data_cache import (  # noqa: E402
+    SALES_COLUMNS,
+    load_demographics,
+    load_training_data,
+)
 
 # Suppress warnings for cleaner output during evaluation
 warnings.filterwarnings("ignore")
@@ -39,6 +66,37 @@ warnings.filterwarnings("ignore")
 plt.style.use("default")  # Use default matplotlib style for clean plots
 sns.set_palette("husl")  # Use husl color palette for better color distinction
 
+# Input data; the sales columns used as features are data_cache.SALES_COLUMNS
+SALES_PATH = Path("data/kc_house_data.csv")
+DEMOGRAPHICS_PATH = Path("data/zipcode_demographics.csv")
+CV_FOLDS = 5
+
+
+class ThreadOutput(io.TextIOBase):
+    """
+    sys.stdout replacement that keeps each worker thread's output apart.
+
+    Analyses running concurrently would otherwise interleave their progress
+    lines; each thread that calls capture() writes to its own buffer, which
+    the caller prints once the analysis has finished.
+    """
+
+    def __init__(self, stream):
+        self.stream = stream
+        self.local = threading.local()
+
+    def capture(self) -> io.StringIO:
+        """Send this thread's output to a fresh buffer"""
+        self.local.buffer = io.StringIO()
+        return self.local.buffer
+
+    def write(self, text):
+        buffer = getattr(self.local, "buffer", None)
+        return (buffer or self.stream).write(text)
+
+    def flush(self):
+        self.stream.flush()
+
 
 class ModelEvaluator:
     """
@@ -53,8 +111,12 @@ class ModelEvaluator:
     - Detailed reporting
     """
 
-    def __init__(self):
+    def __init__(self, n_jobs: int = -1, use_cache: bool = True):
         """Initialize the evaluator with empty state variables"""
+        # Parallelism for the CV folds (-1 = all cores) and the data cache
+        self.n_jobs = n_jobs
+        self.use_cache = use_cache
+
         # Core model and feature information
         self.model = None  # Trained ML model (pickle-loaded)
         self.features = None  # List of feature names in correct order
@@ -69,6 +131,10 @@ class ModelEvaluator:
         self.X_full = None  # Complete feature matrix
         self.y_full = None  # Complete target vector
 
+        # Predictions computed once and shared by metrics and plots
+        self.cv_predictions = None  # Out-of-fold predictions for X_train
+        self.test_predictions = None  # Predictions for X_test
+
         # Storage for evaluation results
         self.results = {}  # Dictionary to store all evaluation metrics
 
@@ -129,41 +195,14 @@ class ModelEvaluator:
         5. Ensures ZIP codes are handled as strings to prevent type mismatches
 
         The resulting dataset combines structural house features with neighborhood
-        demographic characteristics for comprehensive model evaluation.
+        demographic characteristics for comprehensive model evaluation. The merged
+        table is shared with create_model.py and rebuilt only when a CSV changes.
         """
         try:
-            # Load house sales data with essential features only
-            # Note: We only load the features that are available in the unseen examples
-            sales_data = pd.read_csv(
-                "data/kc_house_data.csv",
-                usecols=[
-                    "price",
-                    "bedrooms",
-                    "bathrooms",
-                    "sqft_living",
-                    "sqft_lot",
-                    "floors",
-                    "sqft_above",
-                    "sqft_basement",
-                    "zipcode",
-                ],
-                dtype={"zipcode": str},
-            )  # Critical: ensure ZIP codes are strings
-
-            # Load ZIP code demographics data (income, education, housing characteristics)
-            demographics = pd.read_csv(
-                "data/zipcode_demographics.csv", dtype={"zipcode": str}
-            )
-
-            # Merge house data with demographics on ZIP code
-            # 'left' join ensures we keep all house sales even if demographics missing
-            merged_data = sales_data.merge(demographics, how="left", on="zipcode").drop(
-                columns="zipcode"
-            )
-
             # Separate target variable (price) from features
-            self.y_full = merged_data.pop("price")  # Extract price column
-            self.X_full = merged_data  # Remaining columns become features
+            self.X_full, self.y_full = load_training_data(
+                SALES_PATH, DEMOGRAPHICS_PATH, SALES_COLUMNS, use_cache=self.use_cache
+            )
 
             # Split data into training (80%) and test (20%) sets with fixed random seed
             # This ensures reproducible results across different runs
@@ -186,29 +225,36 @@ class ModelEvaluator:
 
         This method uses 5-fold cross-validation to:
         1. Split training data into 5 equal parts
-        2. Train model on 4 parts, validate on 1 part (5 times total)
-        3. Calculate RMSE for each fold
+        2. Train model on 4 parts, validate on 1 part (5 times total, in parallel)
+        3. Calculate RMSE for each fold from the out-of-fold predictions
         4. Compute mean and standard deviation of RMSE scores
 
         Cross-validation helps identify if the model is stable across different
         data subsets and provides a more robust estimate of model performance.
+        The out-of-fold predictions are kept, so further CV metrics need no refit.
         """
         print("\n🔄 Performing cross-validation...")
 
         try:
-            # Perform 5-fold cross-validation using negative mean squared error
-            # sklearn returns negative MSE, so we convert to positive RMSE
-            cv_scores = cross_val_score(
+            # Fit the 5 folds once, in parallel, and keep every out-of-fold
+            # prediction; the same unshuffled KFold that cv=5 uses for regressors
+            folds = KFold(n_splits=CV_FOLDS)
+            self.cv_predictions = cross_val_predict(
                 self.model,
                 self.X_train,
                 self.y_train,
-                cv=5,
-                scoring="neg_mean_squared_error",
+                cv=folds,
+                n_jobs=self.n_jobs,
             )
 
-            # Convert negative MSE scores to positive RMSE values
-            # RMSE = sqrt(MSE) and provides interpretable dollar amounts
-            rmse_scores = np.sqrt(-cv_scores)
+            # RMSE = sqrt(MSE) per fold and provides interpretable dollar amounts
+            y_train = self.y_train.to_numpy()
+            rmse_scores = np.array(
+                [
+                    np.sqrt(mean_squared_error(y_train[test], self.cv_predictions[test]))
+                    for _, test in folds.split(self.X_train)
+                ]
+            )
 
             # Store cross-validation results for later analysis and reporting
             self.results["cv_rmse_mean"] = (
@@ -220,11 +266,16 @@ class ModelEvaluator:
             self.results["cv_rmse_scores"] = (
                 rmse_scores.tolist()
             )  # Individual fold scores
+            # Pooled out-of-fold metrics, from the same predictions
+            self.results["cv_mae"] = mean_absolute_error(y_train, self.cv_predictions)
+            self.results["cv_r2"] = r2_score(y_train, self.cv_predictions)
 
             print("✅ Cross-validation completed")
             print(f"   Mean RMSE: ${rmse_scores.mean():,.2f}")
             print(f"   Std RMSE: ${rmse_scores.std():,.2f}")
             print(f"   CV scores: {rmse_scores.tolist()}")
+            print(f"   Out-of-fold MAE: ${self.results['cv_mae']:,.2f}")
+            print(f"   Out-of-fold R²: {self.results['cv_r2']:.4f}")
 
         except Exception as e:
             print(f"❌ Error in cross-validation: {e}")
@@ -246,7 +297,8 @@ class ModelEvaluator:
 
         try:
             # Generate predictions on the test set using the trained model
-            y_pred = self.model.predict(self.X_test)
+            # (kept for the visualizations, which plot the same predictions)
+            y_pred = self.test_predictions = self.model.predict(self.X_test)
 
             # Calculate comprehensive performance metrics
             mse = mean_squared_error(self.y_test, y_pred)  # Mean Squared Error
@@ -346,8 +398,8 @@ class ModelEvaluator:
             )
 
             # Load demographics data for ZIP code enrichment
-            demographics = pd.read_csv(
-                "data/zipcode_demographics.csv", dtype={"zipcode": str}
+            demographics = load_demographics(
+                DEMOGRAPHICS_PATH, use_cache=self.use_cache
             )
             print(f"   Demographics data loaded: {len(demographics)} ZIP codes")
             print(
@@ -507,8 +559,8 @@ class ModelEvaluator:
             # 3. Test set predictions vs actual values (scatter plot)
             if "test_metrics" in self.results:
                 plt.subplot(2, 2, 3)
-                # Generate predictions on test set for comparison
-                y_pred = self.model.predict(self.X_test)
+                # Reuse the test set predictions from the test set evaluation
+                y_pred = self.test_predictions
 
                 # Create scatter plot of predicted vs actual prices
                 plt.scatter(self.y_test, y_pred, alpha=0.6, s=20)
@@ -593,6 +645,8 @@ class ModelEvaluator:
                 report.append("-" * 30)
                 report.append(f"Mean RMSE: ${self.results['cv_rmse_mean']:,.2f}")
                 report.append(f"Std RMSE: ${self.results['cv_rmse_std']:,.2f}")
+                report.append(f"Out-of-fold MAE: ${self.results['cv_mae']:,.2f}")
+                report.append(f"Out-of-fold R²: {self.results['cv_r2']:.4f}")
                 report.append(
                     f"CV Scores: {[f'${score:,.0f}' for score in self.results['cv_rmse_scores']]}"
                 )
@@ -677,8 +731,8 @@ class ModelEvaluator:
         Execute the complete model evaluation pipeline.
 
         This method orchestrates the entire evaluation process by calling
-        each evaluation step in sequence. It provides a single entry point
-        for comprehensive model assessment.
+        each evaluation step. It provides a single entry point for
+        comprehensive model assessment.
 
         The pipeline includes:
         1. Model and data loading
@@ -689,6 +743,10 @@ class ModelEvaluator:
         6. Visualization generation
         7. Comprehensive report creation
 
+        Steps 2-5 are independent of each other and run concurrently; their
+        output is printed in the order above once each one finishes. Plotting
+        and the report need all of their results and run afterwards.
+
         All results are automatically saved to the evaluation_results/ directory.
         """
         print("🚀 Starting comprehensive model evaluation...")
@@ -698,17 +756,43 @@ class ModelEvaluator:
         if not self.load_model_and_data():
             return
 
-        # Step 2: Run all evaluation components in sequence
-        self.evaluate_cross_validation()  # Assess model stability
-        self.evaluate_test_set_performance()  # Evaluate on held-out test set
-        self.analyze_feature_importance()  # Identify key predictive features
-        self.test_generalization_on_unseen_data()  # Test real-world readiness
+        # Step 2: Run the independent evaluation components concurrently
+        analyses = [
+            self.evaluate_cross_validation,  # Assess model stability
+            self.evaluate_test_set_performance,  # Evaluate on held-out test set
+            self.analyze_feature_importance,  # Identify key predictive features
+            self.test_generalization_on_unseen_data,  # Test real-world readiness
+        ]
+        self._run_concurrently(analyses)
+
         self.generate_visualizations()  # Create performance plots
         self.generate_report()  # Generate detailed report
 
         print("\n🎉 Model evaluation completed successfully!")
         print("📁 Results saved to 'evaluation_results/' directory")
 
+    @staticmethod
+    def _run_concurrently(analyses):
+        """Run analyses on a thread pool, printing each one's output in order"""
+        # The CV folds run in their own processes (n_jobs), and NumPy/sklearn
+        # release the GIL for the heavy lifting in the other analyses
+        stdout = sys.stdout
+        output = ThreadOutput(stdout)
+
+        def run(analysis):
+            buffer = output.capture()
+            analysis()
+            return buffer.getvalue()
+
+        sys.stdout = output
+        try:
+            with ThreadPoolExecutor(max_workers=len(analyses)) as pool:
+                futures = [pool.submit(run, analysis) for analysis in analyses]
+                for future in futures:
+                    stdout.write(future.result())
+        finally:
+            sys.stdout = stdout
+
 
 def main():
     """
@@ -719,9 +803,21 @@ def main():
     from the command line.
 
     Usage:
-        python tools/evaluate_model.py
+        python tools/evaluate_model.py [--n-jobs 4] [--no-cache]
     """
-    evaluator = ModelEvaluator()
+    parser = argparse.ArgumentParser(description="Evaluate the trained model")
+    parser.add_argument(
+        "--n-jobs",
+        type=int,
+        default=int(os.getenv("EVAL_N_JOBS", "-1")),
+        help="parallel cross-validation folds (-1 = all cores)",
+    )
+    parser.add_argument(
+        "--no-cache", action="store_true", help="always re-read the input CSVs"
+    )
+    args = parser.parse_args()
+
+    evaluator = ModelEvaluator(n_jobs=args.n_jobs, use_cache=not args.no_cache)
     evaluator.run_full_evaluation()
 
 
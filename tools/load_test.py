@@ -0,0 +1,398 @@
+#!/usr/bin/env python3
+"""
+Load test and tail-latency benchmark for the prediction API.
+
+This script replays house records against the running API with an async
+HTTP client and measures throughput and latency:
+1. Loads data/future_unseen_examples.csv, optionally amplified with
+   jittered copies (--amplify) so the prediction cache can't serve every
+   request
+2. Runs --concurrency clients against /predict/full, /predict/minimal
+   and /predict/batch (or a mix) for --duration seconds
+3. Optionally triggers a model reload part-way through (--reload-at) and
+   compares latency before, during and after the hot swap. With
+   --reload-via file it rewrites model.pkl with an equivalent model under a
+   new content hash (and restores the original afterwards); with
+   --reload-via api it forces a reload through POST /reload-model
+4. Reports requests/sec, p50/p95/p99/p99.9 latency and error rates per
+   endpoint, and writes everything as JSON for comparing runs
+
+Usage:
+    python tools/load_test.py [--endpoint mix] [--concurrency 32] [--duration 30]
+    python tools/load_test.py --reload-at 10 --reload-via file
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import pickle
+import sys
+import time
+from pathlib import Path
+from typing import Dict, List
+
+import httpx
+import numpy as np
+import pandas as pd
+
+ROOT_DIR = Path(__file__).resolve().parents[1]
+# Unpickling the model needs the service's estimator classes
+sys.path.insert(0, str(ROOT_DIR / "src"))
+
+EXAMPLES_PATH = ROOT_DIR / "data" / "future_unseen_examples.csv"
+MODEL_PATH = ROOT_DIR / "model" / "model.pkl"
+OUTPUT_PATH = ROOT_DIR / "evaluation_results" / "load_test_results.json"
+ENDPOINTS = ("full", "minimal", "batch")
+# Fields of the minimal endpoint's request schema
+MINIMAL_FIELDS = [
+    "bedrooms",
+    "bathrooms",
+    "sqft_living",
+    "sqft_lot",
+    "floors",
+    "sqft_above",
+    "sqft_basement",
+    "zipcode",
+]
+# Area columns jittered when amplifying the examples
+JITTER_FIELDS = ["sqft_living", "sqft_lot", "sqft_above", "sqft_basement"]
+PERCENTILES = {"p50": 50, "p95": 95, "p99": 99, "p999": 99.9}
+
+
+def load_records(amplify: int = 1, seed: int = 42) -> List[Dict]:
+    """House records from the unseen examples, plus jittered copies"""
+    examples = pd.read_csv(EXAMPLES_PATH, dtype={"zipcode": str})
+    frames = [examples]
+    rng = np.random.default_rng(seed)
+    for _ in range(amplify - 1):
+        copy = examples.copy()
+        for field in JITTER_FIELDS:
+            factor = rng.normal(1.0, 0.05, size=len(copy)).clip(0.5, 1.5)
+            copy[field] = (copy[field] * factor).round().astype(int)
+        frames.append(copy)
+    return pd.concat(frames, ignore_index=True).to_dict(orient="records")
+
+
+def build_requests(records: List[Dict], endpoint: str, batch_size: int) -> List[tuple]:
+    """(endpoint, path, body, rows) tuples cycled through by the clients"""
+    endpoints = ENDPOINTS if endpoint == "mix" else (endpoint,)
+    requests = []
+    for name in endpoints:
+        if name == "full":
+            requests.extend(("full", "/predict/full", r, 1) for r in records)
+        elif name == "minimal":
+            minimal = [{f: r[f] for f in MINIMAL_FIELDS} for r in records]
+            requests.extend(("minimal", "/predict/minimal", r, 1) for r in minimal)
+        else:
+            for start in range(0, len(records), batch_size):
+                chunk = records[start : start + batch_size]
+                body = {"mode": "full", "records": chunk}
+                requests.append(("batch", "/predict/batch", body, len(chunk)))
+    # Interleave endpoints so a mixed run doesn't hit them in phases
+    order = np.random.default_rng(0).permutation(len(requests))
+    return [requests[i] for i in order]
+
+
+def latency_summary(latencies_ms: np.ndarray) -> Dict:
+    """Percentiles, mean and max of a set of latencies in milliseconds"""
+    if len(latencies_ms) == 0:
+        return {name: None for name in [*PERCENTILES, "mean", "max"]}
+    summary = {
+        name: float(np.percentile(latencies_ms, q)) for name, q in PERCENTILES.items()
+    }
+    summary["mean"] = float(latencies_ms.mean())
+    summary["max"] = float(latencies_ms.max())
+    return summary
+
+
+def summarize(samples: List[Dict], elapsed: float) -> Dict:
+    """Throughput, error rate and latency for a list of request samples"""
+    latencies = np.array([s["latency_ms"] for s in samples if s["ok"]])
+    errors = {}
+    for sample in samples:
+        if not sample["ok"]:
+            key = str(sample["status"] or sample["error"])
+            errors[key] = errors.get(key, 0) + 1
+    total = len(samples)
+    rows = sum(s["rows"] for s in samples if s["ok"])
+    return {
+        "requests": total,
+        "rows": rows,
+        "errors": errors,
+        "error_rate": (total - len(latencies)) / total if total else 0.0,
+        "rps": total / elapsed if elapsed else 0.0,
+        "rows_per_second": rows / elapsed if elapsed else 0.0,
+        "latency_ms": latency_summary(latencies),
+    }
+
+
+def replace_file(path: Path, content: bytes):
+    """Rename new content into place so a watcher never sees a partial file"""
+    temp_path = path.with_name(path.name + ".tmp")
+    temp_path.write_bytes(content)
+    os.replace(temp_path, path)
+
+
+def rewrite_model(model_path: Path):
+    """
+    Replace model.pkl with an equivalent model under a new content hash.
+
+    The service skips reloads whose content hash is unchanged, so bumping the
+    mtime alone no longer swaps the model. The pipeline is re-pickled with a
+    fresh ``reload_nonce_`` attribute: predictions stay the same, but the
+    bytes, and so the model version, change.
+    """
+    with open(model_path, "rb") as f:
+        model = pickle.load(f)
+    model.reload_nonce_ = time.time_ns()
+    replace_file(model_path, pickle.dumps(model))
+
+
+async def trigger_reload(client: httpx.AsyncClient, via: str, model_path: Path) -> Dict:
+    """Write new model content for the watchdog, or force a reload via the API"""
+    started = time.perf_counter()
+    result = {"via": via}
+    if via == "api":
+        # The files are unchanged, so an unforced reload would be skipped
+        response = await client.post(
+            "/reload-model", params={"force": "true"}, timeout=60
+        )
+        result["status"] = response.status_code
+        result["version"] = response.json().get("version")
+    else:
+        await asyncio.to_thread(rewrite_model, model_path)
+    result["duration_ms"] = (time.perf_counter() - started) * 1000
+    return result
+
+
+async def run_load_test(
+    client: httpx.AsyncClient,
+    requests: List[tuple],
+    concurrency: int,
+    duration: float,
+    use_cache: bool = True,
+    reload_at: float = None,
+    reload_via: str = "file",
+    model_path: Path = MODEL_PATH,
+) -> Dict:
+    """Drive the API with ``concurrency`` clients and collect every request"""
+    samples = []
+    position = 0
+    params = {} if use_cache else {"use_cache": "false"}
+    start = time.perf_counter()
+    deadline = start + duration
+    reload_info = {}
+
+    def next_request():
+        nonlocal position
+        request = requests[position % len(requests)]
+        position += 1
+        return request
+
+    async def worker():
+        while time.perf_counter() < deadline:
+            endpoint, path, body, rows = next_request()
+            sent = time.perf_counter()
+            sample = {"endpoint": endpoint, "rows": rows, "status": None, "error": None}
+            try:
+                response = await client.post(path, json=body, params=params)
+                sample["status"] = response.status_code
+                sample["ok"] = response.status_code == 200
+            except httpx.HTTPError as e:
+                sample["error"] = type(e).__name__
+                sample["ok"] = False
+            done = time.perf_counter()
+            sample["offset_s"] = sent - start
+            sample["latency_ms"] = (done - sent) * 1000
+            samples.append(sample)
+
+    async def reloader():
+        await asyncio.sleep(reload_at)
+        reload_info["offset_s"] = time.perf_counter() - start
+        reload_info.update(await trigger_reload(client, reload_via, model_path))
+
+    original_model = None
+    if reload_at is not None and reload_via == "file":
+        original_model = model_path.read_bytes()
+    tasks = [asyncio.create_task(worker()) for _ in range(concurrency)]
+    if reload_at is not None:
+        tasks.append(asyncio.create_task(reloader()))
+    try:
+        await asyncio.gather(*tasks)
+    finally:
+        if original_model is not None:
+            # Put the real model back (the service reloads it once more)
+            replace_file(model_path, original_model)
+    elapsed = time.perf_counter() - start
+
+    return {
+        "elapsed_s": elapsed,
+        "samples": samples,
+        "reload": reload_info or None,
+    }
+
+
+def analyze(run: Dict, reload_window: float) -> Dict:
+    """Overall, per-endpoint, per-second and reload-window statistics"""
+    samples, elapsed = run["samples"], run["elapsed_s"]
+    results = {
+        "overall": summarize(samples, elapsed),
+        "endpoints": {},
+        "timeline": [],
+    }
+    for endpoint in ENDPOINTS:
+        endpoint_samples = [s for s in samples if s["endpoint"] == endpoint]
+        if endpoint_samples:
+            results["endpoints"][endpoint] = summarize(endpoint_samples, elapsed)
+
+    # Per-second throughput and p99, to spot stalls over the run
+    for second in range(int(np.ceil(elapsed))):
+        window = [s for s in samples if second <= s["offset_s"] < second + 1]
+        latencies = np.array([s["latency_ms"] for s in window if s["ok"]])
+        results["timeline"].append(
+            {
+                "second": second,
+                "requests": len(window),
+                "errors": sum(not s["ok"] for s in window),
+                "p99_ms": float(np.percentile(latencies, 99))
+                if len(latencies)
+                else None,
+            }
+        )
+
+    reload_info = run["reload"]
+    if reload_info:
+        at = reload_info["offset_s"]
+        phases = {
+            "before": [s for s in samples if s["offset_s"] < at],
+            "during": [s for s in samples if at <= s["offset_s"] < at + reload_window],
+            "after": [s for s in samples if s["offset_s"] >= at + reload_window],
+        }
+        spans = {
+            "before": at,
+            "during": min(reload_window, elapsed - at),
+            "after": max(0.0, elapsed - at - reload_window),
+        }
+        results["reload"] = {
+            **reload_info,
+            "window_s": reload_window,
+            **{
+                phase: summarize(phase_samples, spans[phase])
+                for phase, phase_samples in phases.items()
+            },
+        }
+    return results
+
+
+def print_summary(results: Dict):
+    """Human-readable table of the results"""
+
+    def line(name, stats):
+        latency = stats["latency_ms"]
+        if latency["p50"] is None:
+            return f"   {name:<10} {stats['requests']:>8} requests, no successes"
+        return (
+            f"   {name:<10} {stats['rps']:>8.1f} rps  "
+            f"p50 {latency['p50']:>7.2f}  p95 {latency['p95']:>7.2f}  "
+            f"p99 {latency['p99']:>7.2f}  p99.9 {latency['p999']:>7.2f} ms  "
+            f"errors {stats['error_rate']:.2%}"
+        )
+
+    print("\n" + "=" * 60)
+    print("LOAD TEST RESULTS")
+    print("=" * 60)
+    print(line("overall", results["overall"]))
+    for endpoint, stats in results["endpoints"].items():
+        print(line(endpoint, stats))
+    if "reload" in results:
+        reload_info = results["reload"]
+        print(
+            f"\n🔄 Reload via {reload_info['via']} at {reload_info['offset_s']:.1f}s "
+            f"({reload_info['duration_ms']:.0f}ms to trigger)"
+        )
+        for phase in ("before", "during", "after"):
+            print(line(phase, reload_info[phase]))
+
+
+async def main_async(args) -> Dict:
+    records = load_records(args.amplify)
+    requests = build_requests(records, args.endpoint, args.batch_size)
+    limits = httpx.Limits(
+        max_connections=args.concurrency, max_keepalive_connections=args.concurrency
+    )
+    async with httpx.AsyncClient(
+        base_url=args.url, limits=limits, timeout=args.timeout
+    ) as client:
+        health = await client.get("/health")
+        if health.status_code != 200:
+            raise RuntimeError(f"API not ready: /health returned {health.status_code}")
+
+        print(
+            f"🚀 {args.concurrency} clients for {args.duration}s against "
+            f"{args.url} ({args.endpoint}, {len(requests)} distinct requests)"
+        )
+        return await run_load_test(
+            client,
+            requests,
+            concurrency=args.concurrency,
+            duration=args.duration,
+            use_cache=not args.no_cache,
+            reload_at=args.reload_at,
+            reload_via=args.reload_via,
+            model_path=Path(args.model_path),
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--url", default="http://localhost:8000")
+    parser.add_argument("--endpoint", choices=[*ENDPOINTS, "mix"], default="full")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--duration", type=float, default=30.0, help="seconds")
+    parser.add_argument(
+        "--amplify", type=int, default=1, help="jittered copies of the examples"
+    )
+    parser.add_argument("--batch-size", type=int, default=100, help="batch records")
+    parser.add_argument("--no-cache", action="store_true", help="send use_cache=false")
+    parser.add_argument("--timeout", type=float, default=30.0, help="per request")
+    parser.add_argument("--reload-at", type=float, help="seconds into the run")
+    parser.add_argument(
+        "--reload-via",
+        choices=["file", "api"],
+        default="file",
+        help="file: write an equivalent model for the watchdog to notice; "
+        "api: force a reload with POST /reload-model?force=true",
+    )
+    parser.add_argument(
+        "--reload-window", type=float, default=5.0, help="seconds counted as 'during'"
+    )
+    parser.add_argument("--model-path", default=str(MODEL_PATH))
+    parser.add_argument("--output", default=str(OUTPUT_PATH))
+    args = parser.parse_args()
+
+    started_at = pd.Timestamp.now().isoformat()
+    try:
+        run = asyncio.run(main_async(args))
+    except (httpx.HTTPError, RuntimeError) as e:
+        print(f"❌ {e}")
+        sys.exit(1)
+
+    results = analyze(run, args.reload_window)
+    print_summary(results)
+
+    output_path = Path(args.output)
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    config = {k: v for k, v in vars(args).items() if k != "output"}
+    document = {
+        "config": config,
+        "started_at": started_at,
+        "elapsed_s": run["elapsed_s"],
+        **results,
+    }
+    output_path.write_text(json.dumps(document, indent=2))
+    print(f"\n✅ Results saved to {output_path}")
+
+
+if __name__ == "__main__":
+    main()
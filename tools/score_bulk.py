@@ -0,0 +1,309 @@
+#!/usr/bin/env python3
+"""
+Offline bulk scoring of large CSV or Parquet files.
+
+This script scores files shaped like data/future_unseen_examples.csv without
+going through the HTTP API:
+1. Streams the input in fixed-size chunks (--chunk-size), so memory stays
+   flat however large the file is
+2. Enriches each chunk with one vectorized gather on zipcode and prepares
+   its features with ModelService.prepare_features_frame
+3. Scores the chunks in parallel across --workers forked processes, which
+   share the model loaded once in the parent
+4. Validates every row against the API's request schema; rows that are
+   missing, unparsable or out of range get an empty prediction and their
+   errors in the prediction_errors column instead of aborting the run
+5. Appends each scored chunk to the output CSV in input order and records
+   the progress in a sidecar file (<output>.progress.json)
+6. Resumes from the sidecar after an interruption (--resume), discarding
+   any partially written chunk. The sidecar is removed once a run
+   completes, so there is nothing to resume after that
+
+Parquet input needs pyarrow (pip install pyarrow).
+
+Usage:
+    python tools/score_bulk.py input.csv predictions.csv [--workers 8]
+    python tools/score_bulk.py roll.parquet predictions.csv --minimal --resume
+"""
+
+import argparse
+import json
+import logging
+import multiprocessing
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Dict, Iterator, List
+
+import numpy as np
+import pandas as pd
+
+ROOT_DIR = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT_DIR / "src"))
+
+from models.columnar import validate_columns  # noqa: E402
+from models.requests import FullFeatureRequest, MinimalFeatureRequest  # noqa: E402
+from services.model_service import ModelService  # noqa: E402
+
+PREDICTION_COLUMN = "predicted_price"
+ERROR_COLUMN = "prediction_errors"
+
+# Set in the parent before forking so every worker inherits the loaded model
+_service: ModelService = None
+
+
+def read_chunks(path: Path, chunk_size: int, skip_rows: int = 0) -> Iterator:
+    """DataFrames of up to chunk_size rows, starting after skip_rows rows"""
+    if path.suffix.lower() in (".parquet", ".pq"):
+        try:
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise RuntimeError("Parquet input requires pyarrow (pip install pyarrow)")
+
+        skipped = 0
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=chunk_size):
+            if skipped < skip_rows:
+                # Resumes always restart on a chunk boundary
+                skipped += batch.num_rows
+                continue
+            chunk = batch.to_pandas()
+            chunk["zipcode"] = chunk["zipcode"].astype(str)
+            yield chunk
+        return
+
+    yield from pd.read_csv(
+        path,
+        dtype={"zipcode": str},
+        chunksize=chunk_size,
+        skiprows=range(1, skip_rows + 1),
+    )
+
+
+def parse_fields(chunk: pd.DataFrame, schema) -> tuple:
+    """
+    The schema's columns with numbers parsed, and the cells that didn't parse.
+
+    Unparsable numbers become NaN, so validate_columns rejects their rows
+    instead of the whole chunk failing on an object-dtype column.
+    """
+    fields = pd.DataFrame(index=chunk.index)
+    errors = {}
+    for name, field in schema.model_fields.items():
+        if name not in chunk:
+            # validate_columns reports the missing column for the whole file
+            continue
+        column = chunk[name]
+        if field.annotation is str:
+            fields[name] = column.fillna("").astype(str)
+            continue
+        parsed = pd.to_numeric(column, errors="coerce")
+        unparsable = parsed.isna().to_numpy() & column.notna().to_numpy()
+        for i in np.flatnonzero(unparsable):
+            errors.setdefault(int(i), []).append(
+                {
+                    "type": "float_parsing",
+                    "loc": [name],
+                    "msg": "Input should be a valid number",
+                }
+            )
+        fields[name] = parsed.astype(np.float64)
+    return fields, errors
+
+
+def format_errors(errors: List[Dict]) -> str:
+    """One output cell for a row's validation errors"""
+    return "; ".join(f"{error['loc'][0]}: {error['msg']}" for error in errors)
+
+
+def score_chunk(chunk: pd.DataFrame, minimal: bool) -> pd.DataFrame:
+    """The chunk with prediction and error columns appended"""
+    bundle = _service.bundle
+    schema = MinimalFeatureRequest if minimal else FullFeatureRequest
+    fields, errors = parse_fields(chunk, schema)
+    valid, invalid = validate_columns(fields, schema)
+    for i, row_errors in invalid.items():
+        # An unparsable cell is already reported; skip its NaN follow-up
+        parsed = {error["loc"][0] for error in errors.get(i, [])}
+        errors.setdefault(i, []).extend(
+            error for error in row_errors if error["loc"][0] not in parsed
+        )
+    valid[list(errors)] = False
+
+    predictions = np.full(len(chunk), np.nan)
+    if valid.any():
+        features = _service.prepare_features_frame(
+            fields.loc[valid], minimal, bundle=bundle
+        )
+        predictions[valid] = _service.predict_batch(
+            features, use_cache=False, bundle=bundle
+        )
+    chunk[PREDICTION_COLUMN] = predictions
+    chunk[ERROR_COLUMN] = [
+        format_errors(errors[i]) if i in errors else "" for i in range(len(chunk))
+    ]
+    return chunk
+
+
+def input_identity(path: Path) -> Dict:
+    """Size and mtime of the input, to refuse resuming against another file"""
+    stat = path.stat()
+    return {"input": str(path.resolve()), "size": stat.st_size, "mtime": stat.st_mtime}
+
+
+def load_progress(progress_path: Path, expected: Dict) -> Dict:
+    """Progress of an interrupted run on the same input and settings"""
+    progress = json.loads(progress_path.read_text())
+    for key, value in expected.items():
+        if progress.get(key) != value:
+            raise RuntimeError(
+                f"Cannot resume: {key} changed since the interrupted run "
+                f"({progress.get(key)!r} -> {value!r})"
+            )
+    return progress
+
+
+def save_progress(progress_path: Path, progress: Dict):
+    """Replace the sidecar atomically so it never holds a torn write"""
+    temp_path = progress_path.with_suffix(".tmp")
+    temp_path.write_text(json.dumps(progress, indent=2))
+    os.replace(temp_path, progress_path)
+
+
+def score_file(
+    input_path: Path,
+    output_path: Path,
+    chunk_size: int,
+    workers: int,
+    minimal: bool = False,
+    resume: bool = False,
+) -> Dict:
+    """Score input_path into output_path; returns the run's statistics"""
+    progress_path = output_path.with_name(output_path.name + ".progress.json")
+    settings = {**input_identity(input_path), "chunk_size": chunk_size}
+    settings["minimal"] = minimal
+    progress = {**settings, "rows_done": 0, "chunks_done": 0, "output_bytes": 0}
+
+    if resume and progress_path.exists():
+        progress = load_progress(progress_path, settings)
+        if not output_path.exists():
+            raise RuntimeError(f"Cannot resume: {output_path} no longer exists")
+        # Drop whatever was written after the last completed chunk
+        with open(output_path, "r+b") as f:
+            f.truncate(progress["output_bytes"])
+        print(
+            f"⏩ Resuming after {progress['rows_done']} rows "
+            f"({progress['chunks_done']} chunks)"
+        )
+    elif resume and output_path.exists():
+        # Without a sidecar there's no telling how much of the output is done
+        raise RuntimeError(
+            f"Cannot resume: {progress_path} not found, so {output_path} is "
+            f"from a completed or unknown run; rerun without --resume"
+        )
+    elif output_path.exists():
+        output_path.unlink()
+
+    chunks = read_chunks(input_path, chunk_size, progress["rows_done"])
+    start = time.perf_counter()
+    rows = 0
+
+    def write(scored: pd.DataFrame, output):
+        nonlocal rows
+        scored.to_csv(output, header=progress["output_bytes"] == 0, index=False)
+        output.flush()
+        os.fsync(output.fileno())
+        rows += len(scored)
+        progress["rows_done"] += len(scored)
+        progress["chunks_done"] += 1
+        progress["output_bytes"] = os.fstat(output.fileno()).st_size
+        save_progress(progress_path, progress)
+        elapsed = time.perf_counter() - start
+        print(
+            f"   {progress['rows_done']:>12,} rows scored "
+            f"({rows / elapsed:,.0f} rows/sec)"
+        )
+
+    with open(output_path, "a", newline="") as output:
+        if workers <= 1:
+            for chunk in chunks:
+                write(score_chunk(chunk, minimal), output)
+        else:
+            # Forked workers inherit _service; only chunks and results are pickled
+            context = multiprocessing.get_context("fork")
+            with ProcessPoolExecutor(workers, mp_context=context) as pool:
+                # Bound the chunks in flight so memory stays flat
+                pending = deque()
+                for chunk in chunks:
+                    pending.append(pool.submit(score_chunk, chunk, minimal))
+                    if len(pending) >= 2 * workers:
+                        write(pending.popleft().result(), output)
+                while pending:
+                    write(pending.popleft().result(), output)
+
+    progress_path.unlink()
+    elapsed = time.perf_counter() - start
+    return {
+        "rows": rows,
+        "total_rows": progress["rows_done"],
+        "seconds": elapsed,
+        "rows_per_second": rows / elapsed if elapsed else 0.0,
+    }
+
+
+def main():
+    global _service
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("input", help="CSV or Parquet file of houses")
+    parser.add_argument("output", help="CSV file the predictions are appended to")
+    parser.add_argument("--chunk-size", type=int, default=50_000)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument(
+        "--minimal", action="store_true", help="score from the minimal features"
+    )
+    parser.add_argument(
+        "--resume", action="store_true", help="continue an interrupted run"
+    )
+    parser.add_argument("--model-dir", default=str(ROOT_DIR / "model"))
+    parser.add_argument("--data-dir", default=str(ROOT_DIR / "data"))
+    args = parser.parse_args()
+
+    # One warning per chunk with unknown ZIP codes is enough
+    logging.getLogger("services.model_service").setLevel(logging.WARNING)
+
+    input_path = Path(args.input)
+    if not input_path.exists():
+        print(f"❌ Input file not found: {input_path}")
+        sys.exit(1)
+
+    print(f"📦 Loading model from {args.model_dir}...")
+    _service = ModelService(model_dir=args.model_dir, data_dir=args.data_dir)
+    print(
+        f"🚀 Scoring {input_path} in chunks of {args.chunk_size:,} rows "
+        f"with {args.workers} worker(s)"
+    )
+
+    try:
+        stats = score_file(
+            input_path,
+            Path(args.output),
+            chunk_size=args.chunk_size,
+            workers=args.workers,
+            minimal=args.minimal,
+            resume=args.resume,
+        )
+    except (RuntimeError, KeyError, ValueError) as e:
+        print(f"❌ {e}")
+        sys.exit(1)
+
+    print(
+        f"\n✅ Scored {stats['rows']:,} rows in {stats['seconds']:.1f}s "
+        f"({stats['rows_per_second']:,.0f} rows/sec) -> {args.output}"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -6,6 +6,12 @@ This script tests the watchdog's ability to detect model file changes
 and automatically reload the model across multiple container instances.
 It's useful for verifying that the shared volume approach works correctly.
 
+Model versions are content hashes (see model/manifest.json), so the script
+first touches model.pkl and checks that no container reloads, then retrains
+the model on a new sample and checks that every container reports the same
+new version. The model files are backed up first and restored when the
+script finishes, so the retrained model never outlives the test.
+
 Usage:
     python tools/test_multi_container_reload.py
     
@@ -15,16 +21,65 @@ Prerequisites:
     - Watchdog must be enabled in all containers
 """
 
+import os
+import shutil
+import sys
+import tempfile
 import time
 import requests
 import logging
 import json
 from pathlib import Path
 
+ROOT_DIR = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT_DIR))
+sys.path.insert(0, str(ROOT_DIR / "src"))
+
+import create_model  # noqa: E402
+
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+MODEL_DIR = ROOT_DIR / "model"
+# Everything a refit rewrites or removes, restored in this order so the
+# manifest, which the watchdog keys on, lands last
+MODEL_ARTIFACTS = [
+    "knn_artifact",
+    "model_features.json",
+    "model.pkl",
+    "delta_X.npy",
+    "delta_y.npy",
+    "delta.json",
+    "manifest.json",
+]
+
+def backup_model(backup_dir):
+    """Copy the model artifacts that exist into backup_dir"""
+    for name in MODEL_ARTIFACTS:
+        source = MODEL_DIR / name
+        if source.is_dir():
+            shutil.copytree(source, backup_dir / name)
+        elif source.exists():
+            shutil.copy2(source, backup_dir / name)
+
+def restore_model(backup_dir):
+    """Put the backed-up artifacts back and drop any the test created"""
+    for name in MODEL_ARTIFACTS:
+        target, saved = MODEL_DIR / name, backup_dir / name
+        if target.is_dir():
+            shutil.rmtree(target)
+        elif target.exists() and not saved.exists():
+            target.unlink()
+        if saved.is_dir():
+            shutil.copytree(saved, target)
+        elif saved.exists():
+            # Renamed into place so a watcher never reads a partial file
+            temp = target.with_name(target.name + ".tmp")
+            shutil.copy2(saved, temp)
+            os.replace(temp, target)
+    logger.info("♻️  Restored the original model artifacts")
+
 def get_container_statuses():
     """Get watchdog status from all running containers"""
     try:
@@ -64,40 +119,50 @@ def get_model_info():
         logger.error(f"Failed to connect to API: {e}")
         return None
 
+def get_replica_versions(samples=12):
+    """Model versions reported by the replicas behind the load balancer"""
+    versions = set()
+    for _ in range(samples):
+        info = get_model_info()
+        if info:
+            versions.add(info.get('model_version'))
+    return versions
+
+def touch_model_file():
+    """Bump model.pkl's mtime without changing its content"""
+    model_path = ROOT_DIR / "model" / "model.pkl"
+    if not model_path.exists():
+        logger.error("Model file does not exist")
+        return False
+    os.utime(model_path)
+    logger.info("✅ Touched model.pkl (same content, new mtime)")
+    return True
+
 def simulate_model_update():
-    """Simulate a model update by actually changing the model file"""
-    model_path = Path("model/model.pkl")
+    """Simulate a model update by retraining on a different sample"""
+    model_path = ROOT_DIR / "model" / "model.pkl"
     if not model_path.exists():
         logger.error("Model file does not exist")
         return False
     
     try:
-        # Get current modification time and size
-        current_stat = model_path.stat()
-        current_mtime = current_stat.st_mtime
-        current_size = current_stat.st_size
-        
-        # Create a real file change by appending a small amount of data
-        # This ensures the watchdog detects actual content change
-        with open(model_path, 'ab') as f:
-            f.write(b'\x00' * 1024)  # Add 1KB of zeros
-        
-        # Wait a moment for the change to be detected
-        time.sleep(0.1)
-        
-        # Verify the modification time and size changed
-        new_stat = model_path.stat()
-        new_mtime = new_stat.st_mtime
-        new_size = new_stat.st_size
-        
-        if new_mtime > current_mtime and new_size > current_size:
-            logger.info("✅ Model file updated successfully with real content change")
-            logger.info(f"   Size: {current_size} → {new_size} bytes")
-            logger.info(f"   Modified: {current_mtime} → {new_mtime}")
-            return True
-        else:
-            logger.warning("⚠️  Model file modification not detected")
-            return False
+        # create_model.py reads its CSVs relative to the repository root
+        os.chdir(ROOT_DIR)
+        x, y = create_model.load_data(
+            create_model.SALES_PATH,
+            create_model.DEMOGRAPHICS_PATH,
+            create_model.SALES_COLUMN_SELECTION,
+        )
+        # A different sample gives new model content, hence a new version
+        sample = x.sample(frac=0.75, random_state=42)
+        create_model.refit(
+            sample, y.loc[sample.index], ROOT_DIR / "model",
+            metadata={"mode": "multi-container-reload-test"},
+        )
+        manifest = json.loads((ROOT_DIR / "model" / "manifest.json").read_text())
+        logger.info("✅ Model retrained with new content")
+        logger.info(f"   Content hash: {manifest['content_hash']}")
+        return True
             
     except Exception as e:
         logger.error(f"Failed to update model file: {e}")
@@ -133,8 +198,18 @@ def test_multi_container_reload():
     logger.info(f"   Features: {initial_model_info.get('feature_count', 'unknown')}")
     logger.info(f"   Model Type: {initial_model_info.get('model_type', 'unknown')}")
     
-    # Step 3: Simulate model update
-    logger.info("\n📋 Step 3: Simulating Model Update")
+    # Step 3: Touching the file must not reload (same content hash)
+    logger.info("\n📋 Step 3: Touching the Model File")
+    if not touch_model_file():
+        return False
+    time.sleep(5)
+    touched_versions = get_replica_versions()
+    if touched_versions != {initial_version}:
+        logger.error(f"❌ Versions changed without new content: {touched_versions}")
+        return False
+    logger.info("✅ No reload: content hash unchanged")
+
+    logger.info("\n📋 Step 3b: Simulating Model Update")
     if not simulate_model_update():
         logger.error("❌ Failed to simulate model update")
         return False
@@ -163,30 +238,16 @@ def test_multi_container_reload():
     
     # Step 7: Analyze results
     logger.info("\n📋 Step 7: Analysis")
-    if updated_version != initial_version:
-        logger.info("🎉 SUCCESS: Model was reloaded across containers!")
-        logger.info(f"   Version changed: {initial_version} → {updated_version}")
-    else:
-        logger.info("ℹ️  Model version unchanged - checking for reload activity in logs...")
-        
-        # Check if reloading actually happened by looking at the logs
-        logger.info("🔍 Checking container logs for reload activity...")
-        try:
-            import subprocess
-            result = subprocess.run(
-                ["docker-compose", "logs", "mle-api"], 
-                capture_output=True, text=True, timeout=10
-            )
-            if "reloading model" in result.stdout:
-                reload_count = result.stdout.count("reloading model")
-                logger.info(f"🎉 SUCCESS: Found {reload_count} reload events in logs!")
-                logger.info("   Hot reloading is working correctly across containers")
-                logger.info("   Model version may not change if file content is similar")
-            else:
-                logger.warning("⚠️  No reload events found in logs")
-        except Exception as e:
-            logger.info(f"ℹ️  Could not check logs automatically: {e}")
-            logger.info("   Manual verification needed: docker-compose logs mle-api")
+    replica_versions = get_replica_versions()
+    if updated_version == initial_version:
+        logger.error("❌ Model version unchanged after new content was written")
+        return False
+    if len(replica_versions) != 1:
+        logger.error(f"❌ Replicas report different versions: {replica_versions}")
+        return False
+    logger.info("🎉 SUCCESS: Model was reloaded across containers!")
+    logger.info(f"   Version changed: {initial_version} → {updated_version}")
+    logger.info("   Every replica reports the same content-hash version")
     
     # Step 8: Container-specific information
     logger.info("\n📋 Step 8: Container Details")
@@ -202,12 +263,14 @@ def test_multi_container_reload():
     logger.info("   1. Check Docker Compose logs: docker-compose logs mle-api")
     logger.info("   2. Look for reload messages from different container IDs")
     logger.info("   3. Verify all containers show the same model version")
-    logger.info("   4. Test with actual model file replacement")
+    logger.info("   4. Compare it with content_hash in model/manifest.json")
     
     return True
 
 def main():
     """Main test function"""
+    backup_dir = Path(tempfile.mkdtemp(prefix="model-backup-"))
+    backup_model(backup_dir)
     try:
         success = test_multi_container_reload()
         if success:
@@ -219,6 +282,10 @@ def main():
         logger.info("\n⏹️  Test interrupted by user")
     except Exception as e:
         logger.error(f"\n💥 Unexpected error: {e}")
+    finally:
+        # The containers reload once more, back to the original version
+        restore_model(backup_dir)
+        shutil.rmtree(backup_dir, ignore_errors=True)
 
 if __name__ == "__main__":
     main()